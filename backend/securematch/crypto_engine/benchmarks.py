@@ -0,0 +1,243 @@
+# crypto_engine/benchmarks.py
+
+import json
+import platform
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import peks, sse
+from .key_manager import derive_keys
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / "bench_baseline.json"
+
+DOCUMENT_SIZES = (256, 4096, 65536)
+
+# Run metadata that must match the baseline for timings to be comparable
+ENVIRONMENT_KEYS = ("python", "machine", "cpu")
+
+
+# --------------------------------------------------
+# Measurement
+# --------------------------------------------------
+
+def measure(func, number: int, repeat: int) -> dict:
+    """
+    timeit-style: `repeat` rounds of `number` calls.
+    The best round is the stable figure used for comparisons.
+    """
+
+    per_call = []
+
+    func()  # warm-up: lazy imports, key derivation, caches
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+
+    best = min(per_call)
+
+    return {
+        "best_us": round(best * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "ops_per_sec": round(1 / best, 1) if best else None,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def _document(size: int) -> dict:
+    base = {
+        "name": "Asha Verma",
+        "pan": "ABCDE1234F",
+        "aadhaar": "123412341234",
+        "customer_id": "CUST-000001",
+        "compliance_flag": "clear",
+    }
+    padding = max(size - len(json.dumps(base)) - 12, 0)
+
+    return {**base, "notes": "x" * padding}
+
+
+# --------------------------------------------------
+# Suite
+# --------------------------------------------------
+
+def cases(quick: bool = False):
+    """
+    Yields (name, func, number, repeat) for every benchmark.
+    """
+
+    scale = 10 if quick else 1
+
+    for size in DOCUMENT_SIZES:
+        document = _document(size)
+        blob = sse.encrypt_document(document)
+        number = max(2000 // (1 + size // 4096) // scale, 10)
+
+        yield f"encrypt_document[{size}B]", lambda d=document: sse.encrypt_document(d), number, 5
+        yield f"decrypt_document[{size}B]", lambda b=blob: sse.decrypt_document(b), number, 5
+
+    yield "generate_token", lambda: sse.generate_token("pan", "ABCDE1234F"), 20000 // scale, 5
+    yield "hash_keyword", lambda: peks.hash_keyword("ABCDE1234F"), 20000 // scale, 5
+
+    private_pem, public_pem = peks.generate_keypair()
+    keyword_hash, signature = peks.generate_trapdoor_private("ABCDE1234F", private_pem)
+
+    yield (
+        "verify_signature",
+        lambda: peks.verify_signature(keyword_hash, signature, public_pem),
+        500 // scale,
+        5,
+    )
+    yield "generate_rsa_keypair", peks.generate_rsa_keypair, 1, 5 if quick else 15
+
+
+@contextmanager
+def throwaway_keys():
+    """
+    Points sse at a random in-memory keyring for the block. Timings don't
+    depend on the key, so the suite needs neither the real MASTER_KEY nor
+    any change to the process environment.
+    """
+
+    keyring = (1, {1: derive_keys(os.urandom(32))})
+    original = sse._keyring
+
+    sse._keyring = lambda: keyring
+    try:
+        yield
+    finally:
+        sse._keyring = original
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as fh:
+            for line in fh:
+                if line.startswith("model name"):
+                    return line.partition(":")[2].strip()
+    except OSError:
+        pass
+
+    return platform.processor()
+
+
+def run(quick: bool = False) -> dict:
+    with throwaway_keys():
+        results = {
+            name: measure(func, number, repeat)
+            for name, func, number, repeat in cases(quick)
+        }
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu": cpu_model(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+# --------------------------------------------------
+# Baseline Comparison
+# --------------------------------------------------
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(report: dict, path=BASELINE_PATH):
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+class BaselineMismatch(Exception):
+    pass
+
+
+# Benchmarks too noisy for best-of-N at the global threshold: name ->
+# (statistic, tolerance). RSA key generation times depend on how long
+# the random prime search takes, so compare medians with more slack.
+COMPARISON_OVERRIDES = {
+    "generate_rsa_keypair": ("median_us", 1.0),
+}
+
+
+def environment_differences(report: dict, baseline: dict) -> list:
+    """
+    ["python 3.12.1 (baseline 3.11.7)", ...] for every ENVIRONMENT_KEYS
+    entry that differs. Keys the baseline doesn't record are skipped.
+    """
+
+    current = report.get("meta", {})
+    recorded = baseline.get("meta", {})
+
+    return [
+        f"{key} {current.get(key)} (baseline {recorded[key]})"
+        for key in ENVIRONMENT_KEYS
+        if recorded.get(key) and current.get(key) != recorded[key]
+    ]
+
+
+def compare(report: dict, baseline: dict, threshold: float,
+            check_environment: bool = True) -> list:
+    """
+    Benchmarks whose best time (or COMPARISON_OVERRIDES statistic) is
+    more than `threshold` (0.25 = 25%) slower than the baseline.
+    Raises BaselineMismatch when the runs used different modes or, with
+    check_environment, ran on a different CPU or Python version.
+    """
+
+    report_quick = report.get("meta", {}).get("quick", False)
+    baseline_quick = baseline.get("meta", {}).get("quick", False)
+
+    if report_quick != baseline_quick:
+        raise BaselineMismatch(
+            f"Run is {'quick' if report_quick else 'full'} but the baseline "
+            f"is {'quick' if baseline_quick else 'full'}; compare like with like."
+        )
+
+    differences = environment_differences(report, baseline)
+
+    if check_environment and differences:
+        raise BaselineMismatch(
+            "Baseline was recorded on a different environment: "
+            f"{'; '.join(differences)}. Re-record it here with "
+            "--save-baseline, or pass --allow-environment-mismatch."
+        )
+
+    regressions = []
+
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        statistic, tolerance = COMPARISON_OVERRIDES.get(name, ("best_us", threshold))
+
+        if not previous or not previous.get(statistic):
+            continue
+
+        ratio = current[statistic] / previous[statistic]
+
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "name": name,
+                "statistic": statistic,
+                "baseline_us": previous[statistic],
+                "current_us": current[statistic],
+                "ratio": round(ratio, 3),
+            })
+
+    return regressions
@@ -2,9 +2,15 @@
 
 import os
 import base64
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
+
+def _decode_master_key(master_key_b64: str, name: str = "MASTER_KEY") -> bytes:
+    master_key = base64.b64decode(master_key_b64)
+
+    if len(master_key) != 32:
+        raise ValueError(f"{name} must decode to 32 bytes")
+
+    return master_key
+
 
 def load_master_key():
     master_key_b64 = os.getenv("MASTER_KEY")
@@ -12,26 +18,56 @@ def load_master_key():
     if not master_key_b64:
         raise ValueError("MASTER_KEY not found in environment")
 
-    master_key = base64.b64decode(master_key_b64)
+    return _decode_master_key(master_key_b64)
 
-    if len(master_key) != 32:
-        raise ValueError("MASTER_KEY must decode to 32 bytes")
 
-    return master_key
+def load_keyring():
+    """
+    Returns (active_version, {version: master_key}).
 
+    MASTER_KEY / MASTER_KEY_VERSION is the key new data is written with.
+    RETIRED_MASTER_KEYS ("1:<b64>,2:<b64>") keeps older keys readable
+    while a rotation is in progress.
+    """
+
+    active_version = int(os.getenv("MASTER_KEY_VERSION", "1"))
+    keyring = {active_version: load_master_key()}
+
+    for entry in os.getenv("RETIRED_MASTER_KEYS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        version, _, key_b64 = entry.partition(":")
+        version = int(version)
+
+        if version == active_version:
+            raise ValueError("RETIRED_MASTER_KEYS must not contain the active version")
 
-def derive_keys(master_key: bytes):
+        keyring[version] = _decode_master_key(key_b64, "RETIRED_MASTER_KEYS")
+
+    return active_version, keyring
+
+
+def derive_keys(master_key: bytes, context: str = ""):
     """
     Derive two 32-byte subkeys:
     - AES key
     - HMAC key
+
+    A non-empty context (tenant) yields an independent key pair; the
+    empty context keeps the original derivation.
     """
 
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.backends import default_backend
+
     hkdf = HKDF(
         algorithm=hashes.SHA256(),
         length=64,  # 32 + 32
         salt=None,
-        info=b"sse-key-derivation",
+        info=b"sse-key-derivation" + (b":" + context.encode() if context else b""),
         backend=default_backend()
     )
 
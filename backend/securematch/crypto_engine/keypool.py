@@ -0,0 +1,155 @@
+# crypto_engine/keypool.py
+
+import threading
+import time
+from collections import deque
+
+from .peks import generate_keypair
+
+
+# --------------------------------------------------
+# Pre-generated RSA Keypair Pool
+# --------------------------------------------------
+
+class KeypairPool:
+    """
+    Bounded in-memory pool of RSA keypairs refilled by a daemon thread.
+
+    Private keys only ever live in process memory and are handed out
+    exactly once. When the pool is empty, acquire() falls back to
+    generating inline so callers never block on the refill thread.
+    on_depth(depth) and on_miss() are optional metric hooks, called
+    whenever the depth changes and on every inline fallback.
+    """
+
+    def __init__(self, capacity: int, refill_per_second: float,
+                 on_depth=None, on_miss=None):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.on_depth = on_depth
+        self.on_miss = on_miss
+
+        self._keys = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.generated = 0
+        self.pool_hits = 0
+        self.inline_fallbacks = 0
+
+    def start(self):
+        # Called from gunicorn's post_worker_init (or on first use), so
+        # the thread is created after the server forks its workers and
+        # never in manage.py commands.
+        if self._thread is not None or self.capacity <= 0:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._refill_loop,
+                    name="keypair-pool",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _refill_loop(self):
+        interval = 1.0 / self.refill_per_second if self.refill_per_second > 0 else 0
+
+        while True:
+            if len(self._keys) >= self.capacity:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            keypair = generate_keypair()
+
+            with self._lock:
+                self._keys.append(keypair)
+                self.generated += 1
+                self._report_depth()
+
+            if interval:
+                time.sleep(interval)
+
+    def acquire(self):
+        """
+        Returns (private_pem, public_pem).
+        """
+
+        self.start()
+
+        with self._lock:
+            keypair = self._keys.popleft() if self._keys else None
+
+            if keypair is not None:
+                self.pool_hits += 1
+                self._report_depth()
+            else:
+                self.inline_fallbacks += 1
+
+        self._wakeup.set()
+
+        if keypair is None and self.on_miss is not None:
+            self.on_miss()
+
+        if keypair is None:
+            keypair = generate_keypair()
+
+        return keypair
+
+    def _report_depth(self):
+        if self.on_depth is not None:
+            self.on_depth(len(self._keys))
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._keys),
+            "capacity": self.capacity,
+            "refill_per_second": self.refill_per_second,
+            "generated": self.generated,
+            "pool_hits": self.pool_hits,
+            "inline_fallbacks": self.inline_fallbacks,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_keypair_pool() -> KeypairPool:
+    global _pool
+
+    if _pool is None:
+        from django.conf import settings
+
+        from documents.instrumentation import (
+            record_keypool_depth,
+            record_keypool_miss
+        )
+
+        with _pool_lock:
+            if _pool is None:
+                _pool = KeypairPool(
+                    capacity=settings.KEYPAIR_POOL_SIZE,
+                    refill_per_second=settings.KEYPAIR_POOL_REFILL_PER_SECOND,
+                    on_depth=record_keypool_depth,
+                    on_miss=record_keypool_miss
+                )
+
+    return _pool
+
+
+def start_keypair_pool():
+    """
+    Begin filling this worker's pool before its first request.
+    """
+    get_keypair_pool().start()
+
+
+def acquire_keypair():
+    """
+    Keypair for a new or rotated auditor, from the pool when available.
+    """
+    return get_keypair_pool().acquire()
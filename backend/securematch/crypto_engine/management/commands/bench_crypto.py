@@ -0,0 +1,96 @@
+# crypto_engine/management/commands/bench_crypto.py
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crypto_engine import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark the SSE/PEKS primitives, write machine-readable "
+        "results and flag regressions against the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write the JSON report here.")
+        parser.add_argument(
+            "--baseline",
+            default=str(benchmarks.BASELINE_PATH),
+            help="Baseline JSON to compare against (or to overwrite)."
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this run as the new baseline instead of comparing."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fractional slowdown that counts as a regression."
+        )
+        parser.add_argument(
+            "--quick",
+            action="store_true",
+            help="Fewer iterations (smoke run, noisier numbers)."
+        )
+        parser.add_argument(
+            "--allow-environment-mismatch",
+            action="store_true",
+            help="Compare even if the baseline came from another CPU or Python."
+        )
+
+    def handle(self, *args, **options):
+        report = benchmarks.run(quick=options["quick"])
+
+        for name, result in report["results"].items():
+            self.stdout.write(
+                f"{name:32} {result['best_us']:>12.1f} us  "
+                f"{result['ops_per_sec'] or 0:>12.1f} ops/s"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+
+        if options["save_baseline"]:
+            benchmarks.save_baseline(report, options["baseline"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Baseline written to {options['baseline']}"
+            ))
+            return
+
+        baseline = benchmarks.load_baseline(options["baseline"])
+
+        if baseline is None:
+            self.stdout.write("No baseline found; run with --save-baseline.")
+            return
+
+        allow_mismatch = options["allow_environment_mismatch"]
+
+        if allow_mismatch:
+            for difference in benchmarks.environment_differences(report, baseline):
+                self.stderr.write(f"WARNING environment differs: {difference}")
+
+        try:
+            regressions = benchmarks.compare(
+                report,
+                baseline,
+                options["threshold"],
+                check_environment=not allow_mismatch
+            )
+        except benchmarks.BaselineMismatch as exc:
+            raise CommandError(str(exc))
+
+        if regressions:
+            for item in regressions:
+                self.stderr.write(
+                    f"REGRESSION {item['name']} ({item['statistic']}): "
+                    f"{item['baseline_us']}us -> {item['current_us']}us "
+                    f"(x{item['ratio']})"
+                )
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed")
+
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
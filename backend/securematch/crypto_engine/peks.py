@@ -1,8 +1,7 @@
 import hashlib
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.backends import default_backend
-from cryptography.exceptions import InvalidSignature
+
+# cryptography is imported inside each function: hash_keyword is the only
+# helper on the import path of every request, and it needs just hashlib.
 
 
 # --------------------------------------------------
@@ -15,6 +14,10 @@ def generate_keypair():
     Returns (private_pem, public_pem).
     """
 
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.backends import default_backend
+
     private_key = rsa.generate_private_key(
         public_exponent=65537,
         key_size=2048,
@@ -61,6 +64,10 @@ def generate_trapdoor_private(value: str, private_pem: str):
     - signature(private_key, keyword_hash)
     """
 
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives import serialization, hashes
+    from cryptography.hazmat.backends import default_backend
+
     keyword_hash = hash_keyword(value)
 
     private_key = serialization.load_pem_private_key(
@@ -90,6 +97,11 @@ def verify_signature(keyword_hash: str, signature_hex: str, public_pem: str) ->
     Verifies trapdoor signature using auditor's public key.
     """
 
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives import serialization, hashes
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.exceptions import InvalidSignature
+
     try:
         public_key = serialization.load_pem_public_key(
             public_pem.encode(),
@@ -114,28 +126,5 @@ def verify_signature(keyword_hash: str, signature_hex: str, public_pem: str) ->
     except Exception:
         return False
 
-def generate_rsa_keypair():
-    from cryptography.hazmat.primitives.asymmetric import rsa
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.hazmat.backends import default_backend
-
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
-    )
-
-    public_key = private_key.public_key()
-
-    private_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption()
-    )
-
-    public_pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    )
-
-    return private_pem.decode(), public_pem.decode()
\ No newline at end of file
+# Kept for existing callers; generate_keypair is the single implementation.
+generate_rsa_keypair = generate_keypair
@@ -4,27 +4,82 @@ import os
 import json
 import hmac
 import hashlib
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from functools import lru_cache
 
-from .key_manager import load_master_key, derive_keys
+from .key_manager import load_keyring, derive_keys
 
 
-# Load and derive once
-_master = load_master_key()
-AES_KEY, HMAC_KEY = derive_keys(_master)
+# Blobs written before key versioning carry no identifier
+LEGACY_KEY_VERSION = 1
+
+
+# ---------------------------
+# Lazy Key Material
+# ---------------------------
+
+@lru_cache(maxsize=None)
+def _keyring():
+    """
+    Load and derive once, on first use rather than at import,
+    so commands that never touch crypto don't need MASTER_KEY.
+    """
+
+    active_version, masters = load_keyring()
+
+    keys = {
+        version: derive_keys(master)
+        for version, master in masters.items()
+    }
+
+    return active_version, keys
+
+
+def active_key_version() -> int:
+    return _keyring()[0]
+
+
+def loaded_key_versions() -> list:
+    return list(_keyring()[1])
+
+
+@lru_cache(maxsize=None)
+def _tenant_keys(key_version: int, tenant: str):
+    _, masters = load_keyring()
+    return derive_keys(masters[key_version], tenant)
+
+
+def _keys_for(key_version: int = None, tenant: str = ""):
+    active_version, keys = _keyring()
+    key_version = key_version or active_version
+
+    if tenant:
+        if key_version not in keys:
+            raise KeyError(key_version)
+        return _tenant_keys(key_version, tenant)
+
+    return keys[key_version]
+
+
+def _aesgcm(aes_key: bytes):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    return AESGCM(aes_key)
 
 
 # ---------------------------
 # AES-256-GCM
 # ---------------------------
 
-def encrypt_document(data: dict) -> dict:
+def encrypt_document(data: dict, key_version: int = None, tenant: str = "") -> dict:
     """
     Encrypt a dictionary using AES-256-GCM.
-    Returns nonce + ciphertext.
+    Returns nonce + ciphertext + key_version (+ tenant key context).
     """
 
-    aesgcm = AESGCM(AES_KEY)
+    key_version = key_version or active_key_version()
+    aes_key, _ = _keys_for(key_version, tenant)
+
+    aesgcm = _aesgcm(aes_key)
 
     nonce = os.urandom(12)  # 96-bit nonce (required for GCM)
 
@@ -32,18 +87,28 @@ def encrypt_document(data: dict) -> dict:
 
     ciphertext = aesgcm.encrypt(nonce, plaintext, None)
 
-    return {
+    blob = {
         "nonce": nonce.hex(),
-        "ciphertext": ciphertext.hex()
+        "ciphertext": ciphertext.hex(),
+        "key_version": key_version
     }
 
+    if tenant:
+        blob["tenant"] = tenant
+
+    return blob
+
 
 def decrypt_document(encrypted_data: dict) -> dict:
     """
-    Decrypt AES-256-GCM encrypted document.
+    Decrypt AES-256-GCM encrypted document
+    with the key version and tenant recorded in the blob.
     """
 
-    aesgcm = AESGCM(AES_KEY)
+    key_version = encrypted_data.get("key_version", LEGACY_KEY_VERSION)
+    aes_key, _ = _keys_for(key_version, encrypted_data.get("tenant", ""))
+
+    aesgcm = _aesgcm(aes_key)
 
     nonce = bytes.fromhex(encrypted_data["nonce"])
     ciphertext = bytes.fromhex(encrypted_data["ciphertext"])
@@ -61,17 +126,20 @@ def normalize(text: str) -> str:
     return text.strip().lower()
 
 
-def generate_token(field: str, value: str) -> str:
+def generate_token(field: str, value: str, key_version: int = None,
+                   tenant: str = "") -> str:
     """
     Deterministic field-bound HMAC-SHA256 token.
     Used during indexing.
     """
 
+    _, hmac_key = _keys_for(key_version, tenant)
+
     normalized_value = normalize(value)
     payload = f"{field}:{normalized_value}"
 
     digest = hmac.new(
-        HMAC_KEY,
+        hmac_key,
         payload.encode(),
         hashlib.sha256
     ).hexdigest()
@@ -84,4 +152,41 @@ def generate_trapdoor(field: str, value: str) -> str:
     Same logic as token.
     Used during search.
     """
-    return generate_token(field, value)
\ No newline at end of file
+    return generate_token(field, value)
+
+
+def generate_trapdoors(field: str, value: str, tenant: str = "") -> list:
+    """
+    One trapdoor per loaded key version, so searches match both
+    token generations while a master-key rotation is in progress.
+    """
+    return [
+        generate_token(field, value, version, tenant)
+        for version in loaded_key_versions()
+    ]
+
+
+def generate_compound_token(fields, values, key_version: int = None,
+                            tenant: str = "") -> str:
+    """
+    HMAC-SHA256 over several fields' normalized values together. The
+    "+"-joined label keeps it apart from every single-field token.
+    """
+
+    _, hmac_key = _keys_for(key_version, tenant)
+
+    normalized_values = json.dumps([normalize(value) for value in values])
+    payload = f"{'+'.join(fields)}:{normalized_values}"
+
+    return hmac.new(
+        hmac_key,
+        payload.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def generate_compound_trapdoors(fields, values, tenant: str = "") -> list:
+    return [
+        generate_compound_token(fields, values, version, tenant)
+        for version in loaded_key_versions()
+    ]
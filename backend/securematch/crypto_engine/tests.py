@@ -1,3 +1,204 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import threading
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from crypto_engine import benchmarks, keypool, sse
+
+
+# Autoscaled containers cold-start often; keep worker boot cheap.
+COLD_START_BUDGET_SECONDS = float(os.getenv("COLD_START_BUDGET_SECONDS", "3.0"))
+
+
+class ColdStartTests(SimpleTestCase):
+
+    def _run_fresh(self, code):
+        env = {
+            **os.environ,
+            "MASTER_KEY": "",
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "securematch.settings"
+            ),
+        }
+
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True
+        )
+
+        return result, time.perf_counter() - start
+
+    def test_url_import_defers_crypto_and_master_key(self):
+        result, elapsed = self._run_fresh(
+            "import sys, django; django.setup(); import securematch.urls; "
+            "print('cryptography' in sys.modules)"
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "False")
+        self.assertLess(elapsed, COLD_START_BUDGET_SECONDS)
+
+
+class BenchmarkBaselineTests(SimpleTestCase):
+
+    def _report(self, **meta):
+        return {
+            "meta": {
+                "python": "3.11.7",
+                "machine": "x86_64",
+                "cpu": "Example CPU @ 3.0GHz",
+                "quick": False,
+                **meta,
+            },
+            "results": {
+                "hash_keyword": {"best_us": 10.0, "median_us": 11.0, "ops_per_sec": 1e5},
+            },
+        }
+
+    def test_run_records_environment(self):
+        with mock.patch.object(benchmarks, "cases", return_value=[]):
+            meta = benchmarks.run()["meta"]
+
+        self.assertEqual(
+            set(benchmarks.ENVIRONMENT_KEYS) - set(meta), set()
+        )
+
+    def test_compare_refuses_other_environment(self):
+        baseline = self._report()
+
+        for key, value in (("python", "3.12.1"), ("cpu", "Other CPU")):
+            with self.assertRaisesMessage(benchmarks.BaselineMismatch, key):
+                benchmarks.compare(self._report(**{key: value}), baseline, 0.25)
+
+        self.assertEqual(
+            benchmarks.compare(
+                self._report(python="3.12.1"), baseline, 0.25,
+                check_environment=False
+            ),
+            []
+        )
+
+    def test_compare_skips_keys_missing_from_baseline(self):
+        baseline = self._report()
+        del baseline["meta"]["cpu"]
+
+        self.assertEqual(
+            benchmarks.compare(self._report(cpu="Other CPU"), baseline, 0.25),
+            []
+        )
+
+    def test_command_refuses_or_warns_on_mismatch(self):
+        path = os.path.join(settings.BASE_DIR, "crypto_engine", "bench_baseline.json")
+        stderr = StringIO()
+
+        with mock.patch.object(benchmarks, "run", return_value=self._report()), \
+                mock.patch.object(
+                    benchmarks, "load_baseline",
+                    return_value=self._report(python="3.10.0")
+                ):
+            with self.assertRaisesMessage(CommandError, "python 3.11.7"):
+                call_command("bench_crypto", baseline=path, stdout=StringIO())
+
+            call_command(
+                "bench_crypto",
+                baseline=path,
+                allow_environment_mismatch=True,
+                stdout=StringIO(),
+                stderr=stderr
+            )
+
+        self.assertIn("environment differs: python 3.11.7", stderr.getvalue())
+
+    def test_throwaway_keys_leave_environment_alone(self):
+        original = sse._keyring
+
+        with mock.patch.dict(os.environ, clear=False):
+            os.environ.pop("MASTER_KEY", None)
+
+            with benchmarks.throwaway_keys():
+                blob = sse.encrypt_document({"pan": "ABCDE1234F"})
+                self.assertEqual(sse.decrypt_document(blob), {"pan": "ABCDE1234F"})
+
+            self.assertNotIn("MASTER_KEY", os.environ)
+
+        self.assertIs(sse._keyring, original)
+
+
+def keypool_metric(name):
+    return REGISTRY.get_sample_value(name) or 0
+
+
+@override_settings(KEYPAIR_POOL_SIZE=2, KEYPAIR_POOL_REFILL_PER_SECOND=0)
+class KeypairPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        # The refill thread blocks in key generation while this is clear
+        self.refill_gate = threading.Event()
+        self.refill_gate.set()
+        self.issued = 0
+
+        def fake_keypair():
+            if threading.current_thread().name == "keypair-pool":
+                self.refill_gate.wait(5)
+
+            self.issued += 1
+            return (f"private-{self.issued}", f"public-{self.issued}")
+
+        patches = (
+            mock.patch.object(keypool, "_pool", None),
+            mock.patch.object(keypool, "generate_keypair", fake_keypair),
+        )
+
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.addCleanup(self.refill_gate.set)
+
+    def wait_for_depth(self, pool, depth):
+        deadline = time.monotonic() + 5
+
+        while pool.stats()["depth"] != depth:
+            self.assertLess(time.monotonic(), deadline, pool.stats())
+            time.sleep(0.01)
+
+    def test_pool_refills_after_being_drained(self):
+        pool = keypool.get_keypair_pool()
+        pool.start()
+
+        self.wait_for_depth(pool, 2)
+        self.assertEqual(keypool_metric("securematch_keypool_depth"), 2)
+
+        misses = keypool_metric("securematch_keypool_misses_total")
+        self.refill_gate.clear()
+
+        keypairs = [keypool.acquire_keypair() for _ in range(3)]
+
+        self.assertEqual(len(set(keypairs)), 3)
+        self.assertEqual(pool.stats()["pool_hits"], 2)
+        self.assertEqual(pool.stats()["inline_fallbacks"], 1)
+        self.assertEqual(keypool_metric("securematch_keypool_depth"), 0)
+        self.assertEqual(
+            keypool_metric("securematch_keypool_misses_total"), misses + 1
+        )
+
+        self.refill_gate.set()
+
+        self.wait_for_depth(pool, 2)
+        self.assertEqual(keypool_metric("securematch_keypool_depth"), 2)
+
+        keypool.acquire_keypair()
+        self.assertEqual(pool.stats()["pool_hits"], 3)
+        self.assertEqual(pool.stats()["inline_fallbacks"], 1)
@@ -3,3 +3,41 @@ from django.apps import AppConfig
 
 class DocumentsConfig(AppConfig):
     name = 'documents'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from .instrumentation import count_queries
+        from .routing import replica_failure_watch
+
+        def install_query_counter(sender, connection, **kwargs):
+            if count_queries not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count_queries)
+
+            if (
+                connection.alias in settings.DATABASE_REPLICAS
+                and replica_failure_watch not in connection.execute_wrappers
+            ):
+                connection.execute_wrappers.append(replica_failure_watch)
+
+        connection_created.connect(install_query_counter, weak=False)
+
+        from django.db.models.signals import post_save
+
+        from .models import Tenant
+        from .sharding import sync_tenants
+        from .tenancy import _remember, ensure_token_partition
+
+        def on_tenant_saved(sender, instance, created, using, **kwargs):
+            _remember(instance)
+
+            if created:
+                ensure_token_partition(instance, using=using)
+
+            # Shards keep a copy of every tenant for their foreign keys
+            if using == "default":
+                for alias in settings.DATABASE_SHARDS:
+                    sync_tenants(alias, [instance])
+
+        post_save.connect(on_tenant_saved, sender=Tenant, weak=False)
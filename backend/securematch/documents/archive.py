@@ -0,0 +1,587 @@
+# documents/archive.py
+
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+from crypto_engine.sse import generate_token, loaded_key_versions
+
+from .db import stream_queryset
+from .bitmaps import RoaringBitmap, deserialize_container
+from .models import EncryptedDocument, PostingList, SearchTokenIndex, Tenant
+from .postings import merge_postings
+from .sharding import (
+    advance_id_allocation,
+    document_shards,
+    shard_for,
+    shards_by_document,
+    sharding_enabled,
+    sync_tenants,
+    use_shard
+)
+from .tenancy import default_tenant
+
+
+ARCHIVE_FORMAT = "securematch-index"
+ARCHIVE_VERSION = 3
+# Version 1 archives predate tenants; their rows load into DEFAULT_TENANT.
+# Version 3 adds the bitmap posting lists.
+SUPPORTED_VERSIONS = (1, 2, 3)
+MANIFEST = "manifest.json"
+
+# table key -> (model, exported columns); order is load order (FKs)
+TABLES = {
+    "documents": (
+        EncryptedDocument,
+        ["id", "tenant_id", "key_version", "created_at", "encrypted_blob"],
+    ),
+    "tokens": (
+        SearchTokenIndex,
+        ["id", "document_id", "tenant_id", "token", "external_token",
+         "key_version"],
+    ),
+}
+
+# Posting list containers (hex bitmaps); merged on import, not copied
+POSTINGS = "postings"
+POSTING_COLUMNS = ["tenant_id", "token", "external", "container", "bitmap"]
+
+# Tombstoned documents (pending purge) are not exported
+LIVE_FILTERS = {
+    "documents": {"deleted_at__isnull": True},
+    "tokens": {"document__deleted_at__isnull": True},
+}
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def key_check_values(versions) -> dict:
+    """
+    Token of a fixed probe per key version: identifies the master key
+    without revealing it, so an import can't silently pair an archive
+    with different keys.
+    """
+
+    loaded = set(loaded_key_versions())
+
+    return {
+        str(version): generate_token("__archive__", "key-check", version)
+        for version in versions
+        if version in loaded
+    }
+
+
+# ---------------------------------------------------
+# Chunk Files (gzip JSONL, sha256 of the compressed bytes)
+# ---------------------------------------------------
+
+class HashingWriter:
+    """
+    File wrapper that sha256-hashes everything written through it.
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self._fh.write(data)
+
+    def flush(self):
+        self._fh.flush()
+
+
+class _ChunkWriter:
+    def __init__(self, directory: str, table: str, chunk_rows: int):
+        self.directory = directory
+        self.table = table
+        self.chunk_rows = chunk_rows
+        self.chunks = []
+
+        self._fh = None
+        self._gzip = None
+        self._hasher = None
+        self._rows = 0
+
+    def _open(self):
+        name = f"{self.table}-{len(self.chunks):05d}.jsonl.gz"
+        self._name = name
+        self._fh = open(os.path.join(self.directory, name), "wb")
+        self._hasher = HashingWriter(self._fh)
+        self._gzip = gzip.GzipFile(fileobj=self._hasher, mode="wb", mtime=0)
+        self._rows = 0
+
+    def _close(self):
+        self._gzip.close()
+        self._fh.close()
+        self.chunks.append({
+            "file": self._name,
+            "rows": self._rows,
+            "sha256": self._hasher.sha256.hexdigest(),
+        })
+        self._gzip = None
+
+    def write(self, row):
+        if self._gzip is None:
+            self._open()
+
+        self._gzip.write(json.dumps(row, separators=(",", ":")).encode())
+        self._gzip.write(b"\n")
+        self._rows += 1
+
+        if self._rows >= self.chunk_rows:
+            self._close()
+
+    def finish(self) -> list:
+        if self._gzip is not None:
+            self._close()
+        return self.chunks
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def read_rows(path: str):
+    with gzip.open(path, "rb") as fh:
+        for line in fh:
+            yield json.loads(line)
+
+
+# ---------------------------------------------------
+# Export
+# ---------------------------------------------------
+
+def _encode(row):
+    return [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in row
+    ]
+
+
+def export_archive(directory: str, chunk_rows: int = 100_000,
+                   fetch_size: int = 5000, progress=None) -> dict:
+    """
+    Streams both tables into chunked gzip JSONL files plus a manifest.
+
+    Both scans run in one transaction per shard (REPEATABLE READ on
+    PostgreSQL), so every exported token references an exported
+    document.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        raise ArchiveError(f"{directory} already contains an archive")
+
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "tables": {},
+        "tenants": [
+            {
+                "id": tenant.id,
+                "slug": tenant.slug,
+                "name": tenant.name,
+                "key_context": tenant.key_context,
+            }
+            for tenant in Tenant.objects.order_by("id")
+        ],
+    }
+
+    shards = document_shards()
+
+    with ExitStack() as stack:
+        for alias in shards:
+            stack.enter_context(transaction.atomic(using=alias))
+
+            if connections[alias].vendor == "postgresql":
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                    )
+
+        key_versions = set()
+
+        for alias in shards:
+            with use_shard(alias):
+                key_versions.update(
+                    EncryptedDocument.objects.live()
+                    .order_by()
+                    .values_list("key_version", flat=True)
+                    .distinct()
+                )
+
+        manifest["key_versions"] = sorted(key_versions)
+
+        for table, (model, columns) in TABLES.items():
+            writer = _ChunkWriter(directory, table, chunk_rows)
+            count = 0
+
+            # Token ids repeat across shards; the importer assigns new ones
+            if table == "tokens" and sharding_enabled():
+                columns = [column for column in columns if column != "id"]
+
+            for alias in shards:
+                with use_shard(alias):
+                    queryset = model.objects.filter(
+                        **LIVE_FILTERS[table]
+                    ).order_by("id").values_list(*columns)
+
+                    for row in stream_queryset(queryset, chunk_size=fetch_size):
+                        writer.write(_encode(row))
+                        count += 1
+
+                        if progress and count % chunk_rows == 0:
+                            progress(table, count)
+
+            chunks = writer.finish()
+            manifest["tables"][table] = {
+                "columns": columns,
+                "rows": sum(chunk["rows"] for chunk in chunks),
+                "chunks": chunks,
+            }
+
+            if progress:
+                progress(table, manifest["tables"][table]["rows"])
+
+        # Deleted documents are already out of the posting lists
+        writer = _ChunkWriter(directory, POSTINGS, chunk_rows)
+
+        for alias in shards:
+            with use_shard(alias):
+                queryset = PostingList.objects.order_by("id").values_list(
+                    *POSTING_COLUMNS
+                )
+
+                for row in stream_queryset(queryset, chunk_size=fetch_size):
+                    writer.write([*row[:4], bytes(row[4]).hex()])
+
+        chunks = writer.finish()
+        manifest["tables"][POSTINGS] = {
+            "columns": POSTING_COLUMNS,
+            "rows": sum(chunk["rows"] for chunk in chunks),
+            "chunks": chunks,
+        }
+
+    manifest["key_check"] = key_check_values(manifest["key_versions"])
+    manifest["created_at"] = datetime.now().astimezone().isoformat()
+
+    with open(os.path.join(directory, MANIFEST), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    return manifest
+
+
+# ---------------------------------------------------
+# Verify & Import
+# ---------------------------------------------------
+
+def load_manifest(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError) as exc:
+        raise ArchiveError(f"Unreadable manifest in {directory}: {exc}")
+
+    if manifest.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveError(f"{directory} is not a {ARCHIVE_FORMAT} archive")
+
+    if manifest.get("version") not in SUPPORTED_VERSIONS:
+        raise ArchiveError(
+            f"Unsupported archive version {manifest.get('version')}"
+        )
+
+    return manifest
+
+
+def verify_archive(directory: str, manifest: dict):
+    """
+    Raises ArchiveError on the first missing or corrupted chunk.
+    """
+
+    for table in manifest["tables"]:
+        for chunk in manifest["tables"][table]["chunks"]:
+            path = os.path.join(directory, chunk["file"])
+
+            if not os.path.isfile(path):
+                raise ArchiveError(f"Missing chunk {chunk['file']}")
+
+            if file_sha256(path) != chunk["sha256"]:
+                raise ArchiveError(f"Checksum mismatch in {chunk['file']}")
+
+
+def _copy_rows(connection, model, columns, rows):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_sql = ", ".join(connection.ops.quote_name(c) for c in columns)
+
+    with connection.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({column_sql}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def _insert_rows(connection, model, columns, rows, batch_size=1000):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_sql = ", ".join(connection.ops.quote_name(c) for c in columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    sql = f"INSERT INTO {table} ({column_sql}) VALUES ({placeholders})"
+
+    with connection.cursor() as cursor:
+        batch = []
+
+        for row in rows:
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def _decoder(columns: list, tenant_map: dict, drop_id: bool = False):
+    """
+    Row converter for the archived column list. Tenant ids are mapped
+    onto this database's tenants; archives without a tenant_id column
+    get the default tenant appended. drop_id leaves the id to the
+    target table (token ids are only unique per database).
+    """
+
+    created_at = columns.index("created_at") if "created_at" in columns else None
+    blob = columns.index("encrypted_blob") if "encrypted_blob" in columns else None
+    tenant = columns.index("tenant_id") if "tenant_id" in columns else None
+    default_id = None if tenant is not None else default_tenant().id
+    row_id = columns.index("id") if drop_id and "id" in columns else None
+    ops = connections[document_shards()[0]].ops
+
+    def decode(row):
+        if created_at is not None:
+            row[created_at] = ops.adapt_datetimefield_value(
+                datetime.fromisoformat(row[created_at])
+            )
+        if blob is not None:
+            row[blob] = json.dumps(row[blob])
+        if tenant is not None:
+            row[tenant] = tenant_map[row[tenant]]
+        else:
+            row.append(default_id)
+        if row_id is not None:
+            del row[row_id]
+        return row
+
+    if tenant is None:
+        columns = [*columns, "tenant_id"]
+    if row_id is not None:
+        columns = [column for column in columns if column != "id"]
+    return columns, decode
+
+
+def _import_tenants(manifest: dict) -> dict:
+    """
+    Archived tenant id -> local tenant id, creating tenants by slug. An
+    existing tenant must derive its keys the same way as in the archive.
+    """
+
+    tenant_map = {}
+
+    for item in manifest.get("tenants", []):
+        tenant, _ = Tenant.objects.get_or_create(
+            slug=item["slug"],
+            defaults={"name": item["name"], "key_context": item["key_context"]}
+        )
+
+        if tenant.key_context != item["key_context"]:
+            raise ArchiveError(
+                f"Tenant '{tenant.slug}' has key context "
+                f"{tenant.key_context!r} here, {item['key_context']!r} in the archive"
+            )
+
+        tenant_map[item["id"]] = tenant.id
+
+    return tenant_map
+
+
+def _load_chunk(directory: str, table: str, chunk: dict, columns: list,
+                tenant_map: dict):
+    """
+    Loads one chunk in one transaction per target database, on this
+    thread's connections.
+    """
+
+    model, _ = TABLES[table]
+    path = os.path.join(directory, chunk["file"])
+    columns, decode = _decoder(
+        columns,
+        tenant_map,
+        drop_id=table == "tokens" and sharding_enabled()
+    )
+    rows = (decode(row) for row in read_rows(path))
+
+    if sharding_enabled():
+        # Rows go to the shard owning their document
+        key = columns.index("id" if table == "documents" else "document_id")
+        by_shard = {}
+
+        for row in rows:
+            by_shard.setdefault(shard_for(row[key]), []).append(row)
+    else:
+        by_shard = {"default": rows}
+
+    try:
+        for alias, shard_rows in by_shard.items():
+            target = connections[alias]
+
+            with transaction.atomic(using=alias):
+                if target.vendor == "postgresql":
+                    _copy_rows(target, model, columns, shard_rows)
+                else:
+                    _insert_rows(target, model, columns, shard_rows)
+    finally:
+        connections.close_all()
+
+    return chunk["rows"]
+
+
+def _load_postings(directory: str, chunk: dict, tenant_map: dict) -> int:
+    """
+    Merges one chunk of posting list containers into the target lists,
+    splitting each container over the shards that own its documents.
+    """
+
+    # {alias: {tenant_id: {(token, external): RoaringBitmap}}}
+    merged = {}
+
+    for tenant_id, token, external, container, data in read_rows(
+        os.path.join(directory, chunk["file"])
+    ):
+        bitmap = RoaringBitmap(
+            {container: deserialize_container(bytes.fromhex(data))}
+        )
+
+        if sharding_enabled():
+            parts = {
+                alias: RoaringBitmap.from_ids(ids)
+                for alias, ids in shards_by_document(bitmap).items()
+            }
+        else:
+            parts = {"default": bitmap}
+
+        for alias, part in parts.items():
+            postings = merged.setdefault(alias, {}).setdefault(
+                tenant_map[tenant_id], {}
+            )
+            key = (token, external)
+            postings[key] = postings[key] | part if key in postings else part
+
+    for alias, tenants in merged.items():
+        with use_shard(alias):
+            for tenant_id, postings in tenants.items():
+                merge_postings(tenant_id, postings)
+
+    return chunk["rows"]
+
+
+def import_archive(directory: str, jobs: int = 4, progress=None) -> dict:
+    """
+    Verifies every chunk, then loads documents and tokens (in that
+    order) with `jobs` chunks in flight, and resets the id sequences.
+    """
+
+    manifest = load_manifest(directory)
+    verify_archive(directory, manifest)
+
+    shards = document_shards()
+
+    for alias in shards:
+        with use_shard(alias):
+            if (
+                EncryptedDocument.objects.exists()
+                or SearchTokenIndex.objects.exists()
+                or PostingList.objects.exists()
+            ):
+                raise ArchiveError(f"Target tables on {alias} are not empty")
+
+    tenant_map = _import_tenants(manifest)
+
+    if sharding_enabled():
+        for alias in shards:
+            sync_tenants(alias)
+
+    # SQLite allows a single writer; parallel chunks would only contend
+    workers = jobs if connections[shards[0]].vendor == "postgresql" else 1
+
+    loaded = {}
+
+    for table in TABLES:
+        chunks = manifest["tables"][table]["chunks"]
+        columns = manifest["tables"][table]["columns"]
+        loaded[table] = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _load_chunk, directory, table, chunk, columns, tenant_map
+                )
+                for chunk in chunks
+            ]
+
+            for future in futures:
+                loaded[table] += future.result()
+
+                if progress:
+                    progress(table, loaded[table])
+
+    # Absent from version 1-2 archives (run reindex to build them)
+    if POSTINGS in manifest["tables"]:
+        loaded[POSTINGS] = 0
+
+        for chunk in manifest["tables"][POSTINGS]["chunks"]:
+            loaded[POSTINGS] += _load_postings(directory, chunk, tenant_map)
+
+            if progress:
+                progress(POSTINGS, loaded[POSTINGS])
+
+    max_document_id = 0
+
+    for alias in shards:
+        target = connections[alias]
+        reset_sql = target.ops.sequence_reset_sql(
+            no_style(),
+            [model for model, _ in TABLES.values()]
+        )
+
+        if reset_sql:
+            with target.cursor() as cursor:
+                for statement in reset_sql:
+                    cursor.execute(statement)
+
+        with use_shard(alias):
+            max_document_id = max(
+                max_document_id,
+                EncryptedDocument.objects.aggregate(Max("id"))["id__max"] or 0
+            )
+
+    # Sharded ids come from the primary's allocator
+    if sharding_enabled():
+        advance_id_allocation(max_document_id)
+
+    return {"manifest": manifest, "loaded": loaded}
@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .profiling import profile_offloaded
+from .views import ExternalSearchView, InternalSearchView, UploadDocumentView
+
+
+# ---------------------------------------------------
+#  Offloaded DRF Views (ASGI)
+# ---------------------------------------------------
+
+@method_decorator(csrf_exempt, name="dispatch")
+class OffloadedAPIView(View):
+    """
+    Native async entry point for a sync DRF view. Under ASGI Django runs
+    every sync view of a worker on one thread, so concurrent requests
+    queue behind each other's crypto and queries; this runs the whole
+    view (throttles, parsing, search, audit) on the default thread pool
+    instead. The pipeline itself exists once, in views.py.
+    """
+
+    api_view = None
+    http_method_names = ["post"]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Read by ReplicaRoutingMiddleware.process_view
+        cls.replica_reads = getattr(cls.api_view, "replica_reads", False)
+        cls.handler = staticmethod(cls.api_view.as_view())
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.run, thread_sensitive=False)(
+            request, *args, **kwargs
+        )
+
+    def run(self, request, *args, **kwargs):
+        try:
+            with profile_offloaded(request):
+                return self.handler(request, *args, **kwargs)
+        finally:
+            # Pool threads outlive the request: close (or return to the
+            # pool) the connections this one opened
+            close_old_connections()
+
+
+class AsyncUploadDocumentView(OffloadedAPIView):
+    api_view = UploadDocumentView
+
+
+class AsyncInternalSearchView(OffloadedAPIView):
+    api_view = InternalSearchView
+
+
+class AsyncExternalSearchView(OffloadedAPIView):
+    api_view = ExternalSearchView
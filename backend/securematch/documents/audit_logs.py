@@ -0,0 +1,224 @@
+# documents/audit_logs.py
+
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+
+from .db import stream_queryset
+from .models import ExternalSearchAudit
+
+
+AUDIT_LOG_PAGE_SIZE = 100
+MAX_AUDIT_LOG_PAGE_SIZE = 1000
+
+# Rows per streamed chunk (and per server-side cursor fetch)
+EXPORT_CHUNK_ROWS = 2000
+
+AUDIT_LOG_FIELDS = [
+    "id",
+    "keyword_hash",
+    "success",
+    "failure_reason",
+    "total_matches",
+    "returned_count",
+    "truncated",
+    "execution_time_ms",
+    "created_at",
+    "key_version",
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class AuditLogQueryError(ValueError):
+    pass
+
+
+# ---------------------------------------------------
+# Keyset Cursors on (created_at, id), newest first
+# ---------------------------------------------------
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, log_id = raw.decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise AuditLogQueryError("Invalid cursor")
+
+
+# ---------------------------------------------------
+# Filters
+# ---------------------------------------------------
+
+def _parse_time(params, name):
+    value = params.get(name)
+
+    if not value:
+        return None
+
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise AuditLogQueryError(f"'{name}' must be an ISO 8601 timestamp")
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_current_timezone())
+
+    return moment
+
+
+def _parse_bool(params, name):
+    value = params.get(name)
+
+    if value in (None, ""):
+        return None
+
+    if value.lower() in ("true", "1"):
+        return True
+    if value.lower() in ("false", "0"):
+        return False
+
+    raise AuditLogQueryError(f"'{name}' must be true or false")
+
+
+def parse_limit(params) -> int:
+    try:
+        limit = int(params.get("limit", AUDIT_LOG_PAGE_SIZE))
+    except ValueError:
+        raise AuditLogQueryError("'limit' must be an integer")
+
+    if not 1 <= limit <= MAX_AUDIT_LOG_PAGE_SIZE:
+        raise AuditLogQueryError(
+            f"'limit' must be between 1 and {MAX_AUDIT_LOG_PAGE_SIZE}"
+        )
+
+    return limit
+
+
+def audit_log_queryset(auditor, params):
+    """
+    The auditor's logs matching since / until / success / keyword_hash
+    and starting after `cursor`, newest first. Served by the
+    (auditor, created_at, id) index, so a deep cursor costs the same
+    as the first page.
+    """
+
+    queryset = ExternalSearchAudit.objects.filter(auditor=auditor)
+
+    since = _parse_time(params, "since")
+    until = _parse_time(params, "until")
+    success = _parse_bool(params, "success")
+    keyword_hash = params.get("keyword_hash")
+
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    if success is not None:
+        queryset = queryset.filter(success=success)
+    if keyword_hash:
+        queryset = queryset.filter(keyword_hash=keyword_hash)
+
+    cursor = params.get("cursor")
+
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        # The lte bound keeps this an index range scan
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=log_id),
+            created_at__lte=created_at
+        )
+
+    return queryset.order_by("-created_at", "-id").values_list(*AUDIT_LOG_FIELDS)
+
+
+# ---------------------------------------------------
+# Pages & Exports
+# ---------------------------------------------------
+
+def _serialize(row) -> dict:
+    log = dict(zip(AUDIT_LOG_FIELDS, row))
+    # Full precision: the value round-trips through cursors
+    log["created_at"] = log["created_at"].isoformat()
+    return log
+
+
+def audit_log_page(queryset, limit: int):
+    """
+    (logs, next_cursor); next_cursor is None on the last page.
+    """
+
+    rows = list(queryset[:limit + 1])
+    logs = [_serialize(row) for row in rows[:limit]]
+
+    if len(rows) <= limit:
+        return logs, None
+
+    last = rows[limit - 1]
+    return logs, encode_cursor(last[AUDIT_LOG_FIELDS.index("created_at")], last[0])
+
+
+def _csv_chunks(rows):
+    yield ",".join(AUDIT_LOG_FIELDS) + "\r\n"
+
+    while batch := list(islice(rows, EXPORT_CHUNK_ROWS)):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            log = _serialize(row)
+            writer.writerow(log[field] for field in AUDIT_LOG_FIELDS)
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows):
+    while batch := list(islice(rows, EXPORT_CHUNK_ROWS)):
+        yield "".join(json.dumps(_serialize(row)) + "\n" for row in batch)
+
+
+def export_chunks(queryset, export_format: str):
+    """
+    CSV / NDJSON text chunks for every matching log. Rows come through
+    a server-side cursor, so memory stays flat however long the range.
+    """
+
+    rows = stream_queryset(queryset, chunk_size=EXPORT_CHUNK_ROWS)
+    encode = _csv_chunks if export_format == "csv" else _ndjson_chunks
+
+    try:
+        yield from encode(rows)
+    finally:
+        # Ends the cursor's transaction on this thread, even on disconnect
+        rows.close()
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over a sync chunk generator, for ASGI responses
+    (Django would otherwise buffer a sync iterator in full). Every
+    step runs on the request's sync thread, where the cursor's
+    connection lives.
+    """
+
+    step = sync_to_async(next)
+
+    try:
+        while (chunk := await step(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,302 @@
+# documents/audit_retention.py
+
+import fcntl
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .archive import HashingWriter, file_sha256, read_rows
+from .models import ExternalSearchAudit, ExternalSearchAuditRollup
+
+
+ARCHIVE_FORMAT = "securematch-audit"
+ARCHIVE_VERSION = 1
+# Append-only, one JSON line per archived chunk
+MANIFEST = "manifest.jsonl"
+# Held by the archiving run for its whole duration
+LOCK_FILE = "archive.lock"
+
+ARCHIVED_FIELDS = [
+    "id",
+    "auditor_id",
+    "tenant_id",
+    "keyword_hash",
+    "success",
+    "failure_reason",
+    "total_matches",
+    "returned_count",
+    "truncated",
+    "execution_time_ms",
+    "key_version",
+    "ip_address",
+    "created_at",
+]
+
+
+class AuditArchiveError(Exception):
+    pass
+
+
+# ---------------------------------------------------
+# Retention Policy
+# ---------------------------------------------------
+
+def expired_audits(now=None):
+    """
+    Audit rows past their retention window (successes and failures
+    are kept for different lengths of time), oldest first.
+    """
+
+    now = now or timezone.now()
+
+    return ExternalSearchAudit.objects.filter(
+        Q(success=True,
+          created_at__lt=now - timedelta(days=settings.AUDIT_RETENTION_DAYS))
+        | Q(success=False,
+            created_at__lt=now - timedelta(days=settings.AUDIT_FAILURE_RETENTION_DAYS))
+    ).order_by("created_at", "id")
+
+
+def _encode(row: dict) -> dict:
+    row["created_at"] = row["created_at"].isoformat()
+    return row
+
+
+# ---------------------------------------------------
+# Archive Directory
+# ---------------------------------------------------
+
+class AuditArchive:
+    """
+    Chunk files (gzip JSONL, one audit row per line) plus a manifest
+    line per chunk with its sha256, id range and time range.
+
+    A chunk is written and fsynced, then listed in the manifest, and
+    only then are its rows deleted from the table, so a crash never
+    loses rows. recover() finishes a chunk whose delete was cut short.
+    Writers hold lock() so overlapping runs never archive a chunk twice.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = str(directory or settings.AUDIT_ARCHIVE_DIR)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    @contextmanager
+    def lock(self):
+        """
+        Exclusive flock on the archive directory; raises
+        AuditArchiveError at once if another run holds it. The kernel
+        releases it if the run dies.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise AuditArchiveError(
+                    f"Another run is archiving into {self.directory}"
+                )
+
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def chunks(self) -> list:
+        if not os.path.exists(self.manifest_path):
+            return []
+
+        with open(self.manifest_path) as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+
+    def write_chunk(self, rows: list) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+
+        name = f"audit-{rows[0]['created_at'][:10]}-{rows[0]['id']:012d}.jsonl.gz"
+        path = os.path.join(self.directory, name)
+
+        with open(path + ".part", "wb") as fh:
+            hasher = HashingWriter(fh)
+            with gzip.GzipFile(fileobj=hasher, mode="wb", mtime=0) as out:
+                for row in rows:
+                    out.write(json.dumps(row, separators=(",", ":")).encode())
+                    out.write(b"\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        os.replace(path + ".part", path)
+
+        entry = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "file": name,
+            "rows": len(rows),
+            "sha256": hasher.sha256.hexdigest(),
+            "min_id": min(row["id"] for row in rows),
+            "max_id": max(row["id"] for row in rows),
+            "since": min(row["created_at"] for row in rows),
+            "until": max(row["created_at"] for row in rows),
+            "archived_at": timezone.now().isoformat(),
+        }
+
+        with open(self.manifest_path, "a") as fh:
+            fh.write(json.dumps(entry) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        return entry
+
+    def read_chunk(self, entry: dict, verify: bool = True):
+        path = os.path.join(self.directory, entry["file"])
+
+        if verify and file_sha256(path) != entry["sha256"]:
+            raise AuditArchiveError(f"Checksum mismatch: {entry['file']}")
+
+        return read_rows(path)
+
+    def recover(self) -> int:
+        """
+        Retires any rows of the last chunk still in the table (the run
+        that wrote it stopped before its delete committed).
+        """
+
+        chunks = self.chunks()
+
+        if not chunks:
+            return 0
+
+        return retire(list(self.read_chunk(chunks[-1])))
+
+    def archive_batch(self, batch_size: int, now=None) -> int:
+        rows = [
+            _encode(row)
+            for row in expired_audits(now).values(*ARCHIVED_FIELDS)[:batch_size]
+        ]
+
+        if not rows:
+            return 0
+
+        self.write_chunk(rows)
+        return retire(rows)
+
+
+# ---------------------------------------------------
+# Rollups & Deletion
+# ---------------------------------------------------
+
+def retire(rows: list) -> int:
+    """
+    Adds archived rows to the daily rollups and deletes them, in one
+    transaction. Rows already gone are skipped, so re-running is safe.
+    """
+
+    with transaction.atomic():
+        present = set(
+            ExternalSearchAudit.objects
+            .select_for_update()
+            .filter(id__in=[row["id"] for row in rows])
+            .values_list("id", flat=True)
+        )
+
+        totals = {}
+
+        for row in rows:
+            if row["id"] not in present:
+                continue
+
+            day = datetime.fromisoformat(row["created_at"]).astimezone(
+                timezone.get_current_timezone()
+            ).date()
+
+            key = (row["auditor_id"], row["tenant_id"], day, row["success"])
+            total = totals.setdefault(key, [0, 0, 0, 0, 0.0])
+            total[0] += 1
+            total[1] += bool(row["truncated"])
+            total[2] += row["total_matches"]
+            total[3] += row["returned_count"]
+            total[4] += row["execution_time_ms"]
+
+        for (auditor_id, tenant_id, day, success), total in totals.items():
+            rollup, _ = ExternalSearchAuditRollup.objects.get_or_create(
+                auditor_id=auditor_id,
+                day=day,
+                success=success,
+                defaults={"tenant_id": tenant_id}
+            )
+            ExternalSearchAuditRollup.objects.filter(pk=rollup.pk).update(
+                searches=F("searches") + total[0],
+                truncated=F("truncated") + total[1],
+                total_matches=F("total_matches") + total[2],
+                returned_count=F("returned_count") + total[3],
+                execution_ms_total=F("execution_ms_total") + total[4],
+            )
+
+        ExternalSearchAudit.objects.filter(id__in=present).delete()
+
+    return len(present)
+
+
+def compact_audit_table() -> bool:
+    """
+    VACUUM ANALYZE the audit table after a large delete so its pages
+    and index entries are reused. A no-op off PostgreSQL.
+    """
+
+    if connection.vendor != "postgresql":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"VACUUM (ANALYZE) "
+            f"{connection.ops.quote_name(ExternalSearchAudit._meta.db_table)}"
+        )
+
+    return True
+
+
+# ---------------------------------------------------
+# Archive Queries
+# ---------------------------------------------------
+
+def scan_archive(archive: AuditArchive, auditor_id=None, since=None,
+                 until=None, success=None, keyword_hash=None, verify=True):
+    """
+    Archived rows matching the filters, chunk by chunk. since / until
+    are aware datetimes (until exclusive); chunks whose time range
+    misses the window are skipped without being opened.
+    """
+
+    for entry in archive.chunks():
+        if since is not None and datetime.fromisoformat(entry["until"]) < since:
+            continue
+        if until is not None and datetime.fromisoformat(entry["since"]) >= until:
+            continue
+
+        for row in archive.read_chunk(entry, verify=verify):
+            if auditor_id is not None and row["auditor_id"] != auditor_id:
+                continue
+            if success is not None and row["success"] != success:
+                continue
+            if keyword_hash and row["keyword_hash"] != keyword_hash:
+                continue
+
+            if since is not None or until is not None:
+                created_at = datetime.fromisoformat(row["created_at"])
+                if since is not None and created_at < since:
+                    continue
+                if until is not None and created_at >= until:
+                    continue
+
+            yield row
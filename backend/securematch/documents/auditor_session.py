@@ -0,0 +1,130 @@
+# documents/auditor_session.py
+
+import hmac
+import hashlib
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+
+
+CHALLENGE_CACHE = "auditor_challenges"
+CHALLENGE_SALT = "documents.auditor_session.challenge"
+SESSION_SALT = "documents.auditor_session.token"
+SESSION_KEY_SALT = "documents.auditor_session.key"
+
+
+# ---------------------------------------------------
+# Handshake Challenge
+# ---------------------------------------------------
+
+def issue_challenge(auditor_id) -> str:
+    """
+    Server-issued nonce the auditor signs with their private key.
+    Signed and time-limited; only redeemed nonces are stored.
+    """
+
+    return signing.dumps(
+        {"a": int(auditor_id), "n": secrets.token_hex(16)},
+        salt=CHALLENGE_SALT,
+        compress=True
+    )
+
+
+def challenge_matches(challenge: str, auditor_id) -> bool:
+    try:
+        payload = signing.loads(
+            challenge,
+            salt=CHALLENGE_SALT,
+            max_age=settings.AUDITOR_CHALLENGE_TTL_SECONDS
+        )
+    except signing.BadSignature:
+        return False
+
+    return payload.get("a") == int(auditor_id)
+
+
+def redeem_challenge(challenge: str) -> bool:
+    """
+    Marks a challenge that challenge_matches() accepted as used. False
+    if it already was, so each signed challenge buys one session. The
+    marker outlives the challenge's max_age.
+    """
+
+    nonce = signing.loads(challenge, salt=CHALLENGE_SALT)["n"]
+
+    return caches[CHALLENGE_CACHE].add(
+        f"challenge:{nonce}", 1, settings.AUDITOR_CHALLENGE_TTL_SECONDS + 1
+    )
+
+
+# ---------------------------------------------------
+# Session Tokens
+# ---------------------------------------------------
+
+def _session_key(token: str) -> str:
+    return salted_hmac(SESSION_KEY_SALT, token, algorithm="sha256").hexdigest()
+
+
+def issue_session(auditor) -> dict:
+    """
+    HMAC-authenticated token bound to auditor_id and key_version.
+    The session key is handed out once and used to MAC each search.
+    """
+
+    token = signing.dumps(
+        {"a": auditor.id, "v": auditor.key_version, "s": secrets.token_hex(8)},
+        salt=SESSION_SALT,
+        compress=True
+    )
+
+    return {
+        "session_token": token,
+        "session_key": _session_key(token),
+        "expires_at": int(time.time()) + settings.AUDITOR_SESSION_TTL_SECONDS,
+    }
+
+
+def load_session(token: str):
+    """
+    Returns the token payload, or None if forged or expired.
+    """
+
+    try:
+        return signing.loads(
+            token,
+            salt=SESSION_SALT,
+            max_age=settings.AUDITOR_SESSION_TTL_SECONDS
+        )
+    except signing.BadSignature:
+        return None
+
+
+def verify_session_mac(token: str, keyword_hash: str, mac_hex: str) -> bool:
+    expected = hmac.new(
+        bytes.fromhex(_session_key(token)),
+        keyword_hash.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+    return hmac.compare_digest(expected, str(mac_hex).lower())
+
+
+def session_is_valid(auditor, token: str, keyword_hash: str, mac_hex: str) -> bool:
+    """
+    A session survives only while the auditor's key_version is unchanged,
+    so key rotation revokes every outstanding session.
+    """
+
+    payload = load_session(token)
+
+    if payload is None:
+        return False
+
+    if payload.get("a") != auditor.id or payload.get("v") != auditor.key_version:
+        return False
+
+    return verify_session_mac(token, keyword_hash, mac_hex)
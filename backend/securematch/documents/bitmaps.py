@@ -0,0 +1,184 @@
+# documents/bitmaps.py
+
+import sys
+from array import array
+
+
+# Roaring layout: ids split on their high bits into containers of
+# 2^16 ids; each container is stored as a sorted uint16 array while
+# sparse and as a 65536-bit bitmap once that is smaller.
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+CONTAINER_MASK = CONTAINER_SIZE - 1
+BITMAP_BYTES = CONTAINER_SIZE // 8
+ARRAY_MAX = BITMAP_BYTES // 2
+
+ARRAY_CONTAINER = b"\x00"
+BITMAP_CONTAINER = b"\x01"
+
+_BYTE_OFFSETS = [
+    tuple(bit for bit in range(8) if byte >> bit & 1)
+    for byte in range(256)
+]
+
+
+# ---------------------------------------------------
+# Containers (an int used as a 65536-bit set)
+# ---------------------------------------------------
+
+def container_key(document_id: int) -> int:
+    return document_id >> CONTAINER_BITS
+
+
+def container_from_offsets(offsets) -> int:
+    buffer = bytearray(BITMAP_BYTES)
+
+    for offset in offsets:
+        buffer[offset >> 3] |= 1 << (offset & 7)
+
+    return int.from_bytes(buffer, "little")
+
+
+def container_offsets(bits: int):
+    """
+    Set offsets of a container, ascending.
+    """
+
+    data = bits.to_bytes(BITMAP_BYTES, "little")
+
+    for index, byte in enumerate(data):
+        if byte:
+            base = index << 3
+            for bit in _BYTE_OFFSETS[byte]:
+                yield base + bit
+
+
+def serialize_container(bits: int) -> bytes:
+    """
+    Array form while it holds at most 4096 ids (<= 8 KiB), else the
+    fixed 8 KiB bitmap. Empty containers serialize to b"".
+    """
+
+    cardinality = bits.bit_count()
+
+    if not cardinality:
+        return b""
+
+    if cardinality > ARRAY_MAX:
+        return BITMAP_CONTAINER + bits.to_bytes(BITMAP_BYTES, "little")
+
+    values = array("H", container_offsets(bits))
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    return ARRAY_CONTAINER + values.tobytes()
+
+
+def deserialize_container(data: bytes) -> int:
+    if not data:
+        return 0
+
+    data = bytes(data)
+
+    if data[:1] == BITMAP_CONTAINER:
+        return int.from_bytes(data[1:], "little")
+
+    values = array("H")
+    values.frombytes(data[1:])
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    return container_from_offsets(values)
+
+
+# ---------------------------------------------------
+# Bitmap
+# ---------------------------------------------------
+
+class RoaringBitmap:
+    """
+    Set of document ids as {container key: 65536-bit int}. AND / OR /
+    difference run container by container as machine-word operations
+    on the ints, so intersecting million-id sets never builds a
+    Python set.
+    """
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers=None):
+        self.containers = {
+            key: bits for key, bits in (containers or {}).items() if bits
+        }
+
+    @classmethod
+    def from_ids(cls, ids) -> "RoaringBitmap":
+        grouped = {}
+
+        for document_id in ids:
+            grouped.setdefault(document_id >> CONTAINER_BITS, []).append(
+                document_id & CONTAINER_MASK
+            )
+
+        return cls({
+            key: container_from_offsets(offsets)
+            for key, offsets in grouped.items()
+        })
+
+    def __len__(self) -> int:
+        return sum(bits.bit_count() for bits in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __contains__(self, document_id: int) -> bool:
+        bits = self.containers.get(document_id >> CONTAINER_BITS, 0)
+        return bool(bits >> (document_id & CONTAINER_MASK) & 1)
+
+    def __iter__(self):
+        for key in sorted(self.containers):
+            base = key << CONTAINER_BITS
+            for offset in container_offsets(self.containers[key]):
+                yield base + offset
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        small, large = sorted((self.containers, other.containers), key=len)
+        return RoaringBitmap({
+            key: bits & large[key]
+            for key, bits in small.items()
+            if key in large
+        })
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        merged = dict(self.containers)
+
+        for key, bits in other.containers.items():
+            merged[key] = merged.get(key, 0) | bits
+
+        return RoaringBitmap(merged)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return RoaringBitmap({
+            key: bits & ~other.containers.get(key, 0)
+            for key, bits in self.containers.items()
+        })
+
+    def first(self, count: int) -> list:
+        """
+        The `count` lowest ids, without walking whole containers.
+        """
+
+        ids = []
+
+        for key in sorted(self.containers):
+            bits = self.containers[key]
+            base = key << CONTAINER_BITS
+
+            while bits and len(ids) < count:
+                lowest = bits & -bits
+                ids.append(base + lowest.bit_length() - 1)
+                bits ^= lowest
+
+            if len(ids) >= count:
+                break
+
+        return ids
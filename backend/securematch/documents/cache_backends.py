@@ -0,0 +1,75 @@
+# documents/cache_backends.py
+
+import fcntl
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class CounterFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache whose add() and incr() are atomic across processes,
+    so cache.add(key, 0) + cache.incr(key) works as a shared counter
+    (as on memcached or redis). incr() also keeps the key's expiry
+    instead of resetting it to the default timeout.
+
+    Both hold one flock on the cache directory; plain get() / set()
+    stay lock-free. Culling, which lists the whole directory, runs at
+    most once per CULL_INTERVAL seconds per process instead of on
+    every write.
+    """
+
+    LOCK_FILE = "counters.lock"
+    CULL_INTERVAL = 10.0
+
+    # Cache directory -> monotonic time of the next cull; shared by the
+    # per-thread instances of this process
+    _next_cull = {}
+
+    def _cull(self):
+        now = time.monotonic()
+
+        if now < self._next_cull.get(self._dir, 0.0):
+            return
+
+        self._next_cull[self._dir] = now + self.CULL_INTERVAL
+        super()._cull()
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self._dir, exist_ok=True)
+
+        with open(os.path.join(self._dir, self.LOCK_FILE), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            try:
+                with open(self._key_to_file(key, version), "rb") as fh:
+                    expiry = pickle.load(fh)
+                    value = pickle.loads(zlib.decompress(fh.read()))
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found")
+
+            if expiry is not None and expiry < time.time():
+                self.delete(key, version)
+                raise ValueError(f"Key '{key}' not found")
+
+            value += delta
+            timeout = None if expiry is None else max(expiry - time.time(), 1)
+            self.set(key, value, timeout, version)
+
+        return value
@@ -0,0 +1,53 @@
+# documents/db.py
+
+from django.db import connections, transaction
+
+
+# ---------------------------------------------------
+# Connection Pool Stats
+# ---------------------------------------------------
+
+def pool_stats(alias="default"):
+    """
+    psycopg connection-pool counters for metrics.
+    Returns None when pooling is disabled (DB_POOL unset).
+    """
+
+    pool = getattr(connections[alias], "pool", None)
+
+    if pool is None:
+        return None
+
+    stats = pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+
+    return {
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "requests": requests,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "acquire_wait_ms_total": wait_ms,
+        "acquire_wait_ms_avg": round(wait_ms / requests, 2) if requests else 0,
+    }
+
+
+# ---------------------------------------------------
+# Large Scans
+# ---------------------------------------------------
+
+def stream_queryset(queryset, chunk_size=2000):
+    """
+    Iterate a large queryset through a named server-side cursor,
+    holding at most chunk_size rows in client memory.
+
+    The cursor is opened inside a transaction so it also works behind
+    transaction-mode poolers such as Neon's "-pooler" endpoints.
+    """
+
+    with transaction.atomic(using=queryset.db):
+        yield from queryset.iterator(chunk_size=chunk_size)
@@ -0,0 +1,179 @@
+# documents/frequency.py
+
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .models import ExternalSearchAudit
+
+
+# ---------------------------------------------------
+# Sliding-Window Search Frequency Tracker
+# ---------------------------------------------------
+
+class SearchFrequencyTracker:
+    """
+    Per-auditor sliding window of external search counts.
+
+    Each auditor gets one counter per minute in a shared cache, bumped
+    with cache.add() + cache.incr() so concurrent searches in different
+    workers never overwrite each other's counts, and a running total of
+    the window. A minute leaves the total (once, guarded by cache.add())
+    when it slides out of the window, so reading the total costs two
+    keys however long the window is.
+
+    The total expires a window after it was seeded and is then reseeded
+    from the audit table, which also corrects any drift.
+    """
+
+    def __init__(self, cache_alias="search_frequency", window_minutes=60):
+        self.cache_alias = cache_alias
+        self.window_minutes = window_minutes
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def timeout(self):
+        return self.window_minutes * 60
+
+    def _key(self, auditor_id, minute):
+        return f"search_freq:{auditor_id}:{minute}"
+
+    def _total_key(self, auditor_id):
+        return f"search_freq:{auditor_id}:total"
+
+    def _drained_key(self, auditor_id):
+        # Last minute subtracted from the total
+        return f"search_freq:{auditor_id}:drained"
+
+    def _drain_key(self, auditor_id, minute):
+        return f"search_freq:{auditor_id}:{minute}:drained"
+
+    def _window_keys(self, auditor_id, now_minute):
+        return [
+            self._key(auditor_id, minute)
+            for minute in range(now_minute - self.window_minutes + 1, now_minute + 1)
+        ]
+
+    def _current_minute(self):
+        return int(time.time() // 60)
+
+    def _seed(self, auditor_id, now_minute):
+        """
+        Load the window's counts and total from the audit table.
+        cache.add() leaves counters and a total other workers have
+        already started untouched.
+        """
+
+        since = timezone.now() - timedelta(minutes=self.window_minutes)
+
+        buckets = (
+            ExternalSearchAudit.objects
+            .filter(auditor_id=auditor_id, created_at__gte=since)
+            .annotate(minute=TruncMinute("created_at"))
+            .values("minute")
+            .annotate(total=Count("id"))
+        )
+
+        total = 0
+
+        for bucket in buckets:
+            minute = int(bucket["minute"].timestamp() // 60)
+
+            if now_minute - minute >= self.window_minutes:
+                continue
+
+            # Kept until drained, a window after the minute ends
+            self.cache.add(self._key(auditor_id, minute), bucket["total"], 2 * self.timeout)
+            total += bucket["total"]
+
+        if self.cache.add(self._total_key(auditor_id), total, self.timeout):
+            self.cache.set(
+                self._drained_key(auditor_id),
+                now_minute - self.window_minutes,
+                self.timeout
+            )
+
+    def _total(self, auditor_id, now_minute):
+        """
+        The window total, after subtracting minutes that left the window.
+        """
+
+        total_key = self._total_key(auditor_id)
+        values = self.cache.get_many([total_key, self._drained_key(auditor_id)])
+
+        if total_key not in values:
+            self._seed(auditor_id, now_minute)
+            values = self.cache.get_many([total_key, self._drained_key(auditor_id)])
+
+        total = values.get(total_key, 0)
+        oldest = now_minute - self.window_minutes
+        drained = values.get(self._drained_key(auditor_id), oldest)
+
+        if drained >= oldest:
+            return total
+
+        for minute in range(max(drained, oldest - self.window_minutes) + 1, oldest + 1):
+            # Whichever worker gets here first subtracts the minute
+            if not self.cache.add(self._drain_key(auditor_id, minute), 1, 2 * self.timeout):
+                continue
+
+            expired = self.cache.get(self._key(auditor_id, minute))
+
+            if expired:
+                try:
+                    total = self.cache.decr(total_key, expired)
+                except ValueError:
+                    # The total expired meanwhile; the reseed excludes it
+                    pass
+
+        self.cache.set(self._drained_key(auditor_id), oldest, self.timeout)
+        return max(total, 0)
+
+    def count(self, auditor_id) -> int:
+        """
+        Searches recorded for the auditor within the window.
+        """
+
+        return self._total(auditor_id, self._current_minute())
+
+    def record(self, auditor_id) -> int:
+        """
+        Count one search in the current minute. Call it before writing
+        the search's audit row, which a cold-cache seed would count too.
+        Returns the window total including this search.
+        """
+
+        now_minute = self._current_minute()
+        # Seeds a cold cache and drains expired minutes first
+        self._total(auditor_id, now_minute)
+
+        key = self._key(auditor_id, now_minute)
+        self.cache.add(key, 0, 2 * self.timeout)
+
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Expired or evicted between add() and incr()
+            self.cache.add(key, 1, 2 * self.timeout)
+
+        try:
+            return self.cache.incr(self._total_key(auditor_id))
+        except ValueError:
+            # The total expired meanwhile: reseed (without this search)
+            return self._total(auditor_id, now_minute) + 1
+
+    def reset(self, auditor_id):
+        self.cache.delete_many(
+            self._window_keys(auditor_id, self._current_minute())
+            + [self._total_key(auditor_id), self._drained_key(auditor_id)]
+        )
+
+
+search_frequency = SearchFrequencyTracker()
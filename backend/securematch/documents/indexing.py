@@ -0,0 +1,256 @@
+# documents/indexing.py
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from crypto_engine.peks import hash_keyword
+from crypto_engine.sse import (
+    active_key_version,
+    generate_compound_token,
+    generate_compound_trapdoors,
+    generate_token,
+    generate_trapdoors
+)
+
+from .constants import COMPOUND_FIELDS, SEARCHABLE_FIELDS
+from .models import SearchTokenIndex
+from .postings import (
+    add_postings,
+    document_postings,
+    is_bitmap_field,
+    update_postings
+)
+from .tenancy import tenant_key_context
+
+
+# ---------------------------------------------------
+# Token Extraction
+# ---------------------------------------------------
+
+def searchable_values(data: dict):
+    """
+    Yields (field, value) for every non-empty searchable field.
+    """
+
+    for field in SEARCHABLE_FIELDS:
+        if field in data and data[field] is not None:
+
+            value = str(data[field]).strip()
+            if not value:
+                continue
+
+            yield field, value
+
+
+def compound_label(fields) -> str:
+    return "+".join(fields)
+
+
+def compound_values(values: dict):
+    """
+    Yields (fields, values) for every COMPOUND_FIELDS combination
+    fully present in `values` ({field: value}, from searchable_values).
+    """
+
+    for fields in COMPOUND_FIELDS:
+        if all(field in values for field in fields):
+            yield fields, [values[field] for field in fields]
+
+
+def compound_tokens(data: dict, key_version: int, key_context: str,
+                    labels=None) -> list:
+    """
+    The document's compound tokens (all combinations, or those whose
+    label is in `labels`).
+    """
+
+    return [
+        generate_compound_token(fields, values, key_version, key_context)
+        for fields, values in compound_values(dict(searchable_values(data)))
+        if labels is None or compound_label(fields) in labels
+    ]
+
+
+def document_tokens(data: dict, key_version: int, key_context: str,
+                    fields=None) -> tuple:
+    """
+    ([(token, external_token), ...], {(posting token, external), ...})
+    for a document: token rows, where compound tokens are internal only
+    (no external keyword hash), and the posting lists of
+    BITMAP_INDEX_FIELDS (HMAC token and external keyword hash).
+    `fields` limits both to those fields and compound labels.
+
+    The one place tokens are derived from a document's values: uploads,
+    updates, rotation, reindex and the synthetic loader all use it. No
+    database access, so it also runs in worker processes.
+    """
+
+    tokens, postings = [], set()
+
+    for field, value in searchable_values(data):
+        if fields is not None and field not in fields:
+            continue
+
+        token = generate_token(field, value, key_version, key_context)
+
+        if is_bitmap_field(field):
+            postings.add((token, False))
+            postings.add((hash_keyword(value), True))
+        else:
+            tokens.append((token, hash_keyword(value)))
+
+    tokens.extend(
+        (token, None)
+        for token in compound_tokens(data, key_version, key_context, fields)
+    )
+
+    return tokens, postings
+
+
+def build_index_entries(doc, data: dict, key_version: int = None) -> tuple:
+    """
+    (unsaved SearchTokenIndex rows ready for bulk_create, posting-list
+    keys) for a document, with the document tenant's keys.
+    """
+
+    key_version = key_version or active_key_version()
+    tokens, postings = document_tokens(
+        data, key_version, tenant_key_context(doc.tenant_id)
+    )
+
+    rows = [
+        SearchTokenIndex(
+            token=token,
+            external_token=external_token,
+            document=doc,
+            tenant_id=doc.tenant_id,
+            key_version=key_version
+        )
+        for token, external_token in tokens
+    ]
+
+    return rows, postings
+
+
+def index_document(doc, data: dict, key_version: int = None):
+    """
+    Writes a new document's token rows and posting-list entries.
+    """
+
+    rows, postings = build_index_entries(doc, data, key_version)
+
+    SearchTokenIndex.objects.bulk_create(rows)
+    add_postings(doc.tenant_id, {key: [doc.id] for key in postings})
+
+
+def sync_document_tokens(doc, data: dict, key_version: int = None):
+    """
+    Rewrites only the token rows and posting-list entries that differ
+    between the document's current index entries and `data`. Call inside the transaction that
+    saves the document. Returns (added, removed).
+    """
+
+    key_version = key_version or active_key_version()
+
+    existing = {
+        (token, external_token): row_id
+        for row_id, token, external_token in (
+            SearchTokenIndex.objects
+            .filter(document=doc)
+            .values_list("id", "token", "external_token")
+        )
+    }
+
+    rows, want = build_index_entries(doc, data, key_version)
+    desired = {(row.token, row.external_token): row for row in rows}
+
+    stale_ids = [
+        row_id for pair, row_id in existing.items() if pair not in desired
+    ]
+    new_rows = [
+        row for pair, row in desired.items() if pair not in existing
+    ]
+
+    if stale_ids:
+        SearchTokenIndex.objects.filter(id__in=stale_ids).delete()
+
+    if new_rows:
+        SearchTokenIndex.objects.bulk_create(new_rows)
+
+    have = document_postings([doc.id]).get(doc.id, set())
+
+    update_postings(
+        doc.tenant_id,
+        added={key: [doc.id] for key in want - have},
+        removed={key: [doc.id] for key in have - want}
+    )
+
+    return (
+        len(new_rows) + len(want - have),
+        len(stale_ids) + len(have - want)
+    )
+
+
+# ---------------------------------------------------
+# Query Trapdoors
+# ---------------------------------------------------
+
+def query_trapdoors(query_data: dict, key_context: str) -> list:
+    """
+    [(field, trapdoors), ...] for an internal query (AND). With
+    COMPOUND_TOKEN_SEARCH, fields covered by a COMPOUND_FIELDS
+    combination become one (label, trapdoors) pair: a single lookup
+    instead of one per field and an intersection.
+    """
+
+    values = {field: str(value) for field, value in query_data.items()}
+    trapdoors = []
+
+    if settings.COMPOUND_TOKEN_SEARCH:
+        for fields, field_values in compound_values(values):
+            if all(value.strip() for value in field_values):
+                trapdoors.append((
+                    compound_label(fields),
+                    generate_compound_trapdoors(fields, field_values, key_context)
+                ))
+
+                for field in fields:
+                    del values[field]
+
+    trapdoors.extend(
+        (field, generate_trapdoors(field, value, key_context))
+        for field, value in values.items()
+    )
+
+    return trapdoors
+
+
+# ---------------------------------------------------
+# Bulk (Re)indexing
+# ---------------------------------------------------
+
+def ordered_pool_map(func, arg_tuples, workers: int):
+    """
+    Yields func(*args) in input order. With workers > 1 the calls run in
+    a process pool with at most 2 * workers in flight, so memory stays
+    bounded however long the input is.
+    """
+
+    if workers <= 1:
+        for args in arg_tuples:
+            yield func(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        for args in arg_tuples:
+            pending.append(executor.submit(func, *args))
+
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,205 @@
+# documents/instrumentation.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# ---------------------------------------------------
+# Metric Definitions
+# ---------------------------------------------------
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples to
+# mmap'd files in that directory and the endpoint sums them.
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+STAGE_SECONDS = Histogram(
+    "securematch_stage_seconds",
+    "Time spent in each request stage",
+    ["stage"],
+    buckets=(
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+        0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    ),
+)
+
+UPLOADS = Counter(
+    "securematch_uploads_total",
+    "Documents encrypted and indexed",
+)
+
+SEARCHES = Counter(
+    "securematch_searches_total",
+    "Completed searches by kind and whether anything matched",
+    ["kind", "outcome"],
+)
+
+FAILURES = Counter(
+    "securematch_failures_total",
+    "Error responses by error_response code",
+    ["code"],
+)
+
+# livesum: the endpoint reports the pooled keypairs of running workers
+KEYPOOL_DEPTH = Gauge(
+    "securematch_keypool_depth",
+    "RSA keypairs ready in the auditor keypair pools",
+    multiprocess_mode="livesum",
+)
+
+KEYPOOL_MISSES = Counter(
+    "securematch_keypool_misses_total",
+    "Auditor keypairs generated inline because the pool was empty",
+)
+
+
+# ---------------------------------------------------
+# Per-Request Timings (Server-Timing / query budget)
+# ---------------------------------------------------
+
+class RequestTimings:
+    """
+    Stage spans and DB query totals for the current request. Updated
+    under a lock: scatter() workers share the request's instance.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.queries = 0
+        self.db_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, ms: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def add_query(self, ms: float):
+        with self._lock:
+            self.queries += 1
+            self.db_ms += ms
+
+
+# A context variable follows the request into sync_to_async threads,
+# so async views are accounted the same way as sync ones.
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def begin_request_timings() -> RequestTimings:
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def end_request_timings():
+    _request_timings.set(None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every DB connection.
+    Only accounts queries issued while a request is being timed.
+    """
+
+    timings = _request_timings.get()
+
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query((time.perf_counter() - start) * 1000)
+
+
+# ---------------------------------------------------
+# Recording Helpers
+# ---------------------------------------------------
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the enclosed block into the per-stage histogram.
+    Stages: trapdoor, index_lookup, document_fetch, decrypt, render,
+    signature_verification, audit_write, encrypt, index_write.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add_span(name, elapsed * 1000)
+
+
+def record_upload():
+    UPLOADS.inc()
+
+
+def record_search(kind: str, total_matches: int):
+    SEARCHES.labels(kind, "hit" if total_matches else "miss").inc()
+
+
+def record_failure(code: str):
+    FAILURES.labels(code).inc()
+
+
+def record_keypool_depth(depth: int):
+    KEYPOOL_DEPTH.set(depth)
+
+
+def record_keypool_miss():
+    KEYPOOL_MISSES.inc()
+
+
+# ---------------------------------------------------
+# Exposition
+# ---------------------------------------------------
+
+def render_latest():
+    """
+    Returns (body, content_type) in the Prometheus text format,
+    aggregated across worker processes when multiprocess mode is on.
+    """
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class RenderTimingMixin:
+    """
+    Renders DRF responses inside the view so serialisation time
+    lands in the "render" stage.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        if hasattr(response, "render") and not response.is_rendered:
+            with stage("render"):
+                response.render()
+
+        return response
@@ -0,0 +1,241 @@
+# documents/loadtest.py
+
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from crypto_engine.peks import generate_trapdoor_private
+
+from .synthetic import synthetic_record
+
+
+ENDPOINTS = {
+    "upload": "upload/",
+    "internal": "search/internal/",
+    "external": "search/external/",
+}
+
+# Which field an internal search filters on (names dominate lookups)
+INTERNAL_QUERY_FIELDS = [
+    ("name", 0.4),
+    ("pan", 0.25),
+    ("customer_id", 0.2),
+    ("aadhaar", 0.1),
+    ("compliance_flag", 0.05),
+]
+
+
+def parse_mix(text: str) -> dict:
+    """
+    "upload=1,internal=6,external=3" -> {"upload": 1.0, ...}
+    """
+
+    mix = {}
+
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {kind!r}")
+
+        mix[kind] = float(weight or 1)
+
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+# ---------------------------------------------------
+# Request Bodies
+# ---------------------------------------------------
+
+class Workload:
+    """
+    Request bodies drawn from the same distributions as the loaded
+    dataset. External searches use a pool of keywords signed up front,
+    so client-side RSA signing never competes with the measured server.
+    """
+
+    def __init__(self, dataset_size: int, seed: int = 0,
+                 auditor_id: int = None, private_pem: str = None,
+                 signed_keywords: int = 200):
+        self.dataset_size = max(dataset_size, 1)
+        self.seed = seed
+        self.auditor_id = auditor_id
+        self._uploads = itertools.count(self.dataset_size)
+        self._signed = []
+
+        if auditor_id is not None:
+            rng = random.Random(seed)
+            for _ in range(signed_keywords):
+                _, value = self._known_value(rng)
+                self._signed.append(generate_trapdoor_private(value, private_pem))
+
+    def _known_value(self, rng):
+        record = synthetic_record(rng.randrange(self.dataset_size), self.seed)
+        fields, weights = zip(*INTERNAL_QUERY_FIELDS)
+        field = rng.choices(fields, weights)[0]
+        return field, record[field]
+
+    def body(self, kind: str, rng) -> dict:
+        if kind == "upload":
+            # Fresh indices past the dataset, so uploads never collide
+            return synthetic_record(next(self._uploads), self.seed)
+
+        if kind == "internal":
+            field, value = self._known_value(rng)
+            return {field: value}
+
+        keyword_hash, signature = rng.choice(self._signed)
+        return {
+            "auditor_id": self.auditor_id,
+            "keyword_hash": keyword_hash,
+            "signature": signature,
+        }
+
+
+# ---------------------------------------------------
+# Driver
+# ---------------------------------------------------
+
+def percentile(sorted_values, fraction: float):
+    if not sorted_values:
+        return None
+
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class _Client:
+    """
+    One keep-alive HTTP connection per driver thread.
+    """
+
+    def __init__(self, base_url: str, tenant: str = None):
+        parts = urlsplit(base_url)
+        self._headers = {"Content-Type": "application/json"}
+
+        if tenant:
+            self._headers[settings.TENANT_HEADER] = tenant
+
+        connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+
+        self._connect = lambda: connection_class(parts.netloc, timeout=60)
+        self._prefix = parts.path.rstrip("/") + "/"
+        self._conn = self._connect()
+
+    def post(self, path: str, body: dict) -> int:
+        payload = json.dumps(body)
+        headers = self._headers
+
+        try:
+            self._conn.request("POST", self._prefix + path, payload, headers)
+            response = self._conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the idle connection; retry once on a new one
+            self._conn.close()
+            self._conn = self._connect()
+            self._conn.request("POST", self._prefix + path, payload, headers)
+            response = self._conn.getresponse()
+
+        response.read()
+        return response.status
+
+
+def run_load(base_url: str, workload: Workload, mix: dict,
+             concurrency: int = 8, duration: float = 30.0,
+             max_requests: int = 0, seed: int = 0, tenant: str = None) -> dict:
+    """
+    Drives the endpoints from `concurrency` threads at the given mix
+    until `duration` seconds pass or `max_requests` have been sent.
+    """
+
+    kinds, weights = zip(*mix.items())
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    sent = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def drive(worker_id):
+        rng = random.Random(seed * 7919 + worker_id)
+        client = _Client(base_url, tenant)
+
+        while time.perf_counter() < deadline:
+            if max_requests and next(sent) >= max_requests:
+                return
+
+            kind = rng.choices(kinds, weights)[0]
+            body = workload.body(kind, rng)
+
+            start = time.perf_counter()
+            try:
+                code = client.post(ENDPOINTS[kind], body)
+            except (http.client.HTTPException, OSError):
+                code = 0
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with lock:
+                statuses[kind][code] += 1
+                if 200 <= code < 300:
+                    samples[kind].append(elapsed_ms)
+
+    threads = [
+        threading.Thread(target=drive, args=(i,), daemon=True)
+        for i in range(concurrency)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    return summarize(samples, statuses, wall_seconds, concurrency, mix)
+
+
+def summarize(samples, statuses, wall_seconds, concurrency, mix) -> dict:
+    endpoints = {}
+
+    for kind in mix:
+        latencies = sorted(samples.get(kind, []))
+        total = sum(statuses.get(kind, {}).values())
+
+        endpoints[kind] = {
+            "requests": total,
+            "ok": len(latencies),
+            "errors": total - len(latencies),
+            "statuses": {str(code): n for code, n in sorted(statuses.get(kind, {}).items())},
+            "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0,
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50_ms": _round(percentile(latencies, 0.50)),
+            "p95_ms": _round(percentile(latencies, 0.95)),
+            "p99_ms": _round(percentile(latencies, 0.99)),
+            "max_ms": _round(latencies[-1] if latencies else None),
+        }
+
+    ok = sum(item["ok"] for item in endpoints.values())
+
+    return {
+        "wall_seconds": round(wall_seconds, 2),
+        "concurrency": concurrency,
+        "mix": mix,
+        "total_ok": ok,
+        "total_throughput_rps": round(ok / wall_seconds, 2) if wall_seconds else 0,
+        "endpoints": endpoints,
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
@@ -0,0 +1,88 @@
+# documents/management/commands/archive_audit_logs.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.audit_retention import (
+    AuditArchive,
+    AuditArchiveError,
+    compact_audit_table,
+    expired_audits
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move ExternalSearchAudit rows past their retention window "
+        "(AUDIT_RETENTION_DAYS / AUDIT_FAILURE_RETENTION_DAYS) into "
+        "checksummed gzip JSONL chunks under AUDIT_ARCHIVE_DIR, keeping "
+        "daily rollups. Run it from cron; safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.2,
+            help="Seconds to pause between batches (rate limit)."
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=None,
+            help="Defaults to AUDIT_ARCHIVE_DIR."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be archived."
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="VACUUM ANALYZE the audit table afterwards (PostgreSQL)."
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Dry run: {expired_audits().count()} audit rows would be archived"
+            )
+            return
+
+        archive = AuditArchive(options["archive_dir"] or settings.AUDIT_ARCHIVE_DIR)
+
+        try:
+            with archive.lock():
+                archived = self._archive(archive, options)
+        except AuditArchiveError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} audit rows to {archive.directory}"
+        ))
+
+    def _archive(self, archive, options) -> int:
+        recovered = archive.recover()
+        if recovered:
+            self.stdout.write(f"Finished an interrupted chunk: {recovered} rows")
+
+        archived = 0
+
+        while True:
+            count = archive.archive_batch(options["batch_size"])
+
+            if not count:
+                break
+
+            archived += count
+            self.stdout.write(f"  chunk: {count} rows archived")
+
+            time.sleep(options["sleep"])
+
+        if options["vacuum"] and archived and compact_audit_table():
+            self.stdout.write("Audit table vacuumed")
+
+        return archived
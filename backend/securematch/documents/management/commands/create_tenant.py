@@ -0,0 +1,39 @@
+# documents/management/commands/create_tenant.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from documents.models import Tenant
+from documents.tenancy import token_partition_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Register a tenant. Its SSE keys are derived from the master key "
+        "with the slug as context, and on PostgreSQL its token partition "
+        "is created immediately."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug")
+        parser.add_argument("--name", help="Display name (default: the slug).")
+
+    def handle(self, *args, **options):
+        slug = options["slug"]
+
+        if slugify(slug) != slug:
+            raise CommandError(f"Invalid tenant slug {slug!r}")
+
+        if Tenant.objects.filter(slug=slug).exists():
+            raise CommandError(f"Tenant '{slug}' already exists")
+
+        tenant = Tenant.objects.create(
+            slug=slug,
+            name=options["name"] or slug,
+            key_context=slug
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created tenant '{slug}' (id {tenant.id}, token partition "
+            f"{token_partition_name(tenant.id)} on PostgreSQL)"
+        ))
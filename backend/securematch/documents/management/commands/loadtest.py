@@ -0,0 +1,163 @@
+# documents/management/commands/loadtest.py
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crypto_engine.peks import generate_keypair
+from documents.loadtest import Workload, parse_mix, run_load
+from documents.models import Auditor, EncryptedDocument
+from documents.sharding import scatter
+from documents.tenancy import get_tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive upload/, search/internal/ and search/external/ concurrently "
+        "against a running server and report throughput and p50/p95/p99. "
+        "Start the server with LOAD_TEST_MODE=True to bypass throttles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/")
+        parser.add_argument(
+            "--mix",
+            default="upload=1,internal=6,external=3",
+            help="Relative request weights per endpoint."
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=30.0)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=0,
+            help="Stop after this many requests (0 = run for --duration)."
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed the dataset was loaded with (load_synthetic --seed)."
+        )
+        parser.add_argument(
+            "--dataset-size",
+            type=int,
+            default=None,
+            help="Records loaded by load_synthetic (default: document count)."
+        )
+        parser.add_argument(
+            "--signed-keywords",
+            type=int,
+            default=200,
+            help="Keywords pre-signed for external searches."
+        )
+        parser.add_argument(
+            "--tenant",
+            default=settings.DEFAULT_TENANT,
+            help="Tenant slug sent in TENANT_HEADER (load_synthetic --tenant)."
+        )
+        parser.add_argument("--output", help="Write the JSON report here.")
+        parser.add_argument(
+            "--keep-auditor",
+            action="store_true",
+            help="Keep the temporary auditor and its audit rows."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if not mix:
+            raise CommandError("--mix selects no endpoints")
+
+        tenant = get_tenant(options["tenant"])
+
+        if tenant is None:
+            raise CommandError(f"Unknown tenant {options['tenant']!r}")
+
+        dataset_size = options["dataset_size"]
+        if dataset_size is None:
+            counts, _ = scatter(
+                lambda: EncryptedDocument.objects.live().filter(
+                    tenant=tenant
+                ).count()
+            )
+            dataset_size = sum(counts.values())
+
+        auditor = None
+        private_pem = None
+
+        if "external" in mix:
+            private_pem, public_pem = generate_keypair()
+            auditor = Auditor.objects.create(
+                tenant=tenant,
+                name="loadtest",
+                public_key=public_pem
+            )
+
+        try:
+            workload = Workload(
+                dataset_size,
+                seed=options["seed"],
+                auditor_id=auditor.id if auditor else None,
+                private_pem=private_pem,
+                signed_keywords=options["signed_keywords"]
+            )
+
+            self.stdout.write(
+                f"Driving {options['base_url']} with {options['concurrency']} "
+                f"workers, mix {mix}, dataset of {dataset_size}"
+            )
+
+            report = run_load(
+                options["base_url"],
+                workload,
+                mix,
+                concurrency=options["concurrency"],
+                duration=options["duration"],
+                max_requests=options["requests"],
+                seed=options["seed"],
+                tenant=tenant.slug
+            )
+        finally:
+            if auditor is not None and not options["keep_auditor"]:
+                auditor.delete()
+
+        report["dataset_size"] = dataset_size
+
+        self.stdout.write(
+            f"{'endpoint':10} {'ok':>8} {'err':>6} {'rps':>9} "
+            f"{'p50':>9} {'p95':>9} {'p99':>9}"
+        )
+        for kind, result in report["endpoints"].items():
+            self.stdout.write(
+                f"{kind:10} {result['ok']:>8} {result['errors']:>6} "
+                f"{result['throughput_rps']:>9} "
+                f"{_ms(result['p50_ms'])} {_ms(result['p95_ms'])} "
+                f"{_ms(result['p99_ms'])}"
+            )
+        self.stdout.write(
+            f"total: {report['total_ok']} ok in {report['wall_seconds']}s "
+            f"({report['total_throughput_rps']} req/s)"
+        )
+
+        throttled = sum(
+            result["statuses"].get("429", 0)
+            for result in report["endpoints"].values()
+        )
+        if throttled:
+            self.stderr.write(
+                f"{throttled} requests were throttled; restart the server "
+                "with LOAD_TEST_MODE=True for capacity numbers."
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+
+
+def _ms(value):
+    return f"{value:>7.1f}ms" if value is not None else f"{'-':>9}"
@@ -0,0 +1,96 @@
+# documents/management/commands/purge_deleted_documents.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from documents.models import EncryptedDocument, SearchTokenIndex
+from documents.postings import remove_documents
+from documents.sharding import document_db, document_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove tombstoned documents and their token rows in small "
+        "batches, so large deletions never hold long locks on the index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.2,
+            help="Seconds to pause between batches (rate limit)."
+        )
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=0,
+            help="Only purge documents deleted at least this many seconds ago."
+        )
+        parser.add_argument(
+            "--watch",
+            type=float,
+            default=0,
+            help="Keep running, re-checking every N seconds (background worker)."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purged = self.purge(options)
+
+            if purged:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Purged {purged} deleted documents"
+                ))
+
+            if not options["watch"]:
+                return
+
+            time.sleep(options["watch"])
+
+    def purge(self, options) -> int:
+        cutoff = timezone.now() - timedelta(seconds=options["older_than"])
+        purged = 0
+
+        for alias in document_shards():
+            with use_shard(alias):
+                purged += self.purge_shard(cutoff, options)
+
+        return purged
+
+    def purge_shard(self, cutoff, options) -> int:
+        purged = 0
+
+        while True:
+            ids = list(
+                EncryptedDocument.objects
+                .filter(deleted_at__lte=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:options["batch_size"]]
+            )
+
+            if not ids:
+                return purged
+
+            with transaction.atomic(using=document_db()):
+                tokens, _ = SearchTokenIndex.objects.filter(
+                    document_id__in=ids
+                ).delete()
+                # Normally already done by the delete views
+                remove_documents(ids)
+                docs, _ = EncryptedDocument.objects.filter(
+                    id__in=ids,
+                    deleted_at__isnull=False
+                ).delete()
+
+            purged += docs
+            self.stdout.write(
+                f"  batch: {docs} documents, {tokens} tokens removed"
+            )
+
+            time.sleep(options["sleep"])
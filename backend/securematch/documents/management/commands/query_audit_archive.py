@@ -0,0 +1,80 @@
+# documents/management/commands/query_audit_archive.py
+
+import csv
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from documents.audit_retention import (
+    ARCHIVED_FIELDS,
+    AuditArchive,
+    AuditArchiveError,
+    scan_archive
+)
+
+
+def _timestamp(value):
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Not an ISO 8601 timestamp: {value}")
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_current_timezone())
+
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan archived audit rows (archive_audit_logs) locally and print "
+        "the matching ones as NDJSON or CSV. Every chunk read is checked "
+        "against its manifest sha256."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--archive-dir", default=None)
+        parser.add_argument("--auditor", type=int, default=None)
+        parser.add_argument("--since", default=None)
+        parser.add_argument("--until", default=None, help="Exclusive.")
+        parser.add_argument("--keyword-hash", default=None)
+
+        outcome = parser.add_mutually_exclusive_group()
+        outcome.add_argument("--success", action="store_true")
+        outcome.add_argument("--failed", action="store_true")
+
+        parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument(
+            "--count",
+            action="store_true",
+            help="Only print the number of matching rows."
+        )
+
+    def handle(self, *args, **options):
+        archive = AuditArchive(options["archive_dir"] or settings.AUDIT_ARCHIVE_DIR)
+
+        rows = scan_archive(
+            archive,
+            auditor_id=options["auditor"],
+            since=_timestamp(options["since"]) if options["since"] else None,
+            until=_timestamp(options["until"]) if options["until"] else None,
+            success=True if options["success"] else False if options["failed"] else None,
+            keyword_hash=options["keyword_hash"],
+        )
+
+        try:
+            if options["count"]:
+                self.stdout.write(str(sum(1 for _ in rows)))
+            elif options["format"] == "csv":
+                writer = csv.writer(self.stdout, lineterminator="\n")
+                writer.writerow(ARCHIVED_FIELDS)
+                for row in rows:
+                    writer.writerow(row[field] for field in ARCHIVED_FIELDS)
+            else:
+                for row in rows:
+                    self.stdout.write(json.dumps(row))
+        except AuditArchiveError as exc:
+            raise CommandError(str(exc))
@@ -0,0 +1,162 @@
+# documents/management/commands/rebalance_shards.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from documents.models import EncryptedDocument, SearchTokenIndex
+from documents.postings import add_postings, document_postings, remove_documents
+from documents.sharding import (
+    advance_id_allocation,
+    shard_for,
+    sync_tenants,
+    use_shard
+)
+
+
+DOCUMENT_FIELDS = [
+    "id", "tenant_id", "encrypted_blob", "key_version",
+    "created_at", "updated_at", "deleted_at",
+]
+TOKEN_FIELDS = ["token", "external_token", "document_id", "tenant_id", "key_version"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prepare shards (tenants, id sequence) and move documents with "
+        "their tokens onto the shard that owns them. Run after adding a "
+        "shard to DB_SHARD_HOSTS, or once when enabling sharding on an "
+        "existing database. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.2,
+            help="Seconds to pause between batches (rate limit)."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the documents that would move."
+        )
+
+    def handle(self, *args, **options):
+        shards = list(settings.DATABASE_SHARDS)
+
+        if not shards:
+            raise CommandError("Sharding is off (DB_SHARD_HOSTS is empty)")
+
+        # Documents stored before sharding was enabled live on "default"
+        sources = ["default", *shards]
+
+        for alias in shards:
+            synced = sync_tenants(alias)
+            self.stdout.write(f"{alias}: {synced} tenants in sync")
+
+        max_id = 0
+        for alias in sources:
+            with use_shard(alias):
+                max_id = max(
+                    max_id,
+                    EncryptedDocument.objects.aggregate(Max("id"))["id__max"] or 0
+                )
+        advance_id_allocation(max_id)
+
+        moved = 0
+
+        for source in sources:
+            count = self.rebalance(source, options)
+            moved += count
+
+            if count:
+                self.stdout.write(
+                    f"{source}: {count} documents "
+                    f"{'to move' if options['dry_run'] else 'moved'}"
+                )
+
+        if options["dry_run"]:
+            self.stdout.write(f"Dry run: {moved} documents would move")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebalance complete: {moved} documents moved"
+            ))
+
+    def rebalance(self, source, options) -> int:
+        moved = 0
+        after_id = 0
+
+        while True:
+            with use_shard(source), transaction.atomic(using=source):
+                docs = list(
+                    EncryptedDocument.objects
+                    .filter(id__gt=after_id)
+                    .order_by("id")
+                    .select_for_update()
+                    .values(*DOCUMENT_FIELDS)[:options["batch_size"]]
+                )
+
+                if not docs:
+                    return moved
+
+                after_id = docs[-1]["id"]
+                by_target = {}
+
+                for doc in docs:
+                    target = shard_for(doc["id"])
+                    if target != source:
+                        by_target.setdefault(target, []).append(doc)
+
+                if not by_target or options["dry_run"]:
+                    moved += sum(len(group) for group in by_target.values())
+                    continue
+
+                for target, group in by_target.items():
+                    ids = [doc["id"] for doc in group]
+                    tokens = list(
+                        SearchTokenIndex.objects
+                        .filter(document_id__in=ids)
+                        .values(*TOKEN_FIELDS)
+                    )
+
+                    # {tenant_id: {(token, external): [document_id, ...]}}
+                    postings = {}
+                    posted = document_postings(ids)
+                    for doc in group:
+                        for key in posted.get(doc["id"], ()):
+                            postings.setdefault(doc["tenant_id"], {}).setdefault(
+                                key, []
+                            ).append(doc["id"])
+
+                    # Replace, so a re-run after a crash never duplicates
+                    with use_shard(target), transaction.atomic(using=target):
+                        SearchTokenIndex.objects.filter(document_id__in=ids).delete()
+                        EncryptedDocument.objects.filter(id__in=ids).delete()
+                        created = EncryptedDocument.objects.bulk_create(
+                            [EncryptedDocument(**doc) for doc in group]
+                        )
+
+                        # auto_now_add overwrote created_at on insert
+                        for obj, doc in zip(created, group):
+                            obj.created_at = doc["created_at"]
+                        EncryptedDocument.objects.bulk_update(created, ["created_at"])
+
+                        SearchTokenIndex.objects.bulk_create(
+                            [SearchTokenIndex(**token) for token in tokens]
+                        )
+
+                        remove_documents(ids)
+                        for tenant_id, tenant_postings in postings.items():
+                            add_postings(tenant_id, tenant_postings)
+
+                    SearchTokenIndex.objects.filter(document_id__in=ids).delete()
+                    EncryptedDocument.objects.filter(id__in=ids).delete()
+                    remove_documents(ids)
+                    moved += len(group)
+
+            time.sleep(options["sleep"])
@@ -0,0 +1,119 @@
+# documents/management/commands/reindex.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.constants import COMPOUND_FIELDS, SEARCHABLE_FIELDS
+from documents.indexing import compound_label
+from documents.reindex import ReindexCheckpoint, reindex
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild SearchTokenIndex rows from the stored documents after "
+        "SEARCHABLE_FIELDS, COMPOUND_FIELDS or normalize() changes. "
+        "Resumable and throttleable; only missing (and, for a full run, "
+        "stale) tokens are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fields",
+            nargs="+",
+            help="Only add tokens for these fields or compound labels such "
+                 "as name+customer_id (default: all SEARCHABLE_FIELDS and "
+                 "COMPOUND_FIELDS, also removing stale tokens)."
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes used for decryption and tokenization."
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.2,
+            help="Seconds to pause between chunks (rate limit)."
+        )
+        parser.add_argument(
+            "--max-chunks",
+            type=int,
+            default=0,
+            help="Stop after this many chunks (0 = run to completion)."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=settings.REINDEX_CHECKPOINT_PATH,
+            help="Progress file used to resume an interrupted run."
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any checkpoint and start from the first document."
+        )
+
+    def handle(self, *args, **options):
+        known = list(SEARCHABLE_FIELDS) + [
+            compound_label(fields) for fields in COMPOUND_FIELDS
+        ]
+        fields = options["fields"] or known
+        unknown = set(fields) - set(known)
+
+        if unknown:
+            raise CommandError(
+                f"{sorted(unknown)} not in SEARCHABLE_FIELDS or "
+                "COMPOUND_FIELDS; add them to documents/constants.py first "
+                "so uploads index them too."
+            )
+
+        # Pruning needs the full desired token set of each document
+        prune = not options["fields"]
+        checkpoint = ReindexCheckpoint(options["checkpoint"], fields, prune)
+
+        if not options["restart"] and checkpoint.load():
+            self.stdout.write(
+                f"Resuming after document {checkpoint.last_id}"
+                + (f" on {checkpoint.shard}" if checkpoint.shard else "")
+            )
+
+        started = time.perf_counter()
+        chunks = [0]
+
+        def after_chunk(stats):
+            chunks[0] += 1
+            self.stdout.write(
+                f"  chunk {chunks[0]}: up to id {checkpoint.last_id}, "
+                f"{stats['documents']} docs, +{stats['added']} "
+                f"-{stats['removed']} tokens"
+            )
+
+            if options["max_chunks"] and chunks[0] >= options["max_chunks"]:
+                return False
+
+            time.sleep(options["sleep"])
+
+        finished = reindex(
+            fields,
+            checkpoint,
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            after_chunk=after_chunk
+        )
+
+        if not finished:
+            self.stdout.write("Stopped early; re-run to resume.")
+            return
+
+        stats = checkpoint.stats
+        checkpoint.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reindex complete in {time.perf_counter() - started:.1f}s: "
+            f"{stats['documents']} documents, {stats['added']} tokens added, "
+            f"{stats['removed']} removed, {stats['skipped']} skipped "
+            "(changed meanwhile)"
+        ))
@@ -0,0 +1,142 @@
+# documents/management/commands/rotate_master_key.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from crypto_engine.sse import (
+    active_key_version,
+    loaded_key_versions,
+    encrypt_document,
+    decrypt_document
+)
+
+from documents.indexing import build_index_entries
+from documents.models import EncryptedDocument, SearchTokenIndex
+from documents.postings import add_postings, remove_documents
+from documents.sharding import document_db, document_shards, use_shard
+from documents.tenancy import tenant_key_context
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encrypt documents and rewrite their tokens under the active "
+        "master key, in batches. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Seconds to pause between batches (rate limit)."
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=0,
+            help="Stop after this many batches (0 = run to completion)."
+        )
+
+    def handle(self, *args, **options):
+        active_version = active_key_version()
+        pending = EncryptedDocument.objects.live().exclude(
+            key_version=active_version
+        )
+
+        stale_versions = set()
+        remaining = 0
+
+        # Querysets resolve their database when evaluated, per shard
+        for alias in document_shards():
+            with use_shard(alias):
+                stale_versions.update(
+                    pending.values_list("key_version", flat=True).distinct()
+                )
+                remaining += pending.count()
+
+        missing = stale_versions - set(loaded_key_versions())
+
+        if missing:
+            raise CommandError(
+                f"Key versions {sorted(missing)} are not loaded; "
+                "add them to RETIRED_MASTER_KEYS before rotating."
+            )
+
+        self.stdout.write(
+            f"Rotating to key v{active_version}: {remaining} documents pending"
+        )
+
+        self.batches = 0
+        self.remaining = remaining
+
+        for alias in document_shards():
+            with use_shard(alias):
+                if not self.rotate(pending, active_version, options):
+                    self.stdout.write("Stopped early; re-run to resume.")
+                    return
+
+        self.stdout.write(self.style.SUCCESS(
+            "Rotation complete. Retired keys can now be removed from "
+            "RETIRED_MASTER_KEYS."
+        ))
+
+    def rotate(self, pending, active_version, options) -> bool:
+        """
+        Rotates the active shard; False when --max-batches was reached.
+        """
+
+        while True:
+            with transaction.atomic(using=document_db()):
+                docs = list(
+                    pending
+                    .order_by("id")
+                    .select_for_update(skip_locked=True)[:options["batch_size"]]
+                )
+
+                if not docs:
+                    return True
+
+                token_rows = []
+                postings = {}
+
+                for doc in docs:
+                    data = decrypt_document(doc.encrypted_blob)
+                    doc.encrypted_blob = encrypt_document(
+                        data,
+                        active_version,
+                        tenant_key_context(doc.tenant_id)
+                    )
+                    doc.key_version = active_version
+                    rows, keys = build_index_entries(doc, data, active_version)
+                    token_rows.extend(rows)
+
+                    for key in keys:
+                        postings.setdefault(doc.tenant_id, {}).setdefault(
+                            key, []
+                        ).append(doc.id)
+
+                EncryptedDocument.objects.bulk_update(
+                    docs,
+                    ["encrypted_blob", "key_version"]
+                )
+                SearchTokenIndex.objects.filter(document__in=docs).delete()
+                SearchTokenIndex.objects.bulk_create(token_rows)
+
+                remove_documents([doc.id for doc in docs])
+                for tenant_id, tenant_postings in postings.items():
+                    add_postings(tenant_id, tenant_postings)
+
+            self.remaining = max(self.remaining - len(docs), 0)
+            self.batches += 1
+            self.stdout.write(
+                f"  batch {self.batches}: {len(docs)} re-encrypted, "
+                f"~{self.remaining} left"
+            )
+
+            if options["max_batches"] and self.batches >= options["max_batches"]:
+                return False
+
+            time.sleep(options["sleep"])
@@ -0,0 +1,686 @@
+# documents/memory_index.py
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .db import stream_queryset
+from .models import EncryptedDocument, SearchTokenIndex
+from .segments import Layer, Postings, Segment, SegmentStore, merge_layers, write_segment
+from .sharding import document_db, document_shards, use_shard
+
+
+logger = logging.getLogger("documents.memory_index")
+
+# Rows per tail query (and per streamed chunk on load)
+TAIL_BATCH = 50000
+
+# Delta entries + tombstones that trigger a merge into the base arrays
+COMPACT_ROWS = 200000
+# Delta segments merged into one past this count
+MAX_DELTA_SEGMENTS = 8
+
+# How long rows committed out of id / timestamp order are still picked
+# up (longest expected write transaction)
+SETTLE_SECONDS = 30
+MAX_GAPS = 64
+
+TAIL_FIELDS = ["id", "tenant_id", "token", "external_token", "document_id"]
+
+_TOKEN = re.compile(r"[0-9a-f]{64}")
+
+
+def token_key(token: str):
+    """
+    The token's first 8 bytes as a uint64, or None for anything that
+    is not a 64-character hex token (it can never match).
+    """
+
+    if not token or not _TOKEN.fullmatch(token):
+        return None
+
+    return int(token[:16], 16)
+
+
+def _keys(tokens: list) -> np.ndarray:
+    """
+    uint64 prefixes of known-good hex tokens, in one pass over the
+    concatenated hex.
+    """
+
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+
+    raw = bytes.fromhex("".join(token[:16] for token in tokens))
+    return np.frombuffer(raw, dtype=">u8").astype(np.uint64)
+
+
+def intersect(arrays: list) -> np.ndarray:
+    """
+    AND of sorted unique id arrays, smallest first.
+    """
+
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+
+    for ids in arrays[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, ids, assume_unique=True)
+
+    return result
+
+
+# ---------------------------------------------------
+# One Database's Index
+# ---------------------------------------------------
+
+class ShardIndex:
+    """
+    Every SearchTokenIndex row of one document database, as immutable
+    layers (oldest first) plus the rows tailed since the last flush:
+
+    * rows with ids past the last one seen are tailed into `delta`;
+      id gaps (transactions still open) are re-read for SETTLE_SECONDS;
+    * documents updated or deleted since the last poll are tombstoned
+      (their postings in older layers hidden) and their rows re-added.
+
+    Without a segment store the layers are private NumPy arrays and
+    the delta is merged into them past COMPACT_ROWS. With one, the
+    worker holding the store's writer lock flushes the delta into a
+    small segment file every poll and compacts them LSM-style; every
+    other worker maps the published segments and never queries SQL.
+
+    Only the refresh thread writes; searches read under _lock.
+    """
+
+    def __init__(self, alias: str, store: SegmentStore = None):
+        self.alias = alias
+        self.store = store
+        # Without a store, every worker tails its own copy
+        self.writer = store is None
+        self.ready = False
+
+        self._lock = threading.Lock()
+        self.layers = []
+        self._reset_pending()
+
+        self.last_token_id = 0
+        # [(first_id, last_id, expires), ...] (wall clock: in the manifest)
+        self.gaps = []
+        # Ids already found in a gap, and {document_id: (updated_at,
+        # deleted_at)} already applied, so re-reads add nothing
+        self.gap_rows = set()
+        self.recent_changes = {}
+        self.changes_since = None
+
+        self.generation = None
+        self.next_segment = 1
+        self.built_at = None
+        self.refreshed_at = None
+
+    def _reset_pending(self):
+        # {(tenant_id, external, key): {document_id, ...}}
+        self.delta = {}
+        # {document_id: {(tenant_id, external, key), ...}}
+        self.delta_docs = {}
+        # {tenant_id: sorted int64 ids whose postings in layers are stale}
+        self.tombstones = {}
+
+    def _pending_layer(self) -> Layer:
+        collected = {}
+
+        for (tenant_id, external, key), ids in self.delta.items():
+            keys, doc_ids = collected.setdefault((tenant_id, external), ([], []))
+            keys.append(np.full(len(ids), key, dtype=np.uint64))
+            doc_ids.append(np.fromiter(ids, dtype=np.int64, count=len(ids)))
+
+        return Layer(
+            {
+                group: Postings.build(np.concatenate(keys), np.concatenate(doc_ids))
+                for group, (keys, doc_ids) in collected.items()
+            },
+            dict(self.tombstones)
+        )
+
+    # ---------------------------------------------------
+    # Polling (refresh thread)
+    # ---------------------------------------------------
+
+    def poll(self):
+        if not self.writer:
+            self.writer = self.store.try_lock()
+
+            if not self.writer:
+                self.sync()
+                return
+
+            # Took over from a writer that exited: resume its tail
+            self.sync(resume=True)
+
+        rebuild_every = settings.MEMORY_INDEX_REBUILD_SECONDS
+
+        if not self.ready or (
+            rebuild_every and time.time() - self.built_at > rebuild_every
+        ):
+            self.load()
+        else:
+            self.refresh()
+
+    # ---------------------------------------------------
+    # Loading
+    # ---------------------------------------------------
+
+    def load(self):
+        """
+        Full (re)build from the database; searches keep using the
+        previous layers (or SQL) until it is swapped in.
+        """
+
+        started = timezone.now()
+        rows = SearchTokenIndex.objects.filter(
+            document__deleted_at__isnull=True
+        ).values_list(*TAIL_FIELDS)
+
+        ids = []
+        collected = {}
+
+        chunk = []
+        for row in stream_queryset(rows, chunk_size=TAIL_BATCH):
+            chunk.append(row)
+            if len(chunk) >= TAIL_BATCH:
+                ids.append(self._collect(chunk, collected))
+                chunk = []
+        ids.append(self._collect(chunk, collected))
+
+        base = Layer({
+            group: Postings.build(np.concatenate(keys), np.concatenate(doc_ids))
+            for group, (keys, doc_ids) in collected.items()
+        })
+
+        ids = np.sort(np.concatenate(ids))
+
+        with self._lock:
+            self._reset_pending()
+            self.layers = [self._persist(base)]
+            self.last_token_id = int(ids[-1]) if len(ids) else 0
+            self.gaps = self._find_gaps(0, ids)
+            self.gap_rows = set()
+            self.recent_changes = {}
+            self.changes_since = started - timedelta(seconds=SETTLE_SECONDS)
+            self.built_at = time.time()
+            self.refreshed_at = timezone.now()
+            self.ready = True
+
+        self._publish()
+
+        logger.info(
+            "Memory index %s: %d postings, %d bytes",
+            self.alias, len(base), base.nbytes
+        )
+
+    @staticmethod
+    def _collect(rows, collected) -> np.ndarray:
+        """
+        Adds a chunk of rows to {(tenant_id, external): ([keys], [ids])};
+        returns the chunk's token row ids.
+        """
+
+        groups = {}
+
+        for _, tenant_id, token, external_token, document_id in rows:
+            if token_key(token) is not None:
+                group = groups.setdefault((tenant_id, False), ([], []))
+                group[0].append(token)
+                group[1].append(document_id)
+
+            if token_key(external_token) is not None:
+                group = groups.setdefault((tenant_id, True), ([], []))
+                group[0].append(external_token)
+                group[1].append(document_id)
+
+        for group, (tokens, doc_ids) in groups.items():
+            keys, ids = collected.setdefault(group, ([], []))
+            keys.append(_keys(tokens))
+            ids.append(np.array(doc_ids, dtype=np.int64))
+
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    @staticmethod
+    def _find_gaps(after: int, ids: np.ndarray) -> list:
+        """
+        Missing id ranges between `after` and the sorted ids: rows of
+        transactions that may still commit (the newest MAX_GAPS).
+        """
+
+        if not len(ids):
+            return []
+
+        bounds = np.concatenate(([after], ids))
+        breaks = np.flatnonzero(np.diff(bounds) > 1)[-MAX_GAPS:]
+        expires = time.time() + SETTLE_SECONDS
+
+        return [
+            (int(bounds[index]) + 1, int(bounds[index + 1]) - 1, expires)
+            for index in breaks
+        ]
+
+    # ---------------------------------------------------
+    # Tailing
+    # ---------------------------------------------------
+
+    def refresh(self):
+        """
+        One poll: new token rows, then changed documents, then a flush
+        or merge of what was tailed.
+        """
+
+        started = timezone.now()
+
+        self.gaps = [gap for gap in self.gaps if gap[2] > time.time()]
+        tokens = SearchTokenIndex.objects.filter(document__deleted_at__isnull=True)
+
+        if self.gaps:
+            condition = Q()
+            for first_id, last_id, _ in self.gaps:
+                condition |= Q(id__range=(first_id, last_id))
+
+            rows = [
+                row for row in tokens.filter(condition).values_list(*TAIL_FIELDS)
+                if row[0] not in self.gap_rows
+            ]
+            self.gap_rows = {
+                row_id for row_id in self.gap_rows
+                if any(first_id <= row_id <= last_id for first_id, last_id, _ in self.gaps)
+            } | {row[0] for row in rows}
+
+            with self._lock:
+                self._add_rows(rows)
+
+        while True:
+            rows = list(
+                tokens.filter(id__gt=self.last_token_id)
+                .order_by("id")
+                .values_list(*TAIL_FIELDS)[:TAIL_BATCH]
+            )
+
+            if not rows:
+                break
+
+            with self._lock:
+                self._add_rows(rows)
+
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self.gaps = (
+                self.gaps + self._find_gaps(self.last_token_id, ids)
+            )[-MAX_GAPS:]
+            self.last_token_id = int(ids[-1])
+
+            if len(rows) < TAIL_BATCH:
+                break
+
+        # Documents are seen for SETTLE_SECONDS; apply each change once
+        changed = []
+        recent = {}
+
+        for doc_id, tenant_id, updated_at, deleted_at in (
+            EncryptedDocument.objects.filter(
+                Q(updated_at__gte=self.changes_since)
+                | Q(deleted_at__gte=self.changes_since)
+            ).values_list("id", "tenant_id", "updated_at", "deleted_at")
+        ):
+            recent[doc_id] = (updated_at, deleted_at)
+            if self.recent_changes.get(doc_id) != recent[doc_id]:
+                changed.append((doc_id, tenant_id, deleted_at))
+
+        self.recent_changes = recent
+
+        if changed:
+            live = [doc_id for doc_id, _, deleted_at in changed if deleted_at is None]
+            rows = list(
+                SearchTokenIndex.objects.filter(document_id__in=live)
+                .values_list(*TAIL_FIELDS)
+            ) if live else []
+
+            with self._lock:
+                self._tombstone(changed)
+                self._add_rows(rows)
+
+        self.changes_since = started - timedelta(seconds=SETTLE_SECONDS)
+        self.refreshed_at = timezone.now()
+
+        if self.store is not None:
+            self.flush()
+        elif len(self.delta_docs) + sum(map(len, self.tombstones.values())) > COMPACT_ROWS:
+            self.compact()
+
+    def _add_rows(self, rows):
+        for _, tenant_id, token, external_token, document_id in rows:
+            for external, value in ((False, token), (True, external_token)):
+                key = token_key(value)
+                if key is None:
+                    continue
+
+                entry = (tenant_id, external, key)
+                self.delta.setdefault(entry, set()).add(document_id)
+                self.delta_docs.setdefault(document_id, set()).add(entry)
+
+    def _tombstone(self, changed):
+        dead = {}
+
+        for document_id, tenant_id, _ in changed:
+            dead.setdefault(tenant_id, []).append(document_id)
+
+            for entry in self.delta_docs.pop(document_id, ()):
+                ids = self.delta[entry]
+                ids.discard(document_id)
+                if not ids:
+                    del self.delta[entry]
+
+        for tenant_id, ids in dead.items():
+            self.tombstones[tenant_id] = np.union1d(
+                self.tombstones.get(tenant_id, np.empty(0, dtype=np.int64)),
+                np.array(ids, dtype=np.int64)
+            )
+
+    # ---------------------------------------------------
+    # Flushing & Compaction
+    # ---------------------------------------------------
+
+    def compact(self):
+        """
+        Merges the pending rows into the layers (private arrays). Built
+        off-lock (only this thread writes), then swapped in.
+        """
+
+        merged = merge_layers([*self.layers, self._pending_layer()])
+
+        with self._lock:
+            self.layers = [merged]
+            self._reset_pending()
+
+    def flush(self):
+        """
+        Segment mode: the pending rows become a delta segment; deltas
+        are merged together past MAX_DELTA_SEGMENTS, and into a new
+        base once they hold COMPACT_ROWS entries.
+        """
+
+        if not self.delta and not self.tombstones:
+            return
+
+        segment = self._persist(self._pending_layer())
+
+        with self._lock:
+            self.layers = [*self.layers, segment]
+            self._reset_pending()
+
+        base, deltas = self.layers[0], self.layers[1:]
+
+        if sum(map(len, deltas)) > COMPACT_ROWS:
+            layers = [self._persist(merge_layers(self.layers))]
+        elif len(deltas) > MAX_DELTA_SEGMENTS:
+            layers = [base, self._persist(merge_layers(deltas, keep_tombstones=True))]
+        else:
+            layers = None
+
+        if layers is not None:
+            with self._lock:
+                self.layers = layers
+
+        self._publish()
+
+    def _persist(self, layer: Layer) -> Layer:
+        """
+        Segment mode: writes the layer out and returns it mapped.
+        """
+
+        if self.store is None:
+            return layer
+
+        path = self.store.path(f"{self.next_segment:012d}.seg")
+        self.next_segment += 1
+
+        write_segment(path, layer)
+        return Segment(path)
+
+    def _publish(self):
+        if self.store is None:
+            return
+
+        self.generation = (self.generation or 0) + 1
+
+        self.store.publish({
+            "generation": self.generation,
+            "segments": [segment.name for segment in self.layers],
+            "next_segment": self.next_segment,
+            "last_token_id": self.last_token_id,
+            "gaps": self.gaps,
+            "changes_since": self.changes_since.isoformat(),
+            "built_at": self.built_at,
+        })
+
+    def sync(self, resume: bool = False):
+        """
+        Reader: maps the segments of a newly published manifest (reusing
+        those already open). With resume, also takes over the tail
+        position, to continue as the writer.
+        """
+
+        manifest = self.store.read_manifest()
+
+        if manifest is None:
+            return
+
+        if manifest["generation"] != self.generation:
+            opened = {
+                layer.name: layer for layer in self.layers
+                if isinstance(layer, Segment)
+            }
+
+            try:
+                layers = [
+                    opened.get(name) or Segment(self.store.path(name))
+                    for name in manifest["segments"]
+                ]
+            except FileNotFoundError:
+                # Compacted away since the manifest was read: next poll
+                return
+
+            with self._lock:
+                self.layers = layers
+                self.generation = manifest["generation"]
+                self.built_at = manifest["built_at"]
+                self.refreshed_at = timezone.now()
+                self.ready = True
+
+        if resume:
+            self.next_segment = manifest["next_segment"]
+            self.last_token_id = manifest["last_token_id"]
+            self.gaps = [tuple(gap) for gap in manifest["gaps"]]
+            self.changes_since = datetime.fromisoformat(manifest["changes_since"])
+
+    # ---------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------
+
+    def _resolve(self, tenant_id, external, keys) -> np.ndarray:
+        """
+        Sorted unique ids carrying any of `keys` (caller holds _lock).
+        Newest first: a layer's tombstones hide postings of all older
+        layers.
+        """
+
+        parts = [
+            document_id
+            for key in keys.tolist()
+            for document_id in self.delta.get((tenant_id, external, key), ())
+        ]
+        parts = [np.array(parts, dtype=np.int64)] if parts else []
+        dead = self.tombstones.get(tenant_id)
+
+        for layer in reversed(self.layers):
+            postings = layer.groups.get((tenant_id, external))
+
+            if postings is not None:
+                found = postings.lookup(keys)
+                if dead is not None:
+                    found = [ids[~np.isin(ids, dead, assume_unique=True)] for ids in found]
+                parts.extend(found)
+
+            layer_dead = layer.tombstones.get(tenant_id)
+            if layer_dead is not None:
+                dead = layer_dead if dead is None else np.union1d(dead, layer_dead)
+
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def match(self, tenant_id: int, groups: list, external: bool = False) -> np.ndarray:
+        """
+        Sorted ids matching every group, where a group is the tokens of
+        one field (e.g. one trapdoor per key version) and matches any.
+        """
+
+        keys = [
+            np.array(
+                [key for key in map(token_key, tokens) if key is not None],
+                dtype=np.uint64
+            )
+            for tokens in groups
+        ]
+
+        with self._lock:
+            arrays = [self._resolve(tenant_id, external, group) for group in keys]
+
+        return intersect(arrays)
+
+    def stats(self) -> dict:
+        with self._lock:
+            segments = [layer for layer in self.layers if isinstance(layer, Segment)]
+
+            return {
+                "ready": self.ready,
+                "role": "writer" if self.writer else "reader",
+                "layers": len(self.layers),
+                "postings": sum(
+                    len(postings)
+                    for layer in self.layers for postings in layer.groups.values()
+                ),
+                "delta_documents": len(self.delta_docs),
+                "tombstones": sum(map(len, self.tombstones.values())),
+                # Private to this worker vs shared through the page cache
+                "bytes": sum(
+                    layer.nbytes for layer in self.layers
+                    if not isinstance(layer, Segment)
+                ),
+                "mapped_bytes": sum(segment.size for segment in segments),
+                "last_token_id": self.last_token_id,
+                "refreshed_at": (
+                    self.refreshed_at.isoformat() if self.refreshed_at else None
+                ),
+            }
+
+
+# ---------------------------------------------------
+# Per-Worker Engine
+# ---------------------------------------------------
+
+class MemoryIndex:
+    """
+    A ShardIndex per document database, loaded and then refreshed every
+    MEMORY_INDEX_REFRESH_SECONDS by a daemon thread. Searches fall back
+    to SQL for a shard until its first load has finished.
+
+    With MEMORY_INDEX_SEGMENT_DIR set, each database gets a segment
+    store in a subdirectory, shared by all workers on the host.
+    """
+
+    def __init__(self):
+        directory = settings.MEMORY_INDEX_SEGMENT_DIR
+
+        self.shards = {
+            alias: ShardIndex(
+                alias,
+                SegmentStore(os.path.join(str(directory), alias)) if directory else None
+            )
+            for alias in document_shards()
+        }
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Started after the server forks its workers (gunicorn
+        # post_worker_init, or on first use), never in manage.py commands
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._refresh_loop,
+                    name="memory-index",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            for alias, shard in self.shards.items():
+                try:
+                    with use_shard(alias):
+                        shard.poll()
+                except Exception:
+                    logger.exception("Memory index refresh failed on %s", alias)
+
+            close_old_connections()
+            time.sleep(settings.MEMORY_INDEX_REFRESH_SECONDS)
+
+    def stats(self) -> dict:
+        return {alias: shard.stats() for alias, shard in self.shards.items()}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_memory_index() -> MemoryIndex:
+    global _index
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = MemoryIndex()
+
+    return _index
+
+
+def start_memory_index():
+    if settings.MEMORY_INDEX_ENABLED:
+        get_memory_index().start()
+
+
+def memory_index():
+    """
+    The loaded ShardIndex of the active document database, or None
+    (disabled, or still loading) to search with SQL.
+    """
+
+    if not settings.MEMORY_INDEX_ENABLED:
+        return None
+
+    index = get_memory_index()
+    index.start()
+
+    shard = index.shards.get(document_db())
+    return shard if shard is not None and shard.ready else None
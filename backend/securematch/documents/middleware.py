@@ -0,0 +1,156 @@
+# documents/middleware.py
+
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import (
+    begin_request_timings,
+    end_request_timings,
+    record_failure
+)
+
+
+logger = logging.getLogger("documents.queries")
+
+
+# ---------------------------------------------------
+# Server-Timing & Query Budget
+# ---------------------------------------------------
+
+class QueryAccountingMiddleware:
+    """
+    Counts SQL queries and DB time per request, emits them with the
+    request's stage spans as a Server-Timing header, and logs a warning
+    naming the view when QUERY_BUDGET is exceeded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        timings = begin_request_timings()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request_timings()
+
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = begin_request_timings()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request_timings()
+
+        return self._finish(request, response, timings, start)
+
+    def _finish(self, request, response, timings, start):
+        total_ms = (time.perf_counter() - start) * 1000
+
+        if timings.queries > settings.QUERY_BUDGET:
+            match = getattr(request, "resolver_match", None)
+            logger.warning(
+                "%s ran %d queries (budget %d, %.1fms in DB) for %s %s",
+                match.view_name or match._func_path if match else "unresolved view",
+                timings.queries,
+                settings.QUERY_BUDGET,
+                timings.db_ms,
+                request.method,
+                request.path
+            )
+
+        if settings.SERVER_TIMING_ENABLED:
+            spans = [
+                f'db;dur={timings.db_ms:.2f};desc="{timings.queries} queries"'
+            ]
+            spans.extend(
+                f"{name};dur={ms:.2f}" for name, ms in timings.spans.items()
+            )
+            spans.append(f"total;dur={total_ms:.2f}")
+
+            response["Server-Timing"] = ", ".join(spans)
+
+            origin = request.headers.get("Origin")
+            if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+                response["Timing-Allow-Origin"] = origin
+
+        return response
+
+
+# ---------------------------------------------------
+# Error Metrics
+# ---------------------------------------------------
+
+def error_code(response):
+    """
+    The error_response code of a 4xx/5xx response, or None.
+    """
+
+    if response.status_code < 400 or response.streaming:
+        return None
+
+    data = getattr(response, "data", None)
+
+    # Plain JsonResponse (e.g. from TenantMiddleware)
+    if data is None and response.get("Content-Type", "").startswith("application/json"):
+        try:
+            data = json.loads(response.content)
+        except ValueError:
+            return None
+
+    if isinstance(data, dict) and data.get("status") == "error":
+        return data["error"].get("code")
+
+    return None
+
+
+class ErrorMetricsMiddleware:
+    """
+    Counts error responses by their error_response code
+    (securematch_failures_total), so building an error body stays free
+    of side effects.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        return self._record(self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._record(await self.get_response(request))
+
+    def _record(self, response):
+        code = error_code(response)
+
+        if code:
+            record_failure(code)
+
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_alter_auditor_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encrypteddocument',
+            name='key_version',
+            field=models.IntegerField(db_index=True, default=1),
+        ),
+        migrations.AddField(
+            model_name='searchtokenindex',
+            name='key_version',
+            field=models.IntegerField(default=1),
+        ),
+    ]
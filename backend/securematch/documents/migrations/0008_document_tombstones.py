@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_key_versioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encrypteddocument',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='encrypteddocument',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
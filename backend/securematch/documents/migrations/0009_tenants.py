@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('key_context', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='searchtokenindex',
+            name='documents_s_token_888480_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='searchtokenindex',
+            name='documents_s_externa_6b6d9a_idx',
+        ),
+        migrations.AddField(
+            model_name='auditor',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='auditors', to='documents.tenant'),
+        ),
+        migrations.AddField(
+            model_name='encrypteddocument',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='documents.tenant'),
+        ),
+        migrations.AddField(
+            model_name='externalsearchaudit',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant'),
+        ),
+        migrations.AddField(
+            model_name='searchtokenindex',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtokenindex',
+            index=models.Index(fields=['tenant', 'token'], name='documents_s_tenant__085e2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtokenindex',
+            index=models.Index(fields=['tenant', 'external_token'], name='documents_s_tenant__d44001_idx'),
+        ),
+    ]
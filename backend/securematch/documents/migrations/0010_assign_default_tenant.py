@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+DEFAULT_TENANT = "default"
+TENANT_MODELS = ["Auditor", "EncryptedDocument", "ExternalSearchAudit", "SearchTokenIndex"]
+
+
+def assign_default_tenant(apps, schema_editor):
+    """
+    Existing rows belong to a "default" tenant that keeps the original
+    key derivation (empty key_context), so they stay decryptable.
+    """
+
+    db_alias = schema_editor.connection.alias
+    Tenant = apps.get_model("documents", "Tenant")
+    tenant, _ = Tenant.objects.using(db_alias).get_or_create(
+        slug=DEFAULT_TENANT,
+        defaults={"name": "Default", "key_context": ""}
+    )
+
+    for model_name in TENANT_MODELS:
+        apps.get_model("documents", model_name).objects.using(db_alias).filter(
+            tenant__isnull=True
+        ).update(tenant=tenant)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_tenants'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_tenant, migrations.RunPython.noop),
+    ]
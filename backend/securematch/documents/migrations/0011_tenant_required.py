@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_assign_default_tenant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditor',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='auditors', to='documents.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='encrypteddocument',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='documents.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='externalsearchaudit',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='searchtokenindex',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant'),
+        ),
+    ]
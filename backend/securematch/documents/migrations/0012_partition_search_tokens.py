@@ -0,0 +1,90 @@
+from django.db import migrations
+
+
+TABLE = "documents_searchtokenindex"
+
+
+def partition_search_tokens(apps, schema_editor):
+    """
+    PostgreSQL only: rebuild the token table as LIST-partitioned by
+    tenant_id, with one partition per existing tenant plus a DEFAULT.
+
+    The primary key becomes (id, tenant_id), because PostgreSQL requires
+    the partition key in every unique constraint. Django still treats
+    `id` as the key, and the identity sequence keeps it unique.
+    EncryptedDocument stays a single table since the tokens reference
+    its id.
+    """
+
+    connection = schema_editor.connection
+
+    if connection.vendor != "postgresql":
+        return
+
+    old = f"{TABLE}_unpartitioned"
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TABLE])
+        if cursor.fetchone()[0] == "p":
+            return
+
+        # Secondary indexes, recreated on the new parent by name
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%'",
+            [TABLE]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {old}")
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (
+                id bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+                token varchar(64) NOT NULL,
+                external_token varchar(64) NULL,
+                key_version integer NOT NULL,
+                document_id bigint NOT NULL
+                    REFERENCES documents_encrypteddocument (id)
+                    DEFERRABLE INITIALLY DEFERRED,
+                tenant_id bigint NOT NULL
+                    REFERENCES documents_tenant (id)
+                    DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, tenant_id)
+            ) PARTITION BY LIST (tenant_id)
+        """)
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute("SELECT id FROM documents_tenant")
+        for (tenant_id,) in cursor.fetchall():
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_t{int(tenant_id)} "
+                f"PARTITION OF {TABLE} FOR VALUES IN ({int(tenant_id)})"
+            )
+
+        cursor.execute(f"""
+            INSERT INTO {TABLE}
+                (id, token, external_token, key_version, document_id, tenant_id)
+            SELECT id, token, external_token, key_version, document_id, tenant_id
+            FROM {old}
+        """)
+        cursor.execute(f"DROP TABLE {old}")
+
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"GREATEST((SELECT max(id) FROM {TABLE}), 1))"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_tenant_required'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_document_id_allocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='externalsearchaudit',
+            index=models.Index(fields=['auditor', '-created_at', '-id'], name='audit_auditor_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_audit_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalSearchAuditRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('success', models.BooleanField()),
+                ('searches', models.IntegerField(default=0)),
+                ('truncated', models.IntegerField(default=0)),
+                ('total_matches', models.BigIntegerField(default=0)),
+                ('returned_count', models.BigIntegerField(default=0)),
+                ('execution_ms_total', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'auditor'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='externalsearchaudit',
+            name='documents_e_auditor_37e5e2_idx',
+        ),
+        migrations.AddField(
+            model_name='externalsearchauditrollup',
+            name='auditor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='documents.auditor'),
+        ),
+        migrations.AddField(
+            model_name='externalsearchauditrollup',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant'),
+        ),
+        migrations.AddConstraint(
+            model_name='externalsearchauditrollup',
+            constraint=models.UniqueConstraint(fields=('auditor', 'day', 'success'), name='audit_rollup_unique_day'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_audit_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostingList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('external', models.BooleanField(default=False)),
+                ('container', models.IntegerField()),
+                ('bitmap', models.BinaryField()),
+                ('cardinality', models.IntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='documents.tenant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'external', 'token', 'container'), name='posting_list_unique_container')],
+            },
+        ),
+    ]
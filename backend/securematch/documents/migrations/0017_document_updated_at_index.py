@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0016_posting_lists'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='encrypteddocument',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
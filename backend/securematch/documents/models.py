@@ -1,13 +1,58 @@
 from django.db import models
 
 
+# ---------------------------------------------------
+# 🏦 Tenant (one per bank)
+# ---------------------------------------------------
+
+class Tenant(models.Model):
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=255)
+
+    # Key-derivation context ("" = original, pre-tenancy keys)
+    key_context = models.CharField(max_length=50, blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.slug
+
+
 # ---------------------------------------------------
 # 🔐 Encrypted Document Storage
 # ---------------------------------------------------
 
+class EncryptedDocumentQuerySet(models.QuerySet):
+    def live(self):
+        """
+        Documents that are not tombstoned (pending purge).
+        """
+        return self.filter(deleted_at__isnull=True)
+
+
 class EncryptedDocument(models.Model):
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="documents"
+    )
+
     encrypted_blob = models.JSONField()  # contains nonce + ciphertext
+
+    # 🔁 Master-key version the blob is encrypted under
+    key_version = models.IntegerField(default=1, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed: the in-memory index polls for recently changed documents
+    updated_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # 🪦 Tombstone: hidden from search now, rows purged in batches later
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = EncryptedDocumentQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -16,6 +61,21 @@ class EncryptedDocument(models.Model):
         return f"EncryptedDocument {self.id}"
 
 
+# ---------------------------------------------------
+# 🧩 Document Id Allocation (sharded mode)
+# ---------------------------------------------------
+
+class DocumentIdAllocation(models.Model):
+    """
+    Id source on the primary: shards store documents under ids drawn
+    here, so ids stay unique across shards. Rows are deleted right
+    after allocation; only the sequence matters.
+    """
+
+    class Meta:
+        ordering = ["id"]
+
+
 # ---------------------------------------------------
 # 🔎 Search Token Index (Dual Index: SSE + External)
 # ---------------------------------------------------
@@ -38,21 +98,75 @@ class SearchTokenIndex(models.Model):
         related_name="tokens"
     )
 
+    # Denormalised from the document: the PostgreSQL partition key
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="+"
+    )
+
+    # 🔁 Master-key version the HMAC token was derived with
+    key_version = models.IntegerField(default=1)
+
     class Meta:
         indexes = [
-            models.Index(fields=["token"]),
-            models.Index(fields=["external_token"]),
+            models.Index(fields=["tenant", "token"]),
+            models.Index(fields=["tenant", "external_token"]),
         ]
 
     def __str__(self):
         return f"TokenIndex Doc {self.document_id}"
 
 
+# ---------------------------------------------------
+# 🧮 Bitmap Posting Lists (BITMAP_INDEX_FIELDS)
+# ---------------------------------------------------
+
+class PostingList(models.Model):
+    """
+    Ids of the documents carrying one token, for fields with a handful
+    of values. One row per 65536-id container, serialized by
+    documents.bitmaps, in place of one SearchTokenIndex row per
+    document.
+    """
+
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="+"
+    )
+
+    # HMAC token, or the external keyword hash when `external`
+    token = models.CharField(max_length=64)
+    external = models.BooleanField(default=False)
+
+    container = models.IntegerField()
+    bitmap = models.BinaryField()
+    cardinality = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tenant", "external", "token", "container"],
+                name="posting_list_unique_container"
+            ),
+        ]
+
+    def __str__(self):
+        return f"PostingList {self.token[:8]}#{self.container} ({self.cardinality})"
+
+
 # ---------------------------------------------------
 # 👤 Auditor (Public Key + Key Rotation Support)
 # ---------------------------------------------------
 
 class Auditor(models.Model):
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="auditors"
+    )
+
     name = models.CharField(max_length=255)
     public_key = models.TextField()
 
@@ -79,6 +193,12 @@ class ExternalSearchAudit(models.Model):
         related_name="external_search_logs"
     )
 
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="+"
+    )
+
     keyword_hash = models.CharField(max_length=64, db_index=True)
 
     total_matches = models.IntegerField(default=0)
@@ -107,10 +227,14 @@ class ExternalSearchAudit(models.Model):
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["auditor"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["success"]),
             models.Index(fields=["keyword_hash"]),
+            # Keyset pagination of an auditor's logs
+            models.Index(
+                fields=["auditor", "-created_at", "-id"],
+                name="audit_auditor_keyset_idx"
+            ),
         ]
 
     def __str__(self):
@@ -118,4 +242,50 @@ class ExternalSearchAudit(models.Model):
         return (
             f"[{status}] Auditor {self.auditor.id} "
             f"(v{self.key_version}) - {self.created_at}"
-        )
\ No newline at end of file
+        )
+
+
+# ---------------------------------------------------
+# 📊 Archived Audit Rollups (manage.py archive_audit_logs)
+# ---------------------------------------------------
+
+class ExternalSearchAuditRollup(models.Model):
+    """
+    Daily per-auditor totals of audit rows that were moved to the
+    archive, so long-range metrics survive the retention window.
+    """
+
+    auditor = models.ForeignKey(
+        Auditor,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.PROTECT,
+        related_name="+"
+    )
+
+    day = models.DateField()
+    success = models.BooleanField()
+
+    searches = models.IntegerField(default=0)
+    truncated = models.IntegerField(default=0)
+    total_matches = models.BigIntegerField(default=0)
+    returned_count = models.BigIntegerField(default=0)
+    execution_ms_total = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["day", "auditor"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["auditor", "day", "success"],
+                name="audit_rollup_unique_day"
+            ),
+        ]
+
+    def __str__(self):
+        status = "SUCCESS" if self.success else "FAILED"
+        return f"[{status}] Auditor {self.auditor_id} {self.day}: {self.searches}"
+
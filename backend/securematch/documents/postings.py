@@ -0,0 +1,195 @@
+# documents/postings.py
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .bitmaps import RoaringBitmap, deserialize_container, serialize_container
+from .models import PostingList
+from .sharding import document_db
+
+
+def is_bitmap_field(field: str) -> bool:
+    return field in settings.BITMAP_INDEX_FIELDS
+
+
+# ---------------------------------------------------
+# Reads
+# ---------------------------------------------------
+
+def posting_bitmap(tenant_id: int, tokens, external: bool = False,
+                   containers=None) -> RoaringBitmap:
+    """
+    Union of the posting lists of `tokens` (e.g. one trapdoor per key
+    version). `containers` limits the load to those id ranges, when an
+    earlier, more selective lookup already bounds the result.
+    """
+
+    rows = PostingList.objects.filter(
+        tenant_id=tenant_id,
+        external=external,
+        token__in=list(tokens)
+    )
+
+    if containers is not None:
+        rows = rows.filter(container__in=list(containers))
+
+    merged = {}
+
+    for container, data in rows.values_list("container", "bitmap"):
+        merged[container] = merged.get(container, 0) | deserialize_container(data)
+
+    return RoaringBitmap(merged)
+
+
+def document_postings(document_ids) -> dict:
+    """
+    {document_id: {(token, external), ...}} for the given documents.
+    Reads every list of the documents' containers, which stays cheap
+    only because bitmap fields have few distinct values.
+    """
+
+    wanted = RoaringBitmap.from_ids(document_ids)
+    found = {}
+
+    rows = PostingList.objects.filter(
+        container__in=list(wanted.containers)
+    ).values_list("token", "external", "container", "bitmap")
+
+    for token, external, container, data in rows:
+        hits = RoaringBitmap(
+            {container: deserialize_container(data)}
+        ) & RoaringBitmap({container: wanted.containers[container]})
+
+        for document_id in hits:
+            found.setdefault(document_id, set()).add((token, external))
+
+    return found
+
+
+# ---------------------------------------------------
+# Writes (current shard; call inside or outside a transaction)
+# ---------------------------------------------------
+
+def _apply(tenant_id, added: dict, removed: dict, every_list=False) -> int:
+    """
+    added / removed: {(token, external): RoaringBitmap}. With
+    every_list, removed[None] is taken out of all lists (of every
+    tenant when tenant_id is None). Rows are locked in id order, so
+    concurrent writers never deadlock.
+    """
+
+    # No savepoint when nested: a failure here fails the caller's write
+    with transaction.atomic(using=document_db(), savepoint=False):
+        PostingList.objects.bulk_create(
+            [
+                PostingList(
+                    tenant_id=tenant_id,
+                    token=token,
+                    external=external,
+                    container=container,
+                    bitmap=b""
+                )
+                for (token, external), bitmap in added.items()
+                for container in bitmap.containers
+            ],
+            ignore_conflicts=True
+        )
+
+        if every_list:
+            condition = Q(container__in=list(removed[None].containers))
+        else:
+            condition = Q()
+            for (token, external), bitmap in [*added.items(), *removed.items()]:
+                condition |= Q(
+                    token=token,
+                    external=external,
+                    container__in=list(bitmap.containers)
+                )
+
+        rows = PostingList.objects.select_for_update().filter(condition)
+
+        if tenant_id is not None:
+            rows = rows.filter(tenant_id=tenant_id)
+
+        rows = list(rows.order_by("id"))
+
+        changed = []
+        emptied = []
+
+        for row in rows:
+            key = (row.token, row.external)
+            bits = deserialize_container(row.bitmap)
+
+            plus = added.get(key)
+            minus = removed.get(None if every_list else key)
+            new_bits = bits
+
+            if plus is not None:
+                new_bits |= plus.containers.get(row.container, 0)
+            if minus is not None:
+                new_bits &= ~minus.containers.get(row.container, 0)
+
+            if not new_bits:
+                emptied.append(row.id)
+            elif new_bits != bits:
+                row.bitmap = serialize_container(new_bits)
+                row.cardinality = new_bits.bit_count()
+                changed.append(row)
+
+        if changed:
+            PostingList.objects.bulk_update(changed, ["bitmap", "cardinality"])
+        if emptied:
+            PostingList.objects.filter(id__in=emptied).delete()
+
+    return len(changed) + len(emptied)
+
+
+def update_postings(tenant_id: int, added: dict = None, removed: dict = None) -> int:
+    """
+    added / removed: {(token, external): [document_id, ...]}, applied
+    in one pass over the affected containers.
+    """
+
+    if not added and not removed:
+        return 0
+
+    return _apply(
+        tenant_id,
+        {key: RoaringBitmap.from_ids(ids) for key, ids in (added or {}).items()},
+        {key: RoaringBitmap.from_ids(ids) for key, ids in (removed or {}).items()}
+    )
+
+
+def add_postings(tenant_id: int, postings: dict) -> int:
+    return update_postings(tenant_id, added=postings)
+
+
+def merge_postings(tenant_id: int, bitmaps: dict) -> int:
+    """
+    add_postings for whole bitmaps: {(token, external): RoaringBitmap}.
+    """
+
+    if not bitmaps:
+        return 0
+
+    return _apply(tenant_id, bitmaps, {})
+
+
+def remove_documents(document_ids) -> int:
+    """
+    Takes documents out of every posting list (delete, purge,
+    re-keying).
+    """
+
+    document_ids = list(document_ids)
+
+    if not document_ids or not PostingList.objects.exists():
+        return 0
+
+    return _apply(
+        None,
+        {},
+        {None: RoaringBitmap.from_ids(document_ids)},
+        every_list=True
+    )
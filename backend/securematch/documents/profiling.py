@@ -0,0 +1,443 @@
+# documents/profiling.py
+
+import cProfile
+import gzip
+import json
+import marshal
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+
+CONFIG_FILE = "config.json"
+PROFILE_SUFFIXES = (".prof.gz", ".folded.gz")
+
+
+# ---------------------------------------------------
+# Runtime Configuration (no restart needed)
+# ---------------------------------------------------
+
+class ProfilerConfig:
+    """
+    Settings defaults overlaid with PROFILER_DIR/config.json.
+
+    The file is shared by every worker on the host and re-read at most
+    once per second, so toggling an endpoint takes effect without a
+    restart. When nothing is enabled, a request costs a clock read and a
+    couple of dict lookups.
+    """
+
+    def __init__(self):
+        self._loaded = {}
+        self._mtime = None
+        self._checked = 0.0
+
+    @property
+    def path(self):
+        return os.path.join(settings.PROFILER_DIR, CONFIG_FILE)
+
+    def _refresh(self):
+        now = time.monotonic()
+
+        if now - self._checked < 1.0:
+            return
+
+        self._checked = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._loaded, self._mtime = {}, None
+            return
+
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as fh:
+                    self._loaded = json.load(fh)
+            except (OSError, ValueError):
+                self._loaded = {}
+            self._mtime = mtime
+
+    def current(self) -> dict:
+        self._refresh()
+
+        return {
+            "enabled": self._loaded.get("enabled", settings.PROFILER_ENABLED),
+            "sample_rate": self._loaded.get("sample_rate", settings.PROFILER_SAMPLE_RATE),
+            "slow_ms": self._loaded.get("slow_ms", settings.PROFILER_SLOW_MS),
+            "endpoints": self._loaded.get("endpoints", {}),
+        }
+
+    def for_path(self, path: str):
+        """
+        Effective settings for a request path, or None when off.
+        """
+
+        config = self.current()
+        effective = {**config, **config["endpoints"].get(path, {})}
+
+        if not effective["enabled"]:
+            return None
+
+        return effective
+
+    def save(self, config: dict):
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w") as fh:
+            json.dump(config, fh, indent=2)
+
+        os.replace(tmp_path, self.path)
+        self._checked = 0.0
+
+
+profiler_config = ProfilerConfig()
+
+
+# ---------------------------------------------------
+# Stack Sampler (cheap, for slow-request capture)
+# ---------------------------------------------------
+
+def _fold(frame) -> str:
+    stack = []
+
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+
+    return ";".join(reversed(stack))
+
+
+class StackSampler:
+    """
+    Background thread that samples the stacks of watched threads into
+    folded-stack counters (flamegraph input). Sleeps when idle. Each
+    watch() gets its own counter, so two requests on one thread never
+    share or drop each other's samples.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        # watch key -> (thread_id, counter)
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def watch(self, thread_id):
+        """
+        Returns (key for unwatch(), counter).
+        """
+
+        key = object()
+        counter = Counter()
+
+        with self._lock:
+            self._watched[key] = (thread_id, counter)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="stack-sampler",
+                    daemon=True
+                )
+                self._thread.start()
+
+        self._active.set()
+        return key, counter
+
+    def unwatch(self, key):
+        with self._lock:
+            self._watched.pop(key, None)
+
+            if not self._watched:
+                self._active.clear()
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+
+            with self._lock:
+                watched = list(self._watched.values())
+
+            frames = sys._current_frames()
+
+            for thread_id, counter in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[_fold(frame)] += 1
+
+
+_sampler = None
+
+
+def get_sampler() -> StackSampler:
+    global _sampler
+
+    if _sampler is None:
+        _sampler = StackSampler(settings.PROFILER_SAMPLE_INTERVAL_MS / 1000)
+
+    return _sampler
+
+
+# ---------------------------------------------------
+# Profile Storage
+# ---------------------------------------------------
+
+def _profile_name(request, elapsed_ms, suffix):
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", request.path).strip("-") or "root"
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+
+    return (
+        f"{stamp}-{os.getpid()}-{random.randrange(16 ** 4):04x}-"
+        f"{request.method.lower()}-{slug}-{int(elapsed_ms)}ms{suffix}"
+    )
+
+
+def list_profiles() -> list:
+    try:
+        entries = [
+            entry
+            for entry in os.scandir(settings.PROFILER_DIR)
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIXES)
+        ]
+    except FileNotFoundError:
+        return []
+
+    return sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True)
+
+
+def _enforce_retention():
+    profiles = list_profiles()
+    total_bytes = 0
+
+    for index, entry in enumerate(profiles):
+        total_bytes += entry.stat().st_size
+
+        if index >= settings.PROFILER_MAX_FILES or total_bytes > settings.PROFILER_MAX_BYTES:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _write_profile(name: str, payload: bytes):
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+
+    with open(os.path.join(settings.PROFILER_DIR, name), "wb") as fh:
+        fh.write(gzip.compress(payload))
+
+    _enforce_retention()
+
+
+def profile_path(name: str):
+    """
+    Absolute path of a stored profile, or None for unknown/unsafe names.
+    """
+
+    if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIXES):
+        return None
+
+    path = os.path.join(settings.PROFILER_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ---------------------------------------------------
+# Middleware
+# ---------------------------------------------------
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles a sample of requests with cProfile (.prof.gz, pstats
+    format) and stack-samples the rest of the enabled endpoints, keeping
+    folded stacks (.folded.gz) only for requests slower than slow_ms.
+
+    Profiling starts and stops on the thread that runs the view: in
+    __call__ under WSGI, and under ASGI in process_view and a
+    thread-sensitive call after the response, both of which Django runs
+    on the request's sync_to_async thread. Native async views do their
+    work on a pool thread, which profile_offloaded() covers; the event
+    loop itself is shared with every other request and never profiled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        config = profiler_config.for_path(request.path)
+
+        if config is None:
+            return None
+
+        if random.random() < config["sample_rate"]:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                return ("cprofile", profiler, config)
+            except ValueError:
+                # Another profiler already owns this thread; sample instead
+                pass
+
+        if config["slow_ms"]:
+            return ("stack", get_sampler().watch(threading.get_ident()), config)
+
+        return None
+
+    def _finish(self, request, plan, elapsed_ms):
+        kind, handle, config = plan
+
+        if kind == "cprofile":
+            handle.disable()
+            handle.create_stats()
+            _write_profile(
+                _profile_name(request, elapsed_ms, ".prof.gz"),
+                marshal.dumps(handle.stats)
+            )
+            return
+
+        key, counter = handle
+        get_sampler().unwatch(key)
+
+        if elapsed_ms >= config["slow_ms"] and counter:
+            folded = "\n".join(
+                f"{stack} {count}" for stack, count in counter.most_common()
+            )
+            _write_profile(
+                _profile_name(request, elapsed_ms, ".folded.gz"),
+                folded.encode()
+            )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        plan = self._start(request)
+
+        if plan is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self._finish(request, plan, (time.perf_counter() - start) * 1000)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            plan = getattr(request, "_profiler_plan", None)
+
+            if plan is not None:
+                # Thread-sensitive: the thread process_view started it on
+                await sync_to_async(self._finish)(
+                    request, plan, (time.perf_counter() - start) * 1000
+                )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_async:
+            return None
+
+        if iscoroutinefunction(view_func):
+            # Started by profile_offloaded() on the pool thread
+            request._offload_profiler = self
+        else:
+            request._profiler_plan = self._start(request)
+
+        return None
+
+
+@contextmanager
+def profile_offloaded(request):
+    """
+    Profiles the block on the current (pool) thread when the middleware
+    handed the request to an async view that offloads its work.
+    """
+
+    middleware = getattr(request, "_offload_profiler", None)
+    plan = middleware._start(request) if middleware is not None else None
+
+    if plan is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        middleware._finish(request, plan, (time.perf_counter() - start) * 1000)
+
+
+# ---------------------------------------------------
+# Config Validation
+# ---------------------------------------------------
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _settings_error(settings_dict: dict, where: str):
+    for key, value in settings_dict.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                return f"{where}enabled must be true or false"
+        elif key == "sample_rate":
+            if not _is_number(value) or not 0 <= value <= 1:
+                return f"{where}sample_rate must be a number from 0 to 1"
+        elif key == "slow_ms":
+            if not _is_number(value) or value < 0:
+                return f"{where}slow_ms must be a number >= 0"
+        elif not (key == "endpoints" and not where):
+            return f"{where}{key} is not a profiler setting"
+
+    return None
+
+
+def config_error(config) -> str:
+    """
+    Why a posted profiler config is invalid, or None if it is valid.
+    """
+
+    if not isinstance(config, dict):
+        return "Config must be an object"
+
+    endpoints = config.get("endpoints", {})
+
+    if not isinstance(endpoints, dict):
+        return "endpoints must be an object"
+
+    error = _settings_error(config, "")
+    if error:
+        return error
+
+    for path, overrides in endpoints.items():
+        if not path.startswith("/"):
+            return f"Endpoint {path!r} must be a path starting with /"
+
+        if not isinstance(overrides, dict):
+            return f"endpoints[{path!r}] must be an object"
+
+        error = _settings_error(overrides, f"endpoints[{path!r}].")
+        if error:
+            return error
+
+    return None
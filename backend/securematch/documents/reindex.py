@@ -0,0 +1,262 @@
+# documents/reindex.py
+
+import json
+import os
+
+from django.db import transaction
+
+from crypto_engine.sse import decrypt_document
+
+from .indexing import document_tokens, ordered_pool_map
+from .models import EncryptedDocument, SearchTokenIndex
+from .postings import document_postings, update_postings
+from .sharding import document_db, document_shards, use_shard
+
+
+# ---------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------
+
+class ReindexCheckpoint:
+    """
+    Last fully applied document id (and shard, when sharded) for a
+    given field selection, kept in a small JSON file and replaced
+    atomically after every chunk.
+    """
+
+    def __init__(self, path: str, fields: list, prune: bool):
+        self.path = path
+        self.plan = {"fields": sorted(fields), "prune": prune}
+        self.shard = None
+        self.last_id = 0
+        self.stats = {"documents": 0, "added": 0, "removed": 0, "skipped": 0}
+
+    def load(self) -> bool:
+        """
+        Resumes from the file when it was written for the same plan.
+        """
+
+        try:
+            with open(self.path) as fh:
+                saved = json.load(fh)
+        except (OSError, ValueError):
+            return False
+
+        if saved.get("plan") != self.plan:
+            return False
+
+        self.shard = saved.get("shard")
+        self.last_id = saved["last_id"]
+        self.stats = saved["stats"]
+        return True
+
+    def save(self, last_id: int):
+        self.last_id = last_id
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w") as fh:
+            json.dump(
+                {
+                    "plan": self.plan,
+                    "shard": self.shard,
+                    "last_id": last_id,
+                    "stats": self.stats
+                },
+                fh
+            )
+
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# ---------------------------------------------------
+# Chunks
+# ---------------------------------------------------
+
+def id_chunks(after_id: int, chunk_size: int):
+    """
+    Yields lists of (id, encrypted_blob, (key_version, updated_at)),
+    in id order, paging by id so each query is an index range scan.
+    """
+
+    while True:
+        rows = list(
+            EncryptedDocument.objects.live()
+            .filter(id__gt=after_id)
+            .order_by("id")
+            .values_list("id", "encrypted_blob", "key_version", "updated_at")[:chunk_size]
+        )
+
+        if not rows:
+            return
+
+        yield [
+            (doc_id, blob, (key_version, updated_at))
+            for doc_id, blob, key_version, updated_at in rows
+        ]
+        after_id = rows[-1][0]
+
+
+def desired_tokens(rows, fields):
+    """
+    Worker: {doc_id: (revision, {(token, external_token), ...},
+    {(posting token, external), ...})}; BITMAP_INDEX_FIELDS go to the
+    second set. `fields` may name COMPOUND_FIELDS labels
+    ("name+customer_id").
+    """
+
+    wanted = set(fields)
+    result = {}
+
+    for doc_id, blob, revision in rows:
+        tokens, postings = document_tokens(
+            decrypt_document(blob),
+            revision[0],
+            blob.get("tenant", ""),
+            wanted
+        )
+        result[doc_id] = (revision, set(tokens), postings)
+
+    return result
+
+
+def apply_chunk(desired: dict, prune: bool) -> dict:
+    """
+    Diffs the chunk against its current token rows and posting lists
+    and writes only the difference. Documents rotated, updated or deleted since they were
+    read are skipped; those paths rewrite or hide their tokens anyway.
+    """
+
+    added = removed = skipped = 0
+
+    with transaction.atomic(using=document_db()):
+        current_revisions = {}
+        tenants = {}
+
+        for doc_id, key_version, updated_at, tenant_id in (
+            EncryptedDocument.objects.live()
+            .select_for_update()
+            .filter(id__in=list(desired))
+            .values_list("id", "key_version", "updated_at", "tenant_id")
+        ):
+            current_revisions[doc_id] = (key_version, updated_at)
+            tenants[doc_id] = tenant_id
+
+        existing = {}
+        for row_id, doc_id, token, external_token in (
+            SearchTokenIndex.objects
+            .filter(document_id__in=list(current_revisions))
+            .values_list("id", "document_id", "token", "external_token")
+        ):
+            existing.setdefault(doc_id, {})[(token, external_token)] = row_id
+
+        existing_postings = document_postings(list(current_revisions))
+
+        to_create = []
+        stale_ids = []
+        # {tenant_id: {(token, external): [doc_id, ...]}}
+        to_post = {}
+        to_unpost = {}
+
+        for doc_id, (revision, tokens, postings) in desired.items():
+            if current_revisions.get(doc_id) != revision:
+                skipped += 1
+                continue
+
+            key_version = revision[0]
+            have = existing.get(doc_id, {})
+
+            to_create.extend(
+                SearchTokenIndex(
+                    token=token,
+                    external_token=external_token,
+                    document_id=doc_id,
+                    tenant_id=tenants[doc_id],
+                    key_version=key_version
+                )
+                for token, external_token in tokens - have.keys()
+            )
+
+            if prune:
+                stale_ids.extend(
+                    row_id
+                    for pair, row_id in have.items()
+                    if pair not in tokens
+                )
+
+            posted = existing_postings.get(doc_id, set())
+
+            for key in postings - posted:
+                to_post.setdefault(tenants[doc_id], {}).setdefault(key, []).append(doc_id)
+                added += 1
+
+            if prune:
+                for key in posted - postings:
+                    to_unpost.setdefault(tenants[doc_id], {}).setdefault(key, []).append(doc_id)
+                    removed += 1
+
+        if to_create:
+            SearchTokenIndex.objects.bulk_create(to_create)
+            added += len(to_create)
+
+        if stale_ids:
+            removed += SearchTokenIndex.objects.filter(id__in=stale_ids).delete()[0]
+
+        for tenant_id in to_post.keys() | to_unpost.keys():
+            update_postings(
+                tenant_id,
+                added=to_post.get(tenant_id),
+                removed=to_unpost.get(tenant_id)
+            )
+
+    return {
+        "documents": len(desired) - skipped,
+        "added": added,
+        "removed": removed,
+        "skipped": skipped,
+    }
+
+
+def reindex(fields, checkpoint: ReindexCheckpoint, chunk_size: int = 1000,
+            workers: int = 1, after_chunk=None):
+    """
+    Decrypts chunks in a process pool and applies them in id order,
+    checkpointing after each; shards are processed one after another.
+    after_chunk(stats) may sleep to throttle, or return False to stop
+    early.
+    """
+
+    prune = checkpoint.plan["prune"]
+    shards = document_shards()
+
+    if checkpoint.shard is None:
+        checkpoint.shard = shards[0]
+
+    if checkpoint.shard in shards:
+        shards = shards[shards.index(checkpoint.shard):]
+
+    for alias in shards:
+        if alias != checkpoint.shard:
+            checkpoint.shard, checkpoint.last_id = alias, 0
+
+        with use_shard(alias):
+            chunks = (
+                (rows, fields)
+                for rows in id_chunks(checkpoint.last_id, chunk_size)
+            )
+
+            for desired in ordered_pool_map(desired_tokens, chunks, workers):
+                for key, value in apply_chunk(desired, prune).items():
+                    checkpoint.stats[key] += value
+
+                checkpoint.save(max(desired))
+
+                if after_chunk and after_chunk(checkpoint.stats) is False:
+                    return False
+
+    return True
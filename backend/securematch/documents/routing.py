@@ -0,0 +1,229 @@
+# documents/routing.py
+
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, OperationalError, connections
+from rest_framework.throttling import BaseThrottle
+
+
+logger = logging.getLogger("documents.routing")
+
+
+# ---------------------------------------------------
+# Replica Health (per process)
+# ---------------------------------------------------
+
+# alias -> monotonic time until which the replica is skipped
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+def mark_replica_down(alias: str, exc=None):
+    with _down_lock:
+        already_down = _down_until.get(alias, 0) > time.monotonic()
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+    if not already_down:
+        logger.warning(
+            "Replica %s unavailable, reading from primary for %ss: %s",
+            alias, settings.REPLICA_RETRY_SECONDS, exc
+        )
+
+
+def replica_is_up(alias: str) -> bool:
+    """
+    False while the alias is marked down; otherwise connects this
+    thread's connection if needed (a no-op when already open).
+    """
+
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as exc:
+        mark_replica_down(alias, exc)
+        return False
+
+    return True
+
+
+def replica_status() -> list:
+    now = time.monotonic()
+
+    return [
+        {
+            "alias": alias,
+            "healthy": _down_until.get(alias, 0) <= now,
+            "retry_in_seconds": round(max(_down_until.get(alias, 0) - now, 0), 1),
+        }
+        for alias in settings.DATABASE_REPLICAS
+    ]
+
+
+def replica_failure_watch(execute, sql, params, many, context):
+    """
+    Execute wrapper on replica connections: a connection-level failure
+    mid-request fails that query and sends later reads to the primary.
+    """
+
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as exc:
+        connection = context["connection"]
+        if not connection.is_usable():
+            mark_replica_down(connection.alias, exc)
+        raise
+
+
+# ---------------------------------------------------
+# Per-Request Routing State
+# ---------------------------------------------------
+
+class ReadRouting:
+    """
+    use_replica is set for views that opt in (replica_reads = True) and
+    are not pinned; any write in the request turns it off again.
+    """
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+        self.alias = None
+
+    def replica(self):
+        if not self.use_replica or self.wrote:
+            return None
+
+        # Stick to one replica per request so its reads are consistent
+        if self.alias is not None and replica_is_up(self.alias):
+            return self.alias
+
+        candidates = list(settings.DATABASE_REPLICAS)
+        random.shuffle(candidates)
+
+        for alias in candidates:
+            if replica_is_up(alias):
+                self.alias = alias
+                return alias
+
+        self.alias = None
+        return None
+
+
+# Follows the request into sync_to_async threads (async views)
+_routing = ContextVar("read_routing", default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of opted-in views to a healthy replica; everything else,
+    including all writes and migrations, stays on the primary.
+    """
+
+    # Append-only audit records: no later read in the request (or by the
+    # client) depends on them, so writing one does not pin to the primary
+    UNPINNED_WRITE_MODELS = {"documents.externalsearchaudit"}
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        return routing.replica() if routing is not None else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+
+        if routing is not None and model._meta.label_lower not in self.UNPINNED_WRITE_MODELS:
+            routing.wrote = True
+
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+# ---------------------------------------------------
+# Read-Your-Writes Pinning
+# ---------------------------------------------------
+
+def _pin_key(request) -> str:
+    # Same client identity as the throttles (honours NUM_PROXIES)
+    tenant = getattr(request, "tenant", None)
+    client = BaseThrottle().get_ident(request)
+    return f"primary-pin:{tenant.slug if tenant else ''}:{client}"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks writes per request. A client that wrote reads from the
+    primary for REPLICA_PIN_SECONDS afterwards (pins are kept in the
+    shared "replica_pins" cache, so they hold across workers).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.pins = caches["replica_pins"]
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        routing = ReadRouting()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        self._pin(request, routing)
+        return response
+
+    async def __acall__(self, request):
+        routing = ReadRouting()
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if routing.wrote:
+            await sync_to_async(self._pin)(request, routing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+
+        if not getattr(view_class, "replica_reads", False):
+            return None
+
+        routing = _routing.get()
+
+        if routing is not None and not self.pins.get(_pin_key(request)):
+            routing.use_replica = True
+
+        return None
+
+    def _pin(self, request, routing):
+        if routing.wrote and settings.REPLICA_PIN_SECONDS > 0:
+            self.pins.set(_pin_key(request), 1, settings.REPLICA_PIN_SECONDS)
@@ -0,0 +1,393 @@
+# documents/segments.py
+
+import fcntl
+import json
+import mmap
+import os
+
+import numpy as np
+
+
+SEGMENT_MAGIC = b"SMSEG001"
+MANIFEST_FORMAT = "securematch-segments"
+MANIFEST_VERSION = 1
+MANIFEST = "manifest.json"
+WRITER_LOCK = "writer.lock"
+
+# Keys per block of the sparse index: a probe binary-searches the
+# sparse keys, then one block (a few pages of the mapping)
+BLOCK_KEYS = 256
+
+_HEADER = np.dtype([("magic", "S8"), ("groups", "<i8"), ("tombstones", "<i8")])
+_GROUP = np.dtype([
+    ("tenant_id", "<i8"),
+    ("external", "<i8"),
+    ("keys", "<i8"),
+    ("postings", "<i8"),
+    ("sparse", "<i8"),
+    ("keys_at", "<i8"),
+    ("offsets_at", "<i8"),
+    ("doc_ids_at", "<i8"),
+    ("sparse_at", "<i8"),
+])
+_TOMBSTONE = np.dtype([("tenant_id", "<i8"), ("count", "<i8"), ("at", "<i8")])
+
+
+class SegmentError(Exception):
+    pass
+
+
+# ---------------------------------------------------
+# Sorted Postings (one tenant, internal or external)
+# ---------------------------------------------------
+
+class Postings:
+    """
+    keys: sorted unique uint64 token prefixes. doc_ids: one packed
+    int64 array, each key's ids sorted and unique, at
+    doc_ids[offsets[i]:offsets[i + 1]]. sparse (segments only): every
+    BLOCK_KEYS-th key.
+
+    Tokens are HMAC / SHA-256 digests, so 64-bit prefixes only collide
+    between two tokens of a tenant with probability ~n^2 / 2^65.
+    """
+
+    __slots__ = ("keys", "offsets", "doc_ids", "sparse")
+
+    def __init__(self, keys, offsets, doc_ids, sparse=None):
+        self.keys = keys
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.sparse = sparse
+
+    @classmethod
+    def build(cls, keys: np.ndarray, doc_ids: np.ndarray) -> "Postings":
+        order = np.lexsort((doc_ids, keys))
+        keys = keys[order]
+        doc_ids = doc_ids[order]
+
+        if len(keys):
+            keep = np.empty(len(keys), dtype=bool)
+            keep[0] = True
+            keep[1:] = (keys[1:] != keys[:-1]) | (doc_ids[1:] != doc_ids[:-1])
+            keys = keys[keep]
+            doc_ids = doc_ids[keep]
+
+        unique, starts = np.unique(keys, return_index=True)
+        offsets = np.append(starts, len(keys)).astype(np.int64)
+
+        return cls(unique, offsets, doc_ids)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.offsets.nbytes + self.doc_ids.nbytes
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        if self.sparse is None:
+            return np.searchsorted(self.keys, keys)
+
+        blocks = np.searchsorted(self.sparse, keys, side="right") - 1
+
+        return np.array([
+            block * BLOCK_KEYS + np.searchsorted(
+                self.keys[block * BLOCK_KEYS:(block + 1) * BLOCK_KEYS], key
+            ) if block >= 0 else 0
+            for block, key in zip(blocks.tolist(), keys)
+        ], dtype=np.int64)
+
+    def lookup(self, keys: np.ndarray) -> list:
+        """
+        The id slices (views, no copy) of the keys present.
+        """
+
+        positions = self._positions(keys)
+        found = positions < len(self.keys)
+        positions = positions[found]
+        positions = positions[self.keys[positions] == keys[found]]
+
+        return [
+            self.doc_ids[self.offsets[position]:self.offsets[position + 1]]
+            for position in positions
+        ]
+
+    def pairs(self):
+        """
+        (keys, doc_ids) with one entry per posting, for merges.
+        """
+        return np.repeat(self.keys, np.diff(self.offsets)), self.doc_ids
+
+
+# ---------------------------------------------------
+# Layers (the base, a delta, or the refresh thread's pending rows)
+# ---------------------------------------------------
+
+class Layer:
+    """
+    {(tenant_id, external): Postings} plus tombstones {tenant_id:
+    sorted ids}: documents whose postings in every OLDER layer are
+    stale (deleted, or re-tokenized into this one).
+    """
+
+    def __init__(self, groups=None, tombstones=None):
+        self.groups = groups or {}
+        self.tombstones = tombstones or {}
+
+    def __len__(self) -> int:
+        return (
+            sum(map(len, self.groups.values()))
+            + sum(map(len, self.tombstones.values()))
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sum(postings.nbytes for postings in self.groups.values())
+            + sum(ids.nbytes for ids in self.tombstones.values())
+        )
+
+
+def merge_layers(layers: list, keep_tombstones: bool = False) -> Layer:
+    """
+    One layer equivalent to `layers` (oldest first). Tombstones only
+    need keeping when older layers remain below the result.
+    """
+
+    merged = {}
+    groups = {group for layer in layers for group in layer.groups}
+
+    for group in groups:
+        tenant_id, _ = group
+        keys, doc_ids = [], []
+
+        for layer in layers:
+            dead = layer.tombstones.get(tenant_id)
+
+            if dead is not None and keys:
+                older_keys, older_ids = np.concatenate(keys), np.concatenate(doc_ids)
+                alive = ~np.isin(older_ids, dead)
+                keys, doc_ids = [older_keys[alive]], [older_ids[alive]]
+
+            postings = layer.groups.get(group)
+            if postings is not None:
+                layer_keys, layer_ids = postings.pairs()
+                keys.append(layer_keys)
+                doc_ids.append(layer_ids)
+
+        postings = Postings.build(
+            np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64),
+            np.concatenate(doc_ids) if doc_ids else np.empty(0, dtype=np.int64)
+        )
+
+        if len(postings):
+            merged[group] = postings
+
+    tombstones = {}
+
+    if keep_tombstones:
+        for layer in layers:
+            for tenant_id, ids in layer.tombstones.items():
+                tombstones[tenant_id] = np.union1d(
+                    tombstones.get(tenant_id, np.empty(0, dtype=np.int64)), ids
+                )
+
+    return Layer(merged, tombstones)
+
+
+# ---------------------------------------------------
+# Segment Files
+# ---------------------------------------------------
+
+def _align(fh):
+    padding = -fh.tell() % 8
+    if padding:
+        fh.write(b"\0" * padding)
+
+
+def write_segment(path: str, layer: Layer):
+    """
+    Header, group and tombstone directories, then the arrays, each
+    8-byte aligned and little-endian. Written to a temp file, fsynced
+    and renamed into place: segments are never modified afterwards.
+    """
+
+    groups = sorted(layer.groups.items())
+    tombstones = sorted(layer.tombstones.items())
+
+    directory = np.zeros(len(groups), dtype=_GROUP)
+    dead = np.zeros(len(tombstones), dtype=_TOMBSTONE)
+
+    with open(path + ".tmp", "wb") as fh:
+        header = np.array([(SEGMENT_MAGIC, len(groups), len(tombstones))], dtype=_HEADER)
+        fh.write(header.tobytes())
+        directory_at = fh.tell()
+        fh.write(directory.tobytes())
+        dead_at = fh.tell()
+        fh.write(dead.tobytes())
+
+        for entry, ((tenant_id, external), postings) in zip(directory, groups):
+            sparse = postings.keys[::BLOCK_KEYS]
+
+            entry["tenant_id"] = tenant_id
+            entry["external"] = int(external)
+            entry["keys"] = len(postings.keys)
+            entry["postings"] = len(postings.doc_ids)
+            entry["sparse"] = len(sparse)
+
+            for field, values, dtype in (
+                ("keys_at", postings.keys, "<u8"),
+                ("offsets_at", postings.offsets, "<i8"),
+                ("doc_ids_at", postings.doc_ids, "<i8"),
+                ("sparse_at", sparse, "<u8"),
+            ):
+                _align(fh)
+                entry[field] = fh.tell()
+                fh.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+        for entry, (tenant_id, ids) in zip(dead, tombstones):
+            _align(fh)
+            entry["tenant_id"] = tenant_id
+            entry["count"] = len(ids)
+            entry["at"] = fh.tell()
+            fh.write(np.ascontiguousarray(ids, dtype="<i8").tobytes())
+
+        fh.seek(directory_at)
+        fh.write(directory.tobytes())
+        fh.seek(dead_at)
+        fh.write(dead.tobytes())
+
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    os.replace(path + ".tmp", path)
+
+
+class Segment(Layer):
+    """
+    A segment file opened with mmap. Its arrays are views of the
+    mapping, so every worker on the host shares one copy through the
+    page cache; the mapping stays valid after compaction unlinks the
+    file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+        with open(path, "rb") as fh:
+            self.size = os.fstat(fh.fileno()).st_size
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = np.frombuffer(self._map, dtype=_HEADER, count=1)[0]
+
+        if header["magic"] != SEGMENT_MAGIC:
+            raise SegmentError(f"Not an index segment: {path}")
+
+        directory = np.frombuffer(
+            self._map, dtype=_GROUP, count=int(header["groups"]), offset=_HEADER.itemsize
+        )
+        dead = np.frombuffer(
+            self._map,
+            dtype=_TOMBSTONE,
+            count=int(header["tombstones"]),
+            offset=_HEADER.itemsize + directory.nbytes
+        )
+
+        def view(dtype, count, at):
+            return np.frombuffer(self._map, dtype=dtype, count=int(count), offset=int(at))
+
+        super().__init__(
+            {
+                (int(entry["tenant_id"]), bool(entry["external"])): Postings(
+                    view("<u8", entry["keys"], entry["keys_at"]),
+                    view("<i8", entry["keys"] + 1, entry["offsets_at"]),
+                    view("<i8", entry["postings"], entry["doc_ids_at"]),
+                    view("<u8", entry["sparse"], entry["sparse_at"])
+                )
+                for entry in directory
+            },
+            {
+                int(entry["tenant_id"]): view("<i8", entry["count"], entry["at"])
+                for entry in dead
+            }
+        )
+
+
+# ---------------------------------------------------
+# Segment Directory (one per document database)
+# ---------------------------------------------------
+
+class SegmentStore:
+    """
+    Segment files plus manifest.json listing the live ones (oldest
+    first) and the writer's tail position. One process per host holds
+    writer.lock and is the only one to add, merge or delete segments;
+    the manifest is replaced atomically, so readers never see a
+    half-published set.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock_file = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def try_lock(self) -> bool:
+        """
+        Becomes the writer if no other process is (non-blocking). The
+        lock is released by the kernel when the holder exits.
+        """
+
+        if self._lock_file is not None:
+            return True
+
+        os.makedirs(self.directory, exist_ok=True)
+        fh = open(self.path(WRITER_LOCK), "a")
+
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fh.close()
+            return False
+
+        self._lock_file = fh
+        return True
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as fh:
+                manifest = json.load(fh)
+        except FileNotFoundError:
+            return None
+
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise SegmentError(f"Not a segment manifest: {self.manifest_path}")
+
+        return manifest
+
+    def publish(self, manifest: dict):
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "version": MANIFEST_VERSION,
+            **manifest
+        }
+
+        with open(self.manifest_path + ".tmp", "w") as fh:
+            json.dump(manifest, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+        # Readers that mapped a dropped segment keep their mapping
+        live = set(manifest["segments"])
+        for name in os.listdir(self.directory):
+            if name.endswith(".seg") and name not in live:
+                os.unlink(self.path(name))
@@ -0,0 +1,464 @@
+# documents/sharding.py
+
+import contextvars
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+
+from .models import (
+    DocumentIdAllocation,
+    EncryptedDocument,
+    PostingList,
+    SearchTokenIndex,
+    Tenant
+)
+
+
+logger = logging.getLogger("documents.sharding")
+
+# Models whose rows live on the shards (tokens sit with their document)
+SHARDED_MODELS = {
+    "documents.EncryptedDocument",
+    "documents.SearchTokenIndex",
+    "documents.PostingList",
+}
+
+
+class ShardRoutingError(RuntimeError):
+    pass
+
+
+def sharding_enabled() -> bool:
+    return bool(settings.DATABASE_SHARDS)
+
+
+def document_shards() -> list:
+    """
+    Databases holding documents: the shards, or just "default".
+    """
+    return list(settings.DATABASE_SHARDS) or ["default"]
+
+
+# ---------------------------------------------------
+# Placement (jump consistent hash of the document id)
+# ---------------------------------------------------
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Lamping & Veach jump consistent hash: appending a shard moves only
+    1/(n+1) of the keys, all of them onto the new shard.
+    """
+
+    bucket, jump = -1, 0
+
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+
+    return bucket
+
+
+def shard_for(document_id: int) -> str:
+    shards = document_shards()
+
+    if len(shards) == 1:
+        return shards[0]
+
+    digest = hashlib.blake2b(str(document_id).encode(), digest_size=8).digest()
+    return shards[jump_hash(int.from_bytes(digest, "little"), len(shards))]
+
+
+def shards_by_document(document_ids) -> dict:
+    """
+    {alias: [document_id, ...]} for a batch of existing documents.
+    """
+
+    grouped = {}
+
+    for document_id in set(document_ids):
+        grouped.setdefault(shard_for(document_id), []).append(document_id)
+
+    return grouped
+
+
+def allocate_document_ids(count: int) -> list:
+    """
+    Globally unique ids for new documents, from the primary's sequence.
+    """
+
+    with transaction.atomic(using="default"):
+        rows = DocumentIdAllocation.objects.using("default").bulk_create(
+            [DocumentIdAllocation() for _ in range(count)]
+        )
+        DocumentIdAllocation.objects.using("default").filter(
+            id__lte=rows[-1].id
+        ).delete()
+
+    return [row.id for row in rows]
+
+
+def place_documents(count: int) -> list:
+    """
+    [(document_id, alias), ...] for new documents. Unsharded, ids are
+    None (the table assigns them) and every alias is "default".
+    """
+
+    if not sharding_enabled():
+        return [(None, "default")] * count
+
+    return [
+        (document_id, shard_for(document_id))
+        for document_id in allocate_document_ids(count)
+    ]
+
+
+# ---------------------------------------------------
+# Active Shard & Router
+# ---------------------------------------------------
+
+# Follows the request into sync_to_async threads and scatter() workers
+_active_shard = ContextVar("active_shard", default=None)
+
+
+@contextmanager
+def use_shard(alias: str):
+    """
+    Routes document, token and posting-list queries to `alias`.
+    """
+
+    token = _active_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _active_shard.reset(token)
+
+
+def document_db() -> str:
+    """
+    Alias document queries currently go to; pass it to
+    transaction.atomic(using=...) around document writes.
+    """
+
+    alias = _active_shard.get()
+
+    if alias is None or not sharding_enabled():
+        return "default"
+
+    return alias
+
+
+class ShardRouter:
+    """
+    Sends document and token queries to the active shard (use_shard),
+    or to the owner of the instance being saved. Unrouted document
+    queries fail loudly instead of silently reading the primary. Other
+    models fall through to the next router.
+    """
+
+    def _route(self, model, hints):
+        if not sharding_enabled() or model._meta.label not in SHARDED_MODELS:
+            return None
+
+        alias = _active_shard.get()
+
+        if alias is not None:
+            return alias
+
+        instance = hints.get("instance")
+
+        if instance is not None:
+            if instance._state.db in settings.DATABASE_SHARDS:
+                return instance._state.db
+
+            document_id = getattr(instance, "document_id", instance.pk)
+            if document_id is not None:
+                return shard_for(document_id)
+
+        raise ShardRoutingError(
+            f"{model._meta.label} query outside use_shard() in sharded mode"
+        )
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards carry the full schema so tenant foreign keys resolve
+        return True if db in settings.DATABASE_SHARDS else None
+
+
+# ---------------------------------------------------
+# Scatter-Gather
+# ---------------------------------------------------
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# alias -> BoundedSemaphore of pool threads the shard may occupy
+_shard_slots = {}
+
+
+def _shard_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SHARD_POOL_WORKERS,
+                    thread_name_prefix="shard"
+                )
+
+    return _executor
+
+
+def _slots(alias) -> threading.BoundedSemaphore:
+    """
+    A shard's share of the pool, so a hung shard that keeps its threads
+    busy past the timeout cannot starve the other shards.
+    """
+
+    if alias not in _shard_slots:
+        with _executor_lock:
+            if alias not in _shard_slots:
+                _shard_slots[alias] = threading.BoundedSemaphore(max(
+                    1, settings.SHARD_POOL_WORKERS // len(document_shards())
+                ))
+
+    return _shard_slots[alias]
+
+
+def _apply_statement_timeout(connection):
+    """
+    PostgreSQL aborts a pool thread's queries after SHARD_QUERY_TIMEOUT,
+    freeing the thread and the connection a timed-out search left
+    behind (future.cancel() cannot stop a running query). Set once per
+    physical connection.
+    """
+
+    if connection.vendor != "postgresql":
+        return
+
+    connection.ensure_connection()
+
+    if getattr(connection, "_scatter_timeout_on", None) is connection.connection:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SET statement_timeout = {int(settings.SHARD_QUERY_TIMEOUT * 1000)}"
+        )
+
+    connection._scatter_timeout_on = connection.connection
+
+
+def _run_on_shard(alias, func, slots):
+    try:
+        # Pool threads keep their connections between requests
+        connections[alias].close_if_unusable_or_obsolete()
+        _apply_statement_timeout(connections[alias])
+
+        with use_shard(alias):
+            return func()
+    finally:
+        slots.release()
+
+
+def scatter(func, timeout: float = None):
+    """
+    Calls func() once per document database, with that shard active,
+    in parallel. Returns ({alias: result}, failed) where failed lists
+    {"shard", "error"} for shards that raised, missed the timeout or
+    still had all their pool threads busy.
+
+    Unsharded, func runs inline on "default" and errors propagate.
+    """
+
+    shards = document_shards()
+
+    if len(shards) == 1:
+        with use_shard(shards[0]):
+            return {shards[0]: func()}, []
+
+    timeout = settings.SHARD_QUERY_TIMEOUT if timeout is None else timeout
+    executor = _shard_executor()
+
+    futures = {}
+    failed = []
+
+    for alias in shards:
+        slots = _slots(alias)
+
+        if not slots.acquire(blocking=False):
+            failed.append({"shard": alias, "error": "busy"})
+            continue
+
+        futures[alias] = executor.submit(
+            contextvars.copy_context().run, _run_on_shard, alias, func, slots
+        )
+
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+
+    for alias, future in futures.items():
+        if not future.done():
+            if future.cancel():
+                # Never started, so _run_on_shard won't release its slot
+                _slots(alias).release()
+            failed.append({"shard": alias, "error": "timeout"})
+            continue
+
+        exc = future.exception()
+
+        if exc is not None:
+            logger.warning("Shard %s failed: %r", alias, exc)
+            failed.append({"shard": alias, "error": type(exc).__name__})
+            continue
+
+        results[alias] = future.result()
+
+    if failed:
+        logger.warning("Partial result, failed shards: %s", failed)
+
+    return results, failed
+
+
+def scatter_meta(failed: list) -> dict:
+    """
+    Response meta for a scatter-gather; empty when unsharded.
+    """
+
+    if not sharding_enabled():
+        return {}
+
+    return {
+        "shards_queried": len(settings.DATABASE_SHARDS),
+        "failed_shards": failed,
+        "partial": bool(failed),
+    }
+
+
+def document_stats() -> dict:
+    """
+    Per-shard document/token counters for the metrics views.
+    """
+
+    return {
+        "total_documents": EncryptedDocument.objects.live().count(),
+        "pending_purge": EncryptedDocument.objects.filter(
+            deleted_at__isnull=False
+        ).count(),
+        "total_tokens": SearchTokenIndex.objects.count(),
+        "external_tokens": SearchTokenIndex.objects.exclude(
+            external_token__isnull=True
+        ).count(),
+        "posting_entries": PostingList.objects.aggregate(
+            entries=Sum("cardinality")
+        )["entries"] or 0,
+        "last_created_at": EncryptedDocument.objects.order_by(
+            "-created_at"
+        ).values_list("created_at", flat=True).first(),
+        "tenants": dict(
+            EncryptedDocument.objects.live()
+            .values_list("tenant__slug")
+            .annotate(documents=Count("id"))
+            .order_by()
+        ),
+    }
+
+
+def merge_document_stats(shard_stats) -> dict:
+    merged = {
+        "total_documents": 0,
+        "pending_purge": 0,
+        "total_tokens": 0,
+        "external_tokens": 0,
+        "posting_entries": 0,
+        "last_created_at": None,
+        "tenants": {},
+    }
+
+    for stats in shard_stats:
+        for key in (
+            "total_documents", "pending_purge", "total_tokens",
+            "external_tokens", "posting_entries"
+        ):
+            merged[key] += stats[key]
+
+        if stats["last_created_at"] and (
+            merged["last_created_at"] is None
+            or stats["last_created_at"] > merged["last_created_at"]
+        ):
+            merged["last_created_at"] = stats["last_created_at"]
+
+        for slug, documents in stats["tenants"].items():
+            merged["tenants"][slug] = merged["tenants"].get(slug, 0) + documents
+
+    return merged
+
+
+# ---------------------------------------------------
+# Shard Maintenance
+# ---------------------------------------------------
+
+def sync_tenants(alias: str, tenants=None) -> int:
+    """
+    Copies tenants (default: all) from the primary to a shard, with the
+    same ids so foreign keys on the shard resolve, and creates their
+    token partitions.
+    """
+
+    from .tenancy import ensure_token_partition
+
+    if tenants is None:
+        tenants = list(Tenant.objects.using("default").order_by("id"))
+
+    for tenant in tenants:
+        Tenant.objects.using(alias).update_or_create(
+            id=tenant.id,
+            defaults={
+                "slug": tenant.slug,
+                "name": tenant.name,
+                "key_context": tenant.key_context,
+            }
+        )
+        ensure_token_partition(tenant, using=alias)
+
+    return len(tenants)
+
+
+def advance_id_allocation(min_id: int):
+    """
+    Moves the id sequence past `min_id` (documents created before
+    sharding was enabled keep their ids).
+    """
+
+    from django.core.management.color import no_style
+
+    if min_id <= 0 or allocate_document_ids(1)[0] > min_id:
+        return
+
+    with transaction.atomic(using="default"):
+        DocumentIdAllocation.objects.using("default").create(id=min_id)
+
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(
+                no_style(), [DocumentIdAllocation]
+            ):
+                cursor.execute(statement)
+
+        DocumentIdAllocation.objects.using("default").filter(
+            id__lte=min_id
+        ).delete()
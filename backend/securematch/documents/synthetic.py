@@ -0,0 +1,243 @@
+# documents/synthetic.py
+
+import bisect
+import itertools
+import random
+import string
+
+from django.db import transaction
+
+from crypto_engine.sse import active_key_version, encrypt_document
+
+from .indexing import document_tokens, ordered_pool_map
+from .models import EncryptedDocument, SearchTokenIndex
+from .postings import add_postings
+from .sharding import place_documents, use_shard
+from .tenancy import default_tenant
+
+
+# ---------------------------------------------------
+# Value Distributions
+# ---------------------------------------------------
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh",
+    "Ayaan", "Krishna", "Ishaan", "Rohan", "Rahul", "Amit", "Suresh",
+    "Ramesh", "Vikram", "Anil", "Sanjay", "Rajesh", "Manoj", "Ananya",
+    "Diya", "Aadhya", "Saanvi", "Priya", "Pooja", "Neha", "Kavya",
+    "Asha", "Sunita", "Meera", "Lakshmi", "Divya", "Anjali", "Sneha",
+    "Deepa", "Nisha", "Radha", "Geeta", "Rekha",
+]
+
+SURNAMES = [
+    "Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Shah",
+    "Reddy", "Rao", "Nair", "Iyer", "Menon", "Das", "Bose", "Ghosh",
+    "Mukherjee", "Chatterjee", "Banerjee", "Joshi", "Kulkarni",
+    "Deshpande", "Patil", "Jain", "Agarwal", "Mehta", "Chopra", "Kapoor",
+    "Malhotra", "Khanna", "Bhatia", "Pillai", "Naidu", "Yadav", "Mishra",
+    "Tiwari", "Pandey", "Saxena", "Srivastava", "Thakur", "Chauhan",
+]
+
+# Most accounts are clean; a long tail needs review.
+COMPLIANCE_FLAGS = [
+    ("clear", 0.92),
+    ("review", 0.05),
+    ("flagged", 0.025),
+    ("blocked", 0.005),
+]
+
+# PAN 4th character: holder type (P = individual dominates)
+PAN_HOLDER_TYPES = [("P", 0.9), ("C", 0.05), ("H", 0.02), ("F", 0.02), ("T", 0.01)]
+
+ZIPF_EXPONENT = 1.1
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+_FULL_NAMES = [f"{first} {last}" for last in SURNAMES for first in FIRST_NAMES]
+_NAME_CDF = _cumulative(
+    1 / (rank ** ZIPF_EXPONENT) for rank in range(1, len(_FULL_NAMES) + 1)
+)
+_FLAG_CDF = _cumulative(weight for _, weight in COMPLIANCE_FLAGS)
+_HOLDER_CDF = _cumulative(weight for _, weight in PAN_HOLDER_TYPES)
+
+
+def _pick(rng, values, cdf):
+    return values[bisect.bisect(cdf, rng.random() * cdf[-1])]
+
+
+# Verhoeff tables (Aadhaar check digit)
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+_VERHOEFF_INV = [0, 4, 3, 2, 1, 5, 6, 7, 8, 9]
+
+
+def verhoeff_check_digit(digits: str) -> str:
+    check = 0
+
+    for position, digit in enumerate(reversed(digits), start=1):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[position % 8][int(digit)]]
+
+    return str(_VERHOEFF_INV[check])
+
+
+def synthetic_pan(rng) -> str:
+    letters = string.ascii_uppercase
+
+    return (
+        "".join(rng.choice(letters) for _ in range(3))
+        + _pick(rng, [code for code, _ in PAN_HOLDER_TYPES], _HOLDER_CDF)
+        + rng.choice(letters)
+        + f"{rng.randrange(1, 10000):04d}"
+        + rng.choice(letters)
+    )
+
+
+def synthetic_aadhaar(rng) -> str:
+    # 12 digits, never starting with 0 or 1, Verhoeff check digit last
+    body = str(rng.randint(2, 9)) + "".join(
+        str(rng.randrange(10)) for _ in range(10)
+    )
+    return body + verhoeff_check_digit(body)
+
+
+# ---------------------------------------------------
+# Records
+# ---------------------------------------------------
+
+def synthetic_record(index: int, seed: int = 0) -> dict:
+    """
+    Deterministic record for an index: the load driver regenerates
+    record i to obtain values that are known to be in the dataset.
+    """
+
+    rng = random.Random(seed * 1_000_003 + index)
+
+    return {
+        "customer_id": f"CUST-{index:08d}",
+        "name": _pick(rng, _FULL_NAMES, _NAME_CDF),
+        "pan": synthetic_pan(rng),
+        "aadhaar": synthetic_aadhaar(rng),
+        "compliance_flag": _pick(
+            rng, [flag for flag, _ in COMPLIANCE_FLAGS], _FLAG_CDF
+        ),
+        "account_balance": round(rng.lognormvariate(11, 1.5), 2),
+    }
+
+
+def _encrypt_range(seed: int, start: int, stop: int, key_version: int,
+                   key_context: str = ""):
+    """
+    Worker: (blob, token pairs, posting keys) per record, as
+    document_tokens() returns them.
+    """
+
+    prepared = []
+
+    for index in range(start, stop):
+        data = synthetic_record(index, seed)
+        tokens, postings = document_tokens(data, key_version, key_context)
+
+        prepared.append((
+            encrypt_document(data, key_version, key_context),
+            tokens,
+            postings
+        ))
+
+    return prepared
+
+
+# ---------------------------------------------------
+# Bulk Loader
+# ---------------------------------------------------
+
+def bulk_load(count: int, seed: int = 0, start: int = 0,
+              batch_size: int = 2000, workers: int = 1, progress=None,
+              tenant=None) -> int:
+    """
+    Encrypts and indexes synthetic records [start, start + count) for a
+    tenant (default: DEFAULT_TENANT). Encryption fans out over `workers`
+    processes; inserts stay in this process, one transaction per batch.
+    """
+
+    tenant = tenant or default_tenant()
+    key_version = active_key_version()
+    ranges = (
+        (seed, lo, min(lo + batch_size, start + count), key_version,
+         tenant.key_context)
+        for lo in range(start, start + count, batch_size)
+    )
+
+    loaded = 0
+
+    for prepared in ordered_pool_map(_encrypt_range, ranges, workers):
+        # Sharded: one transaction per owning shard
+        by_shard = {}
+
+        for (document_id, alias), item in zip(
+            place_documents(len(prepared)), prepared
+        ):
+            by_shard.setdefault(alias, []).append((document_id, item))
+
+        for alias, items in by_shard.items():
+            with use_shard(alias), transaction.atomic(using=alias):
+                docs = EncryptedDocument.objects.bulk_create([
+                    EncryptedDocument(
+                        id=document_id,
+                        tenant=tenant,
+                        encrypted_blob=blob,
+                        key_version=key_version
+                    )
+                    for document_id, (blob, _, _) in items
+                ])
+
+                SearchTokenIndex.objects.bulk_create(
+                    [
+                        SearchTokenIndex(
+                            token=token,
+                            external_token=external_token,
+                            document=doc,
+                            tenant=tenant,
+                            key_version=key_version
+                        )
+                        for doc, (_, (_, tokens, _)) in zip(docs, items)
+                        for token, external_token in tokens
+                    ],
+                    batch_size=batch_size
+                )
+
+                postings = {}
+                for doc, (_, (_, _, keys)) in zip(docs, items):
+                    for key in keys:
+                        postings.setdefault(key, []).append(doc.id)
+
+                add_postings(tenant.id, postings)
+
+        loaded += len(prepared)
+
+        if progress:
+            progress(loaded)
+
+    return loaded
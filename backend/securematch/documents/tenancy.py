@@ -0,0 +1,159 @@
+# documents/tenancy.py
+
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from .models import SearchTokenIndex, Tenant
+from .utils import error_response
+
+
+# ---------------------------------------------------
+# Tenant Lookup (cached per process; tenants are rarely added)
+# ---------------------------------------------------
+
+_by_slug = {}
+_by_id = {}
+_lock = threading.Lock()
+
+
+def _remember(tenant):
+    with _lock:
+        _by_slug[tenant.slug] = tenant
+        _by_id[tenant.id] = tenant
+    return tenant
+
+
+def cached_tenant(slug: str):
+    return _by_slug.get(slug)
+
+
+def get_tenant(slug: str):
+    """
+    Tenant for a slug, or None when unknown.
+    """
+
+    tenant = _by_slug.get(slug)
+
+    if tenant is None:
+        tenant = Tenant.objects.filter(slug=slug).first()
+        if tenant is not None:
+            _remember(tenant)
+
+    return tenant
+
+
+def get_tenant_by_id(tenant_id: int) -> Tenant:
+    tenant = _by_id.get(tenant_id)
+
+    if tenant is None:
+        tenant = _remember(Tenant.objects.get(id=tenant_id))
+
+    return tenant
+
+
+def default_tenant() -> Tenant:
+    return get_tenant(settings.DEFAULT_TENANT)
+
+
+def tenant_key_context(tenant_id: int) -> str:
+    """
+    Key-derivation context for a tenant's SSE keys ("" = original keys).
+    """
+    return get_tenant_by_id(tenant_id).key_context
+
+
+# ---------------------------------------------------
+# PostgreSQL Partitions (SearchTokenIndex, LIST by tenant_id)
+# ---------------------------------------------------
+
+def token_partition_name(tenant_id: int) -> str:
+    return f"{SearchTokenIndex._meta.db_table}_t{tenant_id}"
+
+
+def ensure_token_partition(tenant, using="default"):
+    """
+    Creates the tenant's token partition. A no-op off PostgreSQL or
+    before the table has been converted to a partitioned table.
+    """
+
+    connection = connections[using]
+
+    if connection.vendor != "postgresql":
+        return False
+
+    table = SearchTokenIndex._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE relname = %s",
+            [table]
+        )
+        row = cursor.fetchone()
+
+        if row is None or row[0] != "p":
+            return False
+
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS "
+            f"{connection.ops.quote_name(token_partition_name(tenant.id))} "
+            f"PARTITION OF {connection.ops.quote_name(table)} "
+            f"FOR VALUES IN ({int(tenant.id)})"
+        )
+
+    return True
+
+
+# ---------------------------------------------------
+# Request Routing
+# ---------------------------------------------------
+
+class TenantMiddleware:
+    """
+    Sets request.tenant from the TENANT_HEADER (default: the
+    DEFAULT_TENANT). Views scope every query to it, so searches only
+    probe the caller's partition.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _slug(self, request):
+        return request.headers.get(settings.TENANT_HEADER) or settings.DEFAULT_TENANT
+
+    def _unknown(self, slug):
+        return JsonResponse(
+            error_response("UNKNOWN_TENANT", f"Unknown tenant '{slug}'"),
+            status=400
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        slug = self._slug(request)
+        request.tenant = get_tenant(slug)
+
+        if request.tenant is None:
+            return self._unknown(slug)
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        slug = self._slug(request)
+        request.tenant = cached_tenant(slug) or await sync_to_async(get_tenant)(slug)
+
+        if request.tenant is None:
+            return self._unknown(slug)
+
+        return await self.get_response(request)
@@ -1,3 +1,2068 @@
-from django.test import TestCase
+import base64
+import contextvars
+import csv
+import gzip
+import hashlib
+import hmac
+import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import path
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from crypto_engine import sse
+from crypto_engine.peks import generate_keypair
+
+from . import audit_logs, profiling, sharding, tenancy, throttling
+from .archive import (
+    ARCHIVE_VERSION,
+    MANIFEST,
+    POSTING_COLUMNS,
+    POSTINGS,
+    _ChunkWriter,
+    load_manifest,
+    read_rows
+)
+from .async_views import AsyncInternalSearchView, AsyncUploadDocumentView
+from .audit_logs import AUDIT_LOG_FIELDS
+from .audit_retention import AuditArchive, expired_audits, scan_archive
+from .auditor_session import issue_session, session_is_valid, verify_session_mac
+from .bitmaps import (
+    ARRAY_CONTAINER,
+    ARRAY_MAX,
+    BITMAP_CONTAINER,
+    CONTAINER_SIZE,
+    RoaringBitmap,
+    deserialize_container,
+    serialize_container
+)
+from .constants import COMPOUND_FIELDS, SEARCHABLE_FIELDS
+from .frequency import SearchFrequencyTracker
+from .indexing import (
+    build_index_entries,
+    compound_label,
+    compound_tokens,
+    index_document,
+    query_trapdoors
+)
+from .instrumentation import begin_request_timings, end_request_timings, stage
+from .memory_index import ShardIndex, token_key
+from .middleware import error_code
+from .models import (
+    Auditor,
+    EncryptedDocument,
+    ExternalSearchAudit,
+    ExternalSearchAuditRollup,
+    PostingList,
+    SearchTokenIndex,
+    Tenant
+)
+from .postings import document_postings, posting_bitmap, remove_documents, update_postings
+from .profiling import profiler_config
+from .reindex import ReindexCheckpoint, apply_chunk, desired_tokens, id_chunks
+from .segments import (
+    BLOCK_KEYS,
+    Layer,
+    Postings,
+    Segment,
+    SegmentStore,
+    merge_layers,
+    write_segment
+)
+from .sharding import document_db, jump_hash, scatter, shard_for, shards_by_document
+from .synthetic import bulk_load
+from .throttling import SharedBucketStore, SharedScopedRateThrottle
+from .utils import error_response
+
+
+# Stand-in key material, so tokens are real HMACs without MASTER_KEY
+FAKE_KEYS = (b"a" * 32, b"h" * 32)
+
+
+def fake_keys():
+    return mock.patch.multiple(
+        "crypto_engine.sse",
+        _keys_for=mock.Mock(return_value=FAKE_KEYS),
+        loaded_key_versions=mock.Mock(return_value=[1])
+    )
+
+
+def token(number: int) -> str:
+    return f"{number:016x}" * 4
+
+
+def master_key(byte: bytes) -> str:
+    return base64.b64encode(byte * 32).decode()
+
+
+def use_keyring(test, active=1, retired=()):
+    """
+    Real key derivation from test master keys ("1" * 32 for version 1,
+    ...) for the duration of `test`.
+    """
+
+    env = {
+        "MASTER_KEY": master_key(str(active).encode()),
+        "MASTER_KEY_VERSION": str(active),
+        "RETIRED_MASTER_KEYS": ",".join(
+            f"{version}:{master_key(str(version).encode())}" for version in retired
+        ),
+    }
+
+    patcher = mock.patch.dict(os.environ, env)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+    for cached in (sse._keyring, sse._tenant_keys):
+        cached.cache_clear()
+        test.addCleanup(cached.cache_clear)
+
+
+def isolate_throttles(test):
+    """
+    A private bucket file, so view tests neither share nor exhaust the
+    host's throttle state.
+    """
+
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+
+    patcher = mock.patch.object(
+        throttling,
+        "_store",
+        SharedBucketStore(os.path.join(directory.name, "buckets"), slots=64)
+    )
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+def store_document(tenant, data: dict) -> EncryptedDocument:
+    """
+    Encrypts and indexes a document the way UploadDocumentView does.
+    """
+
+    blob = sse.encrypt_document(data, tenant=tenant.key_context)
+    doc = EncryptedDocument.objects.create(
+        tenant=tenant,
+        encrypted_blob=blob,
+        key_version=blob["key_version"]
+    )
+    index_document(doc, data, blob["key_version"])
+
+    return doc
+
+
+def search_ids(tenant, query: dict) -> list:
+    """
+    Ids of the documents an internal search for `query` returns.
+    """
+
+    from .views import internal_shard_search
+
+    _, docs = internal_shard_search(tenant, query_trapdoors(query, tenant.key_context))
+    return sorted(doc.id for doc in docs)
+
+
+# ---------------------------------------------------
+# Roaring Bitmaps & Posting Lists
+# ---------------------------------------------------
+
+class RoaringBitmapTests(SimpleTestCase):
+
+    def test_ids_split_into_containers_by_high_bits(self):
+        ids = [1, CONTAINER_SIZE - 1, CONTAINER_SIZE, 3 * CONTAINER_SIZE + 7]
+        bitmap = RoaringBitmap.from_ids(reversed(ids))
+
+        self.assertEqual(sorted(bitmap.containers), [0, 1, 3])
+        self.assertEqual(list(bitmap), ids)
+        self.assertEqual(len(bitmap), 4)
+        self.assertEqual(bitmap.first(3), ids[:3])
+        self.assertIn(CONTAINER_SIZE, bitmap)
+        self.assertNotIn(2 * CONTAINER_SIZE, bitmap)
+
+    def test_set_operations_merge_and_drop_empty_containers(self):
+        left = RoaringBitmap.from_ids([1, 2, CONTAINER_SIZE + 1])
+        right = RoaringBitmap.from_ids([2, 2 * CONTAINER_SIZE])
+
+        self.assertEqual(list(left | right), [1, 2, CONTAINER_SIZE + 1, 2 * CONTAINER_SIZE])
+        self.assertEqual(list(left & right), [2])
+        self.assertEqual(sorted((left & right).containers), [0])
+        self.assertEqual(list(left - RoaringBitmap.from_ids([CONTAINER_SIZE + 1])), [1, 2])
+        self.assertEqual(sorted((left - right).containers), [0, 1])
+        self.assertFalse(left & RoaringBitmap.from_ids([5 * CONTAINER_SIZE]))
+
+    def test_container_switches_from_array_to_bitmap_past_array_max(self):
+        for count, kind in ((ARRAY_MAX, ARRAY_CONTAINER), (ARRAY_MAX + 1, BITMAP_CONTAINER)):
+            bits = RoaringBitmap.from_ids(range(0, 2 * count, 2)).containers[0]
+            data = serialize_container(bits)
+
+            self.assertEqual(data[:1], kind)
+            self.assertEqual(deserialize_container(data), bits)
+
+        self.assertEqual(serialize_container(0), b"")
+        self.assertEqual(deserialize_container(b""), 0)
+
+
+class PostingListTests(TestCase):
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(slug="postings", name="Postings")
+        self.key = (token(1), False)
+
+    def test_update_spans_containers_and_remove_empties_them(self):
+        ids = [3, 5, CONTAINER_SIZE + 9]
+        update_postings(self.tenant.id, added={self.key: ids})
+
+        self.assertEqual(
+            sorted(PostingList.objects.values_list("container", "cardinality")),
+            [(0, 2), (1, 1)]
+        )
+        self.assertEqual(list(posting_bitmap(self.tenant.id, [token(1)])), ids)
+
+        remove_documents([5, CONTAINER_SIZE + 9])
+
+        self.assertEqual(
+            list(PostingList.objects.values_list("container", "cardinality")),
+            [(0, 1)]
+        )
+        self.assertEqual(list(posting_bitmap(self.tenant.id, [token(1)])), [3])
+
+        remove_documents([3])
+        self.assertFalse(PostingList.objects.exists())
+
+    def test_remove_documents_touches_every_list_of_the_container(self):
+        other = (token(2), True)
+        update_postings(self.tenant.id, added={self.key: [1, 2], other: [2, 3]})
+
+        remove_documents([2])
+
+        self.assertEqual(list(posting_bitmap(self.tenant.id, [token(1)])), [1])
+        self.assertEqual(
+            list(posting_bitmap(self.tenant.id, [token(2)], external=True)), [3]
+        )
+
+
+# ---------------------------------------------------
+# In-Memory Index Layers & Segments
+# ---------------------------------------------------
+
+def layer(postings: dict, tombstones: dict = None) -> Layer:
+    """
+    {(tenant_id, token number): [document_id, ...]} as an internal layer.
+    """
+
+    groups = {}
+
+    for (tenant_id, number), ids in postings.items():
+        keys, doc_ids = groups.setdefault((tenant_id, False), ([], []))
+        keys.extend([token_key(token(number))] * len(ids))
+        doc_ids.extend(ids)
+
+    return Layer(
+        {
+            group: Postings.build(
+                np.array(keys, dtype=np.uint64), np.array(doc_ids, dtype=np.int64)
+            )
+            for group, (keys, doc_ids) in groups.items()
+        },
+        {
+            tenant_id: np.array(sorted(ids), dtype=np.int64)
+            for tenant_id, ids in (tombstones or {}).items()
+        }
+    )
+
+
+def lookup(source, tenant_id: int, number: int) -> list:
+    postings = source.groups.get((tenant_id, False))
+
+    if postings is None:
+        return []
+
+    found = postings.lookup(np.array([token_key(token(number))], dtype=np.uint64))
+    return sorted(int(document_id) for ids in found for document_id in ids)
+
+
+class MergeLayersTests(SimpleTestCase):
+
+    def test_newer_tombstones_hide_older_postings(self):
+        base = layer({(1, 10): [1, 2, 3], (1, 11): [1], (2, 10): [1]})
+        # Document 1 of tenant 1 re-tokenized, document 3 deleted
+        delta = layer({(1, 12): [1]}, tombstones={1: [1, 3]})
+
+        merged = merge_layers([base, delta])
+
+        self.assertEqual(lookup(merged, 1, 10), [2])
+        self.assertEqual(lookup(merged, 1, 11), [])
+        self.assertEqual(lookup(merged, 1, 12), [1])
+        # Other tenants' documents with the same id are untouched
+        self.assertEqual(lookup(merged, 2, 10), [1])
+        self.assertEqual(merged.tombstones, {})
+
+    def test_keep_tombstones_when_merging_deltas_only(self):
+        first = layer({(1, 10): [4]}, tombstones={1: [1]})
+        second = layer({(1, 10): [5]}, tombstones={1: [2]})
+
+        merged = merge_layers([first, second], keep_tombstones=True)
+
+        self.assertEqual(lookup(merged, 1, 10), [4, 5])
+        self.assertEqual(merged.tombstones[1].tolist(), [1, 2])
+
+    def test_segment_round_trip_uses_sparse_blocks(self):
+        numbers = range(3 * BLOCK_KEYS)
+        source = layer(
+            {(1, number): [number, number + 1] for number in numbers},
+            tombstones={1: [7]}
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "000000000001.seg")
+            write_segment(path, source)
+            segment = Segment(path)
+
+            self.assertIsNotNone(segment.groups[(1, False)].sparse)
+            for number in (0, BLOCK_KEYS - 1, BLOCK_KEYS, 3 * BLOCK_KEYS - 1):
+                self.assertEqual(lookup(segment, 1, number), [number, number + 1])
+            self.assertEqual(lookup(segment, 1, 3 * BLOCK_KEYS), [])
+            self.assertEqual(segment.tombstones[1].tolist(), [7])
+
+
+class ShardIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = ShardIndex("default")
+        self.index.layers = [layer({(1, 10): [1, 2, 3], (1, 11): [2]})]
+
+    def rows(self, *rows):
+        # TAIL_FIELDS: id, tenant_id, token, external_token, document_id
+        return [
+            (row_id, tenant_id, token(number), None, document_id)
+            for row_id, (tenant_id, number, document_id) in enumerate(rows)
+        ]
+
+    def match(self, *numbers) -> list:
+        return self.index.match(1, [[token(number)] for number in numbers]).tolist()
+
+    def test_delta_rows_and_tombstones_before_and_after_compaction(self):
+        self.index._add_rows(self.rows((1, 10, 4), (1, 11, 4)))
+        # Document 2 updated (re-tokenized), 3 deleted
+        self.index._tombstone([(2, 1, None), (3, 1, "deleted")])
+        self.index._add_rows(self.rows((1, 12, 2)))
+
+        expected = {(10,): [1, 4], (11,): [4], (12,): [2], (10, 11): [4]}
+
+        for numbers, ids in expected.items():
+            self.assertEqual(self.match(*numbers), ids)
+
+        self.index.compact()
+
+        self.assertEqual(len(self.index.layers), 1)
+        self.assertEqual(self.index.delta, {})
+        for numbers, ids in expected.items():
+            self.assertEqual(self.match(*numbers), ids)
+
+    def test_tombstone_drops_pending_delta_rows(self):
+        self.index._add_rows(self.rows((1, 13, 9)))
+        self.index._tombstone([(9, 1, "deleted")])
+
+        self.assertEqual(self.match(13), [])
+        self.assertEqual(self.index.delta_docs, {})
+
+    def test_any_trapdoor_of_a_group_matches(self):
+        # One trapdoor per key version; the document carries one of them
+        matched = self.index.match(1, [[token(99), token(11)]]).tolist()
+
+        self.assertEqual(matched, [2])
+        self.assertEqual(self.index.match(1, [["not-a-token"]]).tolist(), [])
+
+
+@override_settings(MEMORY_INDEX_REBUILD_SECONDS=0)
+class ShardIndexTailTests(TestCase):
+    """
+    load() / refresh() / poll() against real token rows. Row ids are
+    explicit, so tests control the gaps open transactions leave.
+    """
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(slug="tail", name="Tail", key_context="tail")
+        self.docs = [
+            EncryptedDocument.objects.create(tenant=self.tenant, encrypted_blob={})
+            for _ in range(4)
+        ]
+
+    def add_row(self, row_id, doc, number):
+        SearchTokenIndex.objects.create(
+            id=row_id, token=token(number), document=doc, tenant=self.tenant
+        )
+
+    def match(self, index, number) -> list:
+        return index.match(self.tenant.id, [[token(number)]]).tolist()
+
+    def ids(self, *positions) -> list:
+        return [self.docs[position].id for position in positions]
+
+    def test_id_gaps_are_reread_until_they_settle(self):
+        self.add_row(1000, self.docs[0], 10)
+        self.add_row(1003, self.docs[2], 10)
+
+        index = ShardIndex("default")
+        index.load()
+
+        self.assertEqual(index.last_token_id, 1003)
+        self.assertEqual([gap[:2] for gap in index.gaps][-1], (1001, 1002))
+
+        # A transaction that took id 1001 commits after the load
+        self.add_row(1001, self.docs[1], 10)
+        index.refresh()
+        index.refresh()
+
+        self.assertEqual(self.match(index, 10), self.ids(0, 1, 2))
+        self.assertEqual(index.gap_rows, {1001})
+
+        # Past SETTLE_SECONDS the gap is dropped, and so is a late row
+        index.gaps = [(1002, 1002, time.time() - 1)]
+        self.add_row(1002, self.docs[3], 10)
+        index.refresh()
+
+        self.assertEqual(self.match(index, 10), self.ids(0, 1, 2))
+        self.assertEqual(index.gaps, [])
+
+    def test_refresh_tombstones_updated_and_deleted_documents(self):
+        self.add_row(1000, self.docs[0], 10)
+        self.add_row(1001, self.docs[1], 10)
+
+        index = ShardIndex("default")
+        index.load()
+
+        # Document 0 re-tokenized, document 1 deleted
+        SearchTokenIndex.objects.filter(id=1000).delete()
+        self.add_row(1002, self.docs[0], 11)
+        EncryptedDocument.objects.filter(id=self.docs[0].id).update(updated_at=timezone.now())
+        EncryptedDocument.objects.filter(id=self.docs[1].id).update(deleted_at=timezone.now())
+
+        index.refresh()
+
+        self.assertEqual(self.match(index, 10), [])
+        self.assertEqual(self.match(index, 11), self.ids(0))
+        self.assertEqual(index.tombstones[self.tenant.id].tolist(), self.ids(0, 1))
+
+        # Changes stay in the window for SETTLE_SECONDS; applied once
+        with mock.patch.object(index, "_tombstone") as tombstone:
+            index.refresh()
+        tombstone.assert_not_called()
+
+        index.compact()
+
+        self.assertEqual(index.tombstones, {})
+        self.assertEqual(self.match(index, 10), [])
+        self.assertEqual(self.match(index, 11), self.ids(0))
+
+    def test_reader_resumes_the_tail_when_the_writer_exits(self):
+        self.add_row(1000, self.docs[0], 10)
+
+        with tempfile.TemporaryDirectory() as directory:
+            writer = ShardIndex("default", SegmentStore(directory))
+            reader = ShardIndex("default", SegmentStore(directory))
+            self.addCleanup(lambda: reader.store._lock_file and reader.store._lock_file.close())
+
+            writer.poll()
+            self.add_row(1001, self.docs[1], 11)
+            writer.poll()
+
+            reader.poll()
+
+            self.assertFalse(reader.writer)
+            self.assertEqual(self.match(reader, 11), self.ids(1))
+
+            # The writer's process exits: the kernel drops its flock
+            writer.store._lock_file.close()
+            self.add_row(1002, self.docs[2], 12)
+
+            reader.poll()
+
+            self.assertTrue(reader.writer)
+            self.assertEqual(reader.last_token_id, 1002)
+            for number, position in ((10, 0), (11, 1), (12, 2)):
+                self.assertEqual(self.match(reader, number), self.ids(position))
+
+            # Only row 1002 was tailed: nothing re-read, no segment reused
+            manifest = reader.store.read_manifest()
+            self.assertEqual(reader.stats()["postings"], 3)
+            self.assertEqual(len(set(manifest["segments"])), 3)
+            self.assertEqual(manifest["next_segment"], 4)
+
+
+# ---------------------------------------------------
+# Shared Token Buckets
+# ---------------------------------------------------
+
+class SharedBucketStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "buckets")
+        self.now = 1000.0
+
+        clock = mock.patch("documents.throttling.time.time", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_bucket_refills_over_time(self):
+        store = SharedBucketStore(self.path, slots=64)
+
+        self.assertTrue(store.consume("client", 2, 1.0)[0])
+        self.assertTrue(store.consume("client", 2, 1.0)[0])
+
+        allowed, wait = store.consume("client", 2, 1.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+
+        self.now += 0.5
+        self.assertFalse(store.consume("client", 2, 1.0)[0])
+
+        self.now += 0.6
+        self.assertTrue(store.consume("client", 2, 1.0)[0])
+
+    def test_colliding_keys_probe_separate_slots_then_evict_lru(self):
+        # One home slot: every key collides and probes the same 4 slots
+        store = SharedBucketStore(self.path, slots=1)
+        keys = ["a", "b", "c", "d"]
+
+        for key in keys:
+            self.now += 1
+            self.assertTrue(store.consume(key, 1, 0.001)[0])
+
+        for key in keys:
+            self.assertFalse(store.consume(key, 1, 0.001)[0], key)
+
+        # A fifth key evicts the least recently used bucket ("a")...
+        self.now += 1
+        self.assertTrue(store.consume("e", 1, 0.001)[0])
+        self.assertFalse(store.consume("e", 1, 0.001)[0])
+        for key in keys[1:]:
+            self.assertFalse(store.consume(key, 1, 0.001)[0], key)
+
+        # ...which starts over with a full bucket
+        self.assertTrue(store.consume("a", 1, 0.001)[0])
+
+    def test_processes_share_the_mapped_file(self):
+        SharedBucketStore(self.path, slots=64).consume("client", 1, 0.001)
+
+        self.assertFalse(SharedBucketStore(self.path, slots=64).consume("client", 1, 0.001)[0])
+
+
+# ---------------------------------------------------
+# Auditor Sessions
+# ---------------------------------------------------
+
+class AuditorSessionTests(SimpleTestCase):
+
+    def setUp(self):
+        self.auditor = SimpleNamespace(id=7, key_version=1)
+        self.session = issue_session(self.auditor)
+        self.keyword_hash = token(1)
+
+    def mac(self, keyword_hash):
+        return hmac.new(
+            bytes.fromhex(self.session["session_key"]),
+            keyword_hash.encode(),
+            hashlib.sha256
+        ).hexdigest()
+
+    def test_valid_session_mac(self):
+        token_ = self.session["session_token"]
+
+        self.assertTrue(session_is_valid(
+            self.auditor, token_, self.keyword_hash, self.mac(self.keyword_hash)
+        ))
+        self.assertTrue(verify_session_mac(
+            token_, self.keyword_hash, self.mac(self.keyword_hash).upper()
+        ))
+
+    def test_key_rotation_revokes_session(self):
+        self.auditor.key_version = 2
+
+        self.assertFalse(session_is_valid(
+            self.auditor,
+            self.session["session_token"],
+            self.keyword_hash,
+            self.mac(self.keyword_hash)
+        ))
+
+    def test_mac_bound_to_keyword_and_auditor(self):
+        token_ = self.session["session_token"]
+
+        self.assertFalse(session_is_valid(
+            self.auditor, token_, self.keyword_hash, self.mac(token(2))
+        ))
+        self.assertFalse(session_is_valid(
+            SimpleNamespace(id=8, key_version=1),
+            token_,
+            self.keyword_hash,
+            self.mac(self.keyword_hash)
+        ))
+        self.assertFalse(session_is_valid(
+            self.auditor, token_ + "x", self.keyword_hash, self.mac(self.keyword_hash)
+        ))
+
+
+def sign(message: str, private_pem: str) -> str:
+    """
+    RSA-PSS signature the way auditor clients make it.
+    """
+
+    private_key = serialization.load_pem_private_key(private_pem.encode(), password=None)
+    signature = private_key.sign(
+        message.encode(),
+        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+        hashes.SHA256()
+    )
+    return signature.hex()
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    "auditor_challenges": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+})
+class AuditorHandshakeTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(slug="handshake", name="Handshake")
+        self.private_key, public_key = generate_keypair()
+        self.auditor = Auditor.objects.create(
+            tenant=self.tenant, name="Auditor", public_key=public_key
+        )
+
+    def post(self, url, data):
+        return self.client.post(
+            f"/api/auditor/{url}",
+            data,
+            content_type="application/json",
+            headers={"X-Tenant": self.tenant.slug}
+        )
+
+    def challenge(self) -> str:
+        response = self.post("session/challenge/", {"auditor_id": self.auditor.id})
+        return response.json()["data"]["challenge"]
+
+    def exchange(self, challenge, signature=None):
+        return self.post("session/", {
+            "auditor_id": self.auditor.id,
+            "challenge": challenge,
+            "signature": signature or sign(challenge, self.private_key),
+        })
+
+    def test_challenge_buys_one_session(self):
+        challenge = self.challenge()
+
+        first = self.exchange(challenge)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()["data"]["key_version"], 1)
+
+        replay = self.exchange(challenge)
+        self.assertEqual(replay.status_code, 403)
+        self.assertEqual(replay.json()["error"]["code"], "CHALLENGE_USED")
+
+        self.assertEqual(self.exchange(self.challenge()).status_code, 201)
+
+    def test_forged_signature_does_not_use_up_the_challenge(self):
+        challenge = self.challenge()
+        other_key, _ = generate_keypair()
+
+        forged = self.exchange(challenge, sign(challenge, other_key))
+        self.assertEqual(forged.json()["error"]["code"], "INVALID_SIGNATURE")
+
+        self.assertEqual(self.exchange(challenge).status_code, 201)
+
+
+# ---------------------------------------------------
+# Compound Tokens
+# ---------------------------------------------------
+
+class CompoundTokenTests(TestCase):
+
+    def setUp(self):
+        patcher = fake_keys()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tenant = Tenant.objects.create(slug="compound", name="Compound")
+
+    def labels(self, query) -> list:
+        return [field for field, _ in query_trapdoors(query, "")]
+
+    @override_settings(COMPOUND_TOKEN_SEARCH=True)
+    def test_combination_collapses_to_one_lookup(self):
+        query = {"customer_id": "C-1", "name": "Asha", "aadhaar": "1234"}
+
+        self.assertEqual(self.labels(query), ["name+customer_id", "aadhaar"])
+        self.assertEqual(
+            self.labels({"pan": "ABCDE1234F", "compliance_flag": "clear", "name": "Asha"}),
+            ["pan+compliance_flag", "name"]
+        )
+        # Partial or blank combinations stay per field
+        self.assertEqual(self.labels({"name": "Asha"}), ["name"])
+        self.assertEqual(self.labels({"name": "Asha", "customer_id": " "}), ["name", "customer_id"])
+
+    @override_settings(COMPOUND_TOKEN_SEARCH=False)
+    def test_disabled_keeps_one_lookup_per_field(self):
+        self.assertEqual(
+            self.labels({"name": "Asha", "customer_id": "C-1"}), ["name", "customer_id"]
+        )
+
+    @override_settings(COMPOUND_TOKEN_SEARCH=True)
+    def test_query_trapdoor_matches_upload_token(self):
+        data = {"name": " Asha Verma ", "customer_id": "C-1", "pan": "ABCDE1234F"}
+        [upload_token] = compound_tokens(data, 1, "")
+        [(label, trapdoors)] = query_trapdoors(
+            {"customer_id": "c-1", "name": "ASHA VERMA"}, ""
+        )
+
+        self.assertEqual(label, "name+customer_id")
+        self.assertEqual(trapdoors, [upload_token])
+        self.assertNotEqual(
+            compound_tokens({"name": "Asha Verma", "customer_id": "C-2"}, 1, ""),
+            [upload_token]
+        )
+
+    @override_settings(COMPOUND_TOKEN_SEARCH=True, BITMAP_INDEX_FIELDS=[])
+    def test_compound_search_finds_indexed_document(self):
+        from .views import internal_shard_search
+
+        data = {"name": "Asha", "customer_id": "C-1"}
+        doc = EncryptedDocument.objects.create(tenant=self.tenant, encrypted_blob={})
+        index_document(doc, data, 1)
+        other = EncryptedDocument.objects.create(tenant=self.tenant, encrypted_blob={})
+        index_document(other, {"name": "Asha", "customer_id": "C-2"}, 1)
+
+        total, docs = internal_shard_search(
+            self.tenant, query_trapdoors({"name": "asha", "customer_id": "c-1"}, "")
+        )
+
+        self.assertEqual(total, 1)
+        self.assertEqual([found.id for found in docs], [doc.id])
+
+
+# ---------------------------------------------------
+# Async Views
+# ---------------------------------------------------
+
+urlpatterns = [
+    path("api/upload/", AsyncUploadDocumentView.as_view()),
+    path("api/search/internal/", AsyncInternalSearchView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF="documents.tests")
+class AsyncViewTestCase(TransactionTestCase):
+    """
+    The async views run the DRF views on the thread pool, on their own
+    connections: TransactionTestCase, so those see committed rows.
+    """
+
+    def setUp(self):
+        use_keyring(self)
+        isolate_throttles(self)
+
+        self.tenant = Tenant.objects.create(slug="async-views", name="Async Views")
+        self.client = AsyncClient()
+
+    async def post(self, url, data):
+        return await self.client.post(
+            url,
+            data,
+            content_type="application/json",
+            headers={"X-Tenant": self.tenant.slug}
+        )
+
+
+class AsyncViewTests(AsyncViewTestCase):
+
+    async def test_upload_then_search(self):
+        response = await self.post("/api/upload/", {"name": "Asha", "city": "Pune"})
+
+        self.assertEqual(response.status_code, 201)
+        document_id = response.json()["data"]["document_id"]
+
+        response = await self.post("/api/search/internal/", {"name": "ASHA"})
+        body = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["data"]["document_ids"], [document_id])
+        self.assertEqual(body["data"]["results"], [{"name": "Asha", "city": "Pune"}])
+        self.assertIn("render;dur=", response["Server-Timing"])
+
+    async def test_drf_parsing_and_throttles_apply(self):
+        response = await self.post("/api/search/internal/", "{")
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch.object(
+            SharedScopedRateThrottle, "THROTTLE_RATES", {"search": "1/minute"}
+        ):
+            await self.post("/api/search/internal/", {"name": "Asha"})
+            response = await self.post("/api/search/internal/", {"name": "Asha"})
+
+        self.assertEqual(response.status_code, 429)
+
+
+class AsyncProfilingTests(AsyncViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        overrides = override_settings(
+            PROFILER_DIR=self.directory,
+            PROFILER_ENABLED=True,
+            PROFILER_SAMPLE_INTERVAL_MS=1
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        # Re-read the (absent) config file, fresh sampler
+        for patcher in (
+            mock.patch.object(profiler_config, "_checked", 0.0),
+            mock.patch.object(profiling, "_sampler", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def profiles(self, suffix) -> list:
+        return [name for name in os.listdir(self.directory) if name.endswith(suffix)]
+
+    def read(self, name) -> bytes:
+        with gzip.open(os.path.join(self.directory, name)) as fh:
+            return fh.read()
+
+    @override_settings(PROFILER_SAMPLE_RATE=1.0)
+    async def test_cprofile_covers_the_offloaded_view(self):
+        response = await self.post("/api/search/internal/", {"name": "Asha"})
+        self.assertEqual(response.status_code, 200)
+
+        [name] = self.profiles(".prof.gz")
+        functions = {function for _, _, function in marshal.loads(self.read(name))}
+
+        self.assertIn("internal_shard_search", functions)
+        self.assertIn("-post-api-search-internal-", name)
+
+    @override_settings(PROFILER_SAMPLE_RATE=0.0, PROFILER_SLOW_MS=1)
+    async def test_slow_request_keeps_folded_stacks(self):
+        def slow_search(*args):
+            time.sleep(0.05)
+            return 0, []
+
+        with mock.patch("documents.views.internal_shard_search", slow_search):
+            await self.post("/api/search/internal/", {"name": "Asha"})
+
+        [name] = self.profiles(".folded.gz")
+        self.assertIn("slow_search (tests.py)", self.read(name).decode())
+
+    @override_settings(PROFILER_ENABLED=False, PROFILER_SAMPLE_RATE=1.0)
+    async def test_disabled_profiles_nothing(self):
+        await self.post("/api/search/internal/", {"name": "Asha"})
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+# ---------------------------------------------------
+# Master Key Rotation
+# ---------------------------------------------------
+
+class RotateMasterKeyTests(TestCase):
+    # name and compliance_flag
+    token_rows_per_document = 2
+
+    def setUp(self):
+        use_keyring(self, active=1)
+
+        self.tenant = Tenant.objects.create(
+            slug="rotation", name="Rotation", key_context="rotation"
+        )
+        self.docs = [
+            store_document(
+                self.tenant, {"name": f"Person {number}", "compliance_flag": "clear"}
+            )
+            for number in range(5)
+        ]
+        self.ids = [doc.id for doc in self.docs]
+
+        # Version 2 becomes active; version 1 stays readable
+        use_keyring(self, active=2, retired=[1])
+
+    def rotate(self, **options):
+        call_command(
+            "rotate_master_key", sleep=0, batch_size=2, stdout=StringIO(), **options
+        )
+
+    def versions(self) -> dict:
+        return {
+            "documents": sorted(
+                EncryptedDocument.objects.values_list("key_version", flat=True)
+            ),
+            "tokens": sorted(
+                set(SearchTokenIndex.objects.values_list("key_version", flat=True))
+            ),
+        }
+
+    def assert_readable_and_searchable(self):
+        for doc in EncryptedDocument.objects.order_by("id"):
+            data = sse.decrypt_document(doc.encrypted_blob)
+            self.assertEqual(data["compliance_flag"], "clear")
+            self.assertEqual(doc.encrypted_blob["key_version"], doc.key_version)
+
+        self.assertEqual(search_ids(self.tenant, {"compliance_flag": "CLEAR"}), self.ids)
+        self.assertEqual(search_ids(self.tenant, {"name": "Person 3"}), [self.ids[3]])
+
+    def test_retired_key_still_decrypts_and_searches_before_rotation(self):
+        self.assertEqual(self.versions()["documents"], [1] * 5)
+        self.assert_readable_and_searchable()
+
+    def test_interrupted_batch_rolls_back_and_resumes(self):
+        real_remove = remove_documents
+        batches = []
+
+        def crash_in_second_batch(document_ids):
+            batches.append(list(document_ids))
+            if len(batches) == 2:
+                raise RuntimeError("worker killed")
+            return real_remove(document_ids)
+
+        with mock.patch(
+            "documents.management.commands.rotate_master_key.remove_documents",
+            crash_in_second_batch
+        ), self.assertRaises(RuntimeError):
+            self.rotate()
+
+        # The first batch committed; the second rolled back whole
+        self.assertEqual(self.versions()["documents"], [1, 1, 1, 2, 2])
+        self.assertEqual(
+            sorted(EncryptedDocument.objects.filter(key_version=2).values_list("id", flat=True)),
+            self.ids[:2]
+        )
+        self.assert_readable_and_searchable()
+
+        self.rotate()
+
+        self.assertEqual(self.versions(), {"documents": [2] * 5, "tokens": [2]})
+        self.assertEqual(PostingList.objects.exists(), self.token_rows_per_document == 1)
+        self.assertEqual(
+            SearchTokenIndex.objects.count(),
+            5 * self.token_rows_per_document,
+            "token rows rewritten, not duplicated"
+        )
+
+        # Version 1 can now be dropped from the keyring
+        use_keyring(self, active=2)
+        self.assert_readable_and_searchable()
+
+    def test_max_batches_stops_and_rerun_continues(self):
+        self.rotate(max_batches=1)
+        self.assertEqual(self.versions()["documents"], [1, 1, 1, 2, 2])
+
+        self.rotate()
+        self.assertEqual(self.versions()["documents"], [2] * 5)
+
+    def test_refuses_when_pending_version_is_not_loaded(self):
+        use_keyring(self, active=2)
+
+        with self.assertRaisesMessage(CommandError, "Key versions [1] are not loaded"):
+            self.rotate()
+
+        self.assertEqual(self.versions()["documents"], [1] * 5)
+
+
+@override_settings(BITMAP_INDEX_FIELDS=["compliance_flag"])
+class RotateMasterKeyBitmapTests(RotateMasterKeyTests):
+    # compliance_flag lives in a posting list instead
+    token_rows_per_document = 1
+
+
+# ---------------------------------------------------
+# Reindex & Synthetic Loads
+# ---------------------------------------------------
+
+class ReindexTests(TestCase):
+    def setUp(self):
+        use_keyring(self)
+
+        self.tenant = Tenant.objects.create(
+            slug="reindex", name="Reindex", key_context="reindex"
+        )
+        self.ids = [
+            store_document(self.tenant, {
+                "name": f"Person {number}",
+                "customer_id": f"C-{number}",
+                "compliance_flag": "clear",
+            }).id
+            for number in range(5)
+        ]
+        self.indexed = self.index_state()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint_path = os.path.join(directory.name, "reindex.json")
+
+    def reindex(self, **options) -> str:
+        out = StringIO()
+        call_command(
+            "reindex", sleep=0, checkpoint=self.checkpoint_path, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def index_state(self) -> dict:
+        return {
+            "tokens": set(SearchTokenIndex.objects.values_list(
+                "document_id", "token", "external_token", "key_version"
+            )),
+            "postings": document_postings(EncryptedDocument.objects.values_list("id", flat=True)),
+        }
+
+    def fields(self) -> list:
+        return list(SEARCHABLE_FIELDS) + [
+            compound_label(fields) for fields in COMPOUND_FIELDS
+        ]
+
+    def test_full_run_adds_missing_and_prunes_stale_tokens(self):
+        SearchTokenIndex.objects.filter(document_id=self.ids[0]).first().delete()
+        SearchTokenIndex.objects.create(
+            token=token(1), document_id=self.ids[1], tenant=self.tenant, key_version=1
+        )
+
+        output = self.reindex()
+
+        self.assertIn("5 documents, 1 tokens added, 1 removed, 0 skipped", output)
+        self.assertEqual(self.index_state(), self.indexed)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_field_selection_only_adds(self):
+        SearchTokenIndex.objects.filter(document_id=self.ids[0]).delete()
+        SearchTokenIndex.objects.create(
+            token=token(1), document_id=self.ids[1], tenant=self.tenant, key_version=1
+        )
+
+        self.reindex(fields=["name"])
+
+        self.assertEqual(SearchTokenIndex.objects.filter(document_id=self.ids[0]).count(), 1)
+        self.assertEqual(search_ids(self.tenant, {"name": "Person 0"}), [self.ids[0]])
+        self.assertTrue(SearchTokenIndex.objects.filter(token=token(1)).exists())
+
+        self.reindex()
+
+        self.assertEqual(self.index_state(), self.indexed)
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        SearchTokenIndex.objects.all().delete()
+        remove_documents(self.ids)
+
+        output = self.reindex(chunk_size=2, max_chunks=1)
+
+        self.assertIn("Stopped early", output)
+        self.assertEqual(
+            set(SearchTokenIndex.objects.values_list("document_id", flat=True)),
+            set(self.ids[:2])
+        )
+
+        # A different field selection does not pick up this run's progress
+        fields = ReindexCheckpoint(self.checkpoint_path, ["name"], prune=False)
+        self.assertFalse(fields.load())
+
+        output = self.reindex(chunk_size=2)
+
+        self.assertIn(f"Resuming after document {self.ids[1]}", output)
+        self.assertIn("Reindex complete", output)
+        self.assertIn("5 documents", output)
+        self.assertEqual(self.index_state(), self.indexed)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_document_changed_after_read_is_skipped(self):
+        SearchTokenIndex.objects.all().delete()
+        remove_documents(self.ids)
+
+        rows = next(id_chunks(0, chunk_size=10))
+        desired = desired_tokens(rows, self.fields())
+
+        EncryptedDocument.objects.filter(id=self.ids[2]).update(updated_at=timezone.now())
+
+        stats = apply_chunk(desired, prune=True)
+
+        self.assertEqual((stats["documents"], stats["skipped"]), (4, 1))
+        self.assertNotIn(
+            self.ids[2], SearchTokenIndex.objects.values_list("document_id", flat=True)
+        )
+
+    def test_bulk_load_indexes_like_uploads(self):
+        bulk_load(3, seed=7, tenant=self.tenant)
+
+        for doc in EncryptedDocument.objects.exclude(id__in=self.ids):
+            rows, postings = build_index_entries(
+                doc, sse.decrypt_document(doc.encrypted_blob), doc.key_version
+            )
+
+            self.assertEqual(
+                set(
+                    SearchTokenIndex.objects.filter(document=doc)
+                    .values_list("token", "external_token")
+                ),
+                {(row.token, row.external_token) for row in rows}
+            )
+            self.assertEqual(document_postings([doc.id]).get(doc.id, set()), postings)
+
+        self.assertIn("8 documents, 0 tokens added, 0 removed", self.reindex())
+
+
+@override_settings(BITMAP_INDEX_FIELDS=["compliance_flag"])
+class ReindexBitmapTests(ReindexTests):
+    """
+    The same runs with compliance_flag in posting lists.
+    """
+
+    def test_missing_postings_are_restored(self):
+        self.assertTrue(self.indexed["postings"])
+
+        remove_documents(self.ids[:2])
+        output = self.reindex()
+
+        self.assertIn("4 tokens added, 0 removed", output)
+        self.assertEqual(self.index_state(), self.indexed)
+
+
+# ---------------------------------------------------
+# Index Archives
+# ---------------------------------------------------
+
+def downgrade_archive(directory: str, version: int):
+    """
+    Rewrites an export as the given older archive version: no posting
+    lists before 3, and no tenants before 2.
+    """
+
+    manifest = load_manifest(directory)
+    manifest["version"] = version
+    manifest["tables"].pop(POSTINGS, None)
+
+    if version == 1:
+        del manifest["tenants"]
+
+        for table, info in manifest["tables"].items():
+            column = info["columns"].index("tenant_id")
+            writer = _ChunkWriter(directory, f"v1-{table}", chunk_rows=2)
+
+            for chunk in info["chunks"]:
+                for row in read_rows(os.path.join(directory, chunk["file"])):
+                    del row[column]
+                    writer.write(row)
+
+            del info["columns"][column]
+            info["chunks"] = writer.finish()
+
+    with open(os.path.join(directory, MANIFEST), "w") as fh:
+        json.dump(manifest, fh)
+
+
+@override_settings(BITMAP_INDEX_FIELDS=["compliance_flag"])
+class ArchiveTests(TransactionTestCase):
+    """
+    import_archive loads chunks on worker threads with their own
+    connections: TransactionTestCase, so those see committed rows.
+    """
+
+    def setUp(self):
+        use_keyring(self)
+
+        # The flush after a test also removes the migrated default tenant
+        for cache in (tenancy._by_slug, tenancy._by_id):
+            patcher = mock.patch.dict(cache, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.default, _ = Tenant.objects.get_or_create(
+            slug=settings.DEFAULT_TENANT,
+            defaults={"name": "Default", "key_context": ""}
+        )
+        self.tenant = Tenant.objects.create(
+            slug="archive", name="Archive", key_context="archive"
+        )
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, "export")
+
+    def populate(self, tenant) -> list:
+        return [
+            store_document(tenant, {
+                "name": f"Person {number}",
+                "compliance_flag": "review" if number % 2 else "clear",
+            }).id
+            for number in range(3)
+        ]
+
+    def export(self) -> dict:
+        call_command("export_index", self.directory, chunk_rows=2, stdout=StringIO())
+        return load_manifest(self.directory)
+
+    def import_(self, **options) -> str:
+        out = StringIO()
+        call_command("import_index", self.directory, stdout=out, **options)
+        return out.getvalue()
+
+    def rows(self) -> dict:
+        return {
+            "documents": list(
+                EncryptedDocument.objects.live().order_by("id").values_list(
+                    "id", "tenant_id", "key_version", "created_at", "encrypted_blob"
+                )
+            ),
+            "tokens": list(
+                SearchTokenIndex.objects.filter(document__deleted_at__isnull=True)
+                .order_by("id")
+                .values_list(
+                    "id", "document_id", "tenant_id", "token", "external_token", "key_version"
+                )
+            ),
+            "postings": sorted(
+                (tenant_id, token, external, container, bytes(bitmap))
+                for tenant_id, token, external, container, bitmap in (
+                    PostingList.objects.values_list(*POSTING_COLUMNS)
+                )
+            ),
+        }
+
+    def clear_index(self):
+        EncryptedDocument.objects.all().delete()
+        PostingList.objects.all().delete()
+
+    def test_round_trip(self):
+        ids = self.populate(self.tenant)
+        self.populate(self.default)
+
+        # Tombstoned documents stay behind
+        EncryptedDocument.objects.filter(id=ids[0]).update(deleted_at=timezone.now())
+        remove_documents([ids[0]])
+
+        exported = self.rows()
+        manifest = self.export()
+
+        self.assertEqual(manifest["version"], ARCHIVE_VERSION)
+        self.assertEqual(manifest["key_versions"], [1])
+        self.assertEqual(manifest["tables"]["documents"]["rows"], 5)
+        self.assertEqual(len(manifest["tables"]["documents"]["chunks"]), 3)
+
+        for info in manifest["tables"].values():
+            for chunk in info["chunks"]:
+                with open(os.path.join(self.directory, chunk["file"]), "rb") as fh:
+                    self.assertEqual(hashlib.sha256(fh.read()).hexdigest(), chunk["sha256"])
+
+        self.clear_index()
+        output = self.import_()
+
+        self.assertIn("Imported 5 documents and 5 tokens", output)
+        self.assertEqual(self.rows(), exported)
+        self.assertEqual(search_ids(self.tenant, {"name": "Person 1"}), [ids[1]])
+        self.assertEqual(search_ids(self.tenant, {"compliance_flag": "CLEAR"}), [ids[2]])
+
+        # Sequences continue after the imported ids
+        self.assertGreater(self.populate(self.tenant)[0], max(ids))
+
+    def test_older_versions_load(self):
+        ids = self.populate(self.default)
+        exported = self.rows()
+        self.export()
+
+        for version in (2, 1):
+            with self.subTest(version=version):
+                downgrade_archive(self.directory, version)
+                self.clear_index()
+
+                self.import_()
+
+                imported = self.rows()
+                self.assertEqual(imported["documents"], exported["documents"])
+                self.assertEqual(imported["tokens"], exported["tokens"])
+
+                # Before version 3 posting lists are left to reindex
+                self.assertEqual(imported["postings"], [])
+                self.assertEqual(search_ids(self.default, {"name": "Person 2"}), [ids[2]])
+
+    def test_checksum_mismatch_is_rejected(self):
+        self.populate(self.tenant)
+        manifest = self.export()
+
+        chunk = manifest["tables"]["tokens"]["chunks"][0]["file"]
+        with open(os.path.join(self.directory, chunk), "ab") as fh:
+            fh.write(b"\0")
+
+        with self.assertRaisesMessage(CommandError, f"Checksum mismatch in {chunk}"):
+            self.import_(verify_only=True)
+
+    def test_different_master_key_is_rejected(self):
+        self.populate(self.tenant)
+        self.export()
+        self.clear_index()
+
+        # Same version number, different key material
+        with mock.patch.dict(os.environ, {"MASTER_KEY": master_key(b"x")}):
+            sse._keyring.cache_clear()
+            sse._tenant_keys.cache_clear()
+
+            with self.assertRaisesMessage(CommandError, "differ from"):
+                self.import_()
+
+        self.assertFalse(EncryptedDocument.objects.exists())
+
+
+# ---------------------------------------------------
+# Auditor Logs
+# ---------------------------------------------------
+
+class AuditorLogsTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(slug="logs", name="Logs")
+        self.auditor = Auditor.objects.create(
+            tenant=self.tenant, name="Auditor", public_key="unused"
+        )
+
+        # Three logs share one timestamp and two another, so pages and
+        # cursors have to split ties by id
+        start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        offsets = [0, 5, 5, 5, 10, 20, 20, 30]
+
+        for number, offset in enumerate(offsets):
+            log = ExternalSearchAudit.objects.create(
+                auditor=self.auditor,
+                tenant=self.tenant,
+                keyword_hash=f"{number:064x}",
+                success=number % 3 != 0,
+                failure_reason=None if number % 3 else "NO_MATCH",
+                execution_time_ms=1.5 * number,
+            )
+            ExternalSearchAudit.objects.filter(id=log.id).update(
+                created_at=start + timedelta(minutes=offset)
+            )
+
+        self.newest_first = list(
+            ExternalSearchAudit.objects.order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def get(self, **params):
+        return self.client.get(
+            f"/api/auditor/{self.auditor.id}/logs/",
+            params,
+            headers={"X-Tenant": self.tenant.slug}
+        )
+
+    def pages(self, **params) -> list:
+        pages = []
+        cursor = None
+
+        while True:
+            body = self.get(limit=2, **params, **({"cursor": cursor} if cursor else {})).json()
+            pages.append(body["data"]["logs"])
+            cursor = body["data"]["next_cursor"]
+
+            self.assertEqual(body["meta"]["has_more"], cursor is not None)
+            if cursor is None:
+                return pages
+
+    def test_cursor_pages_split_ties_without_gaps_or_repeats(self):
+        pages = self.pages()
+        ids = [log["id"] for page in pages for log in page]
+
+        self.assertEqual(ids, self.newest_first)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 2])
+
+    def test_cursor_keeps_filters(self):
+        ids = [log["id"] for page in self.pages(success="false") for log in page]
+
+        self.assertEqual(
+            ids,
+            [
+                log_id for log_id in self.newest_first
+                if not ExternalSearchAudit.objects.get(id=log_id).success
+            ]
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.get(cursor="not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"]["code"], "INVALID_QUERY")
+
+    @mock.patch.object(audit_logs, "EXPORT_CHUNK_ROWS", 3)
+    def test_csv_export_streams_every_row(self):
+        response = self.get(export="csv")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn(f"auditor-{self.auditor.id}-logs.csv", response["Content-Disposition"])
+
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        rows = list(csv.DictReader(StringIO("".join(chunks))))
+
+        # Header, then three chunks of at most 3 rows
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(list(rows[0]), AUDIT_LOG_FIELDS)
+        self.assertEqual([int(row["id"]) for row in rows], self.newest_first)
+
+    @mock.patch.object(audit_logs, "EXPORT_CHUNK_ROWS", 3)
+    def test_ndjson_export_matches_pages(self):
+        response = self.get(export="ndjson", success="true")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        exported = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+
+        self.assertEqual(
+            exported,
+            [log for page in self.pages(success="true") for log in page]
+        )
+
+    def test_unknown_export_format_is_rejected(self):
+        response = self.get(export="xml")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"]["code"], "INVALID_EXPORT_FORMAT")
+
+
+# ---------------------------------------------------
+# Audit Retention
+# ---------------------------------------------------
+
+@override_settings(AUDIT_RETENTION_DAYS=30, AUDIT_FAILURE_RETENTION_DAYS=90)
+class AuditRetentionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive = AuditArchive(directory.name)
+
+        tenant = Tenant.objects.create(slug="retention", name="Retention")
+        auditor = Auditor.objects.create(tenant=tenant, name="Auditor", public_key="unused")
+        now = timezone.now()
+        self.ids = {}
+
+        # (label, success, age in days)
+        for label, success, age in [
+            ("recent success", True, 10),
+            ("old success", True, 40),
+            ("old failure", False, 40),
+            ("expired failure", False, 100),
+            ("expired success", True, 100),
+        ]:
+            log = ExternalSearchAudit.objects.create(
+                auditor=auditor,
+                tenant=tenant,
+                keyword_hash=label,
+                success=success,
+                total_matches=2,
+                returned_count=1,
+                execution_time_ms=4.0,
+            )
+            ExternalSearchAudit.objects.filter(id=log.id).update(
+                created_at=now - timedelta(days=age)
+            )
+            self.ids[label] = log.id
+
+        self.expired = sorted(
+            self.ids[label] for label in ("old success", "expired failure", "expired success")
+        )
+        self.kept = sorted(self.ids[label] for label in ("recent success", "old failure"))
+
+    def archive_logs(self, **options) -> str:
+        out = StringIO()
+        call_command(
+            "archive_audit_logs",
+            archive_dir=self.archive.directory,
+            sleep=0,
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def table_ids(self) -> list:
+        return sorted(ExternalSearchAudit.objects.values_list("id", flat=True))
+
+    def rolled_up(self) -> dict:
+        return dict(
+            ExternalSearchAuditRollup.objects.values_list("success")
+            .annotate(Sum("searches"))
+        )
+
+    def test_failures_are_kept_longer_than_successes(self):
+        self.assertEqual(
+            sorted(expired_audits().values_list("id", flat=True)), self.expired
+        )
+
+    def test_expired_rows_move_to_chunks_and_rollups(self):
+        output = self.archive_logs(batch_size=2)
+
+        self.assertIn("Archived 3 audit rows", output)
+        self.assertEqual(self.table_ids(), self.kept)
+        self.assertEqual([chunk["rows"] for chunk in self.archive.chunks()], [2, 1])
+        self.assertEqual(
+            sorted(row["id"] for row in scan_archive(self.archive)), self.expired
+        )
+        self.assertEqual(self.rolled_up(), {True: 2, False: 1})
+
+    def test_recover_finishes_an_interrupted_delete(self):
+        with mock.patch(
+            "documents.audit_retention.retire", side_effect=RuntimeError("killed")
+        ), self.assertRaises(RuntimeError):
+            self.archive.archive_batch(batch_size=10)
+
+        # Written and listed, but nothing deleted yet
+        self.assertEqual(len(self.archive.chunks()), 1)
+        self.assertEqual(len(self.table_ids()), 5)
+
+        output = self.archive_logs(batch_size=10)
+
+        self.assertIn("Finished an interrupted chunk: 3 rows", output)
+        self.assertIn("Archived 0 audit rows", output)
+        self.assertEqual(self.table_ids(), self.kept)
+        self.assertEqual(len(self.archive.chunks()), 1)
+
+        # Already retired rows are not counted twice
+        self.assertEqual(self.archive.recover(), 0)
+        self.assertEqual(self.rolled_up(), {True: 2, False: 1})
+
+    def test_second_run_is_refused_while_one_holds_the_lock(self):
+        with self.archive.lock():
+            with self.assertRaisesMessage(CommandError, "Another run is archiving"):
+                self.archive_logs()
+
+        self.assertEqual(len(self.table_ids()), 5)
+        self.assertIn("Archived 3 audit rows", self.archive_logs())
+
+
+# ---------------------------------------------------
+# Document Updates & Deletes
+# ---------------------------------------------------
+
+class DocumentLifecycleTests(TestCase):
+    def setUp(self):
+        use_keyring(self)
+        isolate_throttles(self)
+
+        self.tenant = Tenant.objects.create(
+            slug="lifecycle", name="Lifecycle", key_context="lifecycle"
+        )
+        self.docs = [
+            store_document(self.tenant, {"name": name, "compliance_flag": "clear"})
+            for name in ("Alice", "Bob", "Carol")
+        ]
+        self.doc = self.docs[0]
+
+    def request(self, method, url, data=None, tenant=None):
+        return getattr(self.client, method)(
+            f"/api/documents/{url}",
+            data,
+            content_type="application/json",
+            headers={"X-Tenant": (tenant or self.tenant).slug}
+        )
+
+    def token_pairs(self, doc) -> set:
+        return set(
+            SearchTokenIndex.objects.filter(document=doc)
+            .values_list("token", "external_token")
+        )
+
+    def test_put_replaces_token_rows_and_postings(self):
+        response = self.request(
+            "put", f"{self.doc.id}/", {"name": "Alicia", "compliance_flag": "review"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.doc.refresh_from_db()
+        rows, postings = build_index_entries(
+            self.doc, {"name": "Alicia", "compliance_flag": "review"}, 1
+        )
+
+        self.assertEqual(
+            self.token_pairs(self.doc), {(row.token, row.external_token) for row in rows}
+        )
+        self.assertEqual(document_postings([self.doc.id]).get(self.doc.id, set()), postings)
+        self.assertEqual(search_ids(self.tenant, {"name": "Alice"}), [])
+        self.assertEqual(search_ids(self.tenant, {"name": "Alicia"}), [self.doc.id])
+        self.assertNotIn(self.doc.id, search_ids(self.tenant, {"compliance_flag": "clear"}))
+        self.assertEqual(search_ids(self.tenant, {"compliance_flag": "review"}), [self.doc.id])
+
+    def test_patch_merges_and_null_removes_a_field(self):
+        response = self.request(
+            "patch", f"{self.doc.id}/", {"compliance_flag": None, "customer_id": "C-1"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.doc.refresh_from_db()
+        self.assertEqual(
+            sse.decrypt_document(self.doc.encrypted_blob),
+            {"name": "Alice", "customer_id": "C-1"}
+        )
+        self.assertEqual(
+            search_ids(self.tenant, {"compliance_flag": "clear"}),
+            [doc.id for doc in self.docs[1:]]
+        )
+        self.assertEqual(
+            search_ids(self.tenant, {"name": "Alice", "customer_id": "C-1"}), [self.doc.id]
+        )
+
+    def test_delete_hides_the_document_until_purged(self):
+        response = self.request("delete", f"{self.doc.id}/delete/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(search_ids(self.tenant, {"name": "Alice"}), [])
+        self.assertEqual(
+            search_ids(self.tenant, {"compliance_flag": "clear"}),
+            [doc.id for doc in self.docs[1:]]
+        )
+        self.assertNotIn(self.doc.id, document_postings([self.doc.id]))
+
+        # Tombstoned: gone for the API, rows kept for the purge
+        self.assertEqual(self.request("delete", f"{self.doc.id}/delete/").status_code, 404)
+        self.assertEqual(self.request("put", f"{self.doc.id}/", {"name": "X"}).status_code, 404)
+        self.assertTrue(EncryptedDocument.objects.filter(id=self.doc.id).exists())
+
+        call_command("purge_deleted_documents", sleep=0, stdout=StringIO())
+
+        self.assertFalse(EncryptedDocument.objects.filter(id=self.doc.id).exists())
+        self.assertFalse(SearchTokenIndex.objects.filter(document_id=self.doc.id).exists())
+        self.assertEqual(EncryptedDocument.objects.count(), 2)
+
+    def test_bulk_delete(self):
+        response = self.request(
+            "post", "delete/", {"document_ids": [self.docs[0].id, self.docs[1].id, 999999]}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["data"]["deleted"], body["meta"]["not_found"]), (2, 1))
+        self.assertEqual(
+            search_ids(self.tenant, {"compliance_flag": "clear"}), [self.docs[2].id]
+        )
+
+        self.assertEqual(
+            self.request("post", "delete/", {"document_ids": "all"}).status_code, 400
+        )
+
+    def test_other_tenants_documents_are_not_found(self):
+        other = Tenant.objects.create(slug="other", name="Other", key_context="other")
+
+        for method, url, data in [
+            ("put", f"{self.doc.id}/", {"name": "Mallory"}),
+            ("delete", f"{self.doc.id}/delete/", None),
+        ]:
+            response = self.request(method, url, data, tenant=other)
+            self.assertEqual(response.status_code, 404)
+
+        response = self.request("post", "delete/", {"document_ids": [self.doc.id]}, tenant=other)
+        self.assertEqual(response.json()["data"]["deleted"], 0)
+        self.assertEqual(search_ids(self.tenant, {"name": "Alice"}), [self.doc.id])
+
+
+@override_settings(BITMAP_INDEX_FIELDS=["compliance_flag"])
+class DocumentLifecycleBitmapTests(DocumentLifecycleTests):
+    """
+    The same requests with compliance_flag in posting lists.
+    """
+
+
+# ---------------------------------------------------
+# Sharding
+# ---------------------------------------------------
+
+class JumpHashTests(SimpleTestCase):
+    keys = range(1, 20001)
+
+    def test_keys_spread_evenly(self):
+        counts = Counter(jump_hash(key, 4) for key in self.keys)
+
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        for count in counts.values():
+            self.assertAlmostEqual(count / len(self.keys), 0.25, delta=0.02)
+
+    def test_adding_a_bucket_only_moves_keys_onto_it(self):
+        for buckets in range(1, 9):
+            moved = [
+                key for key in self.keys
+                if jump_hash(key, buckets) != jump_hash(key, buckets + 1)
+            ]
+
+            self.assertEqual({jump_hash(key, buckets + 1) for key in moved}, {buckets})
+            self.assertAlmostEqual(
+                len(moved) / len(self.keys), 1 / (buckets + 1), delta=0.02
+            )
+
+    def test_shard_for_is_stable_when_a_shard_is_appended(self):
+        with override_settings(DATABASE_SHARDS=["s0", "s1", "s2"]):
+            before = {document_id: shard_for(document_id) for document_id in self.keys}
+
+        with override_settings(DATABASE_SHARDS=["s0", "s1", "s2", "s3"]):
+            after = {document_id: shard_for(document_id) for document_id in self.keys}
+
+        self.assertEqual(
+            {after[key] for key in self.keys if before[key] != after[key]}, {"s3"}
+        )
+        self.assertEqual(set(shards_by_document(self.keys)), {"default"})
+
+
+@override_settings(DATABASE_SHARDS=["s0", "s1", "s2"], SHARD_POOL_WORKERS=6)
+class ScatterTests(SimpleTestCase):
+    """
+    scatter() against stand-in connections: the pool, timeouts and
+    per-shard slots are what is under test, not the queries.
+    """
+
+    def setUp(self):
+        self.release = threading.Event()
+
+        executor = ThreadPoolExecutor(max_workers=6)
+        self.addCleanup(executor.shutdown, wait=True)
+        # Runs first: lets hung calls finish so the pool can shut down
+        self.addCleanup(self.release.set)
+
+        for name, value in [
+            ("_executor", executor),
+            ("_shard_slots", {}),
+            ("connections", mock.MagicMock()),
+        ]:
+            patcher = mock.patch.object(sharding, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def hang_on(self, alias):
+        def func():
+            if document_db() == alias:
+                self.release.wait(5)
+            return document_db()
+
+        return func
+
+    def test_every_shard_runs_with_its_alias_active(self):
+        results, failed = scatter(document_db)
+
+        self.assertEqual(results, {"s0": "s0", "s1": "s1", "s2": "s2"})
+        self.assertEqual(failed, [])
+
+    def test_slow_and_failing_shards_are_reported(self):
+        def func():
+            if document_db() == "s2":
+                raise ValueError("broken shard")
+            return self.hang_on("s1")()
+
+        with self.assertLogs("documents.sharding", "WARNING"):
+            results, failed = scatter(func, timeout=0.1)
+
+        self.assertEqual(results, {"s0": "s0"})
+        self.assertEqual(
+            sorted(failed, key=lambda item: item["shard"]),
+            [
+                {"shard": "s1", "error": "timeout"},
+                {"shard": "s2", "error": "ValueError"},
+            ]
+        )
+
+    def test_hung_shard_cannot_take_the_whole_pool(self):
+        func = self.hang_on("s1")
+
+        with self.assertLogs("documents.sharding", "WARNING"):
+            # Each timed-out call keeps one of s1's two pool threads busy
+            for _ in range(2):
+                _, failed = scatter(func, timeout=0.1)
+                self.assertEqual(failed, [{"shard": "s1", "error": "timeout"}])
+
+            # s1 is refused up front; the other shards still get threads
+            started = time.perf_counter()
+            results, failed = scatter(func, timeout=1)
+
+            self.assertLess(time.perf_counter() - started, 0.5)
+            self.assertEqual(results, {"s0": "s0", "s2": "s2"})
+            self.assertEqual(failed, [{"shard": "s1", "error": "busy"}])
+
+            # Finished calls give their slots back
+            self.release.set()
+            deadline = time.monotonic() + 2
+
+            while set(scatter(func, timeout=1)[0]) != {"s0", "s1", "s2"}:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_unsharded_runs_inline_and_raises(self):
+        self.assertEqual(scatter(document_db), ({"default": "default"}, []))
+
+        with self.assertRaises(ValueError):
+            scatter(mock.Mock(side_effect=ValueError))
+
+
+# ---------------------------------------------------
+# Auditor Tenancy
+# ---------------------------------------------------
+
+class AuditorTenancyTests(TestCase):
+    def setUp(self):
+        self.home = Tenant.objects.create(slug="home", name="Home")
+        self.other = Tenant.objects.create(slug="other", name="Other")
+        self.auditor = Auditor.objects.create(
+            tenant=self.home, name="Auditor", public_key="unused"
+        )
+
+    def request(self, method, url, tenant, data=None):
+        return getattr(self.client, method)(
+            f"/api/auditor/{url}",
+            data,
+            content_type="application/json",
+            headers={"X-Tenant": tenant.slug}
+        )
+
+    def requests(self):
+        auditor_id = self.auditor.id
+
+        return [
+            ("get", f"{auditor_id}/logs/", None),
+            ("post", "session/challenge/", {"auditor_id": auditor_id}),
+            (
+                "post",
+                "session/",
+                {"auditor_id": auditor_id, "challenge": "c", "signature": "s"}
+            ),
+            ("post", "rotate-key/", {"auditor_id": auditor_id}),
+            ("delete", f"{auditor_id}/delete/", None),
+        ]
+
+    def test_other_tenant_cannot_reach_the_auditor(self):
+        for method, url, data in self.requests():
+            with self.subTest(url=url):
+                response = self.request(method, url, self.other, data)
+
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()["error"]["code"], "AUDITOR_NOT_FOUND")
+
+        self.auditor.refresh_from_db()
+        self.assertEqual((self.auditor.key_version, self.auditor.public_key), (1, "unused"))
+
+    def test_own_tenant_reaches_the_auditor(self):
+        expected = [200, 200, 403, 200, 200]
+
+        for (method, url, data), status_code in zip(self.requests(), expected):
+            with self.subTest(url=url):
+                response = self.request(method, url, self.home, data)
+                self.assertEqual(response.status_code, status_code)
+
+        self.assertFalse(Auditor.objects.exists())
+
+
+# ---------------------------------------------------
+# Error Metrics
+# ---------------------------------------------------
+
+def failures(code: str) -> float:
+    return REGISTRY.get_sample_value("securematch_failures_total", {"code": code}) or 0
+
+
+class ErrorMetricsTests(TestCase):
+    def test_error_responses_are_counted_by_code(self):
+        tenant = Tenant.objects.create(slug="metrics", name="Metrics")
+        not_found, unknown = failures("AUDITOR_NOT_FOUND"), failures("UNKNOWN_TENANT")
+
+        # A DRF Response from a view, then a JsonResponse from TenantMiddleware
+        self.client.get("/api/auditor/999999/logs/", headers={"X-Tenant": tenant.slug})
+        self.client.get("/api/auditor/999999/logs/", headers={"X-Tenant": "nobody"})
+
+        self.assertEqual(failures("AUDITOR_NOT_FOUND"), not_found + 1)
+        self.assertEqual(failures("UNKNOWN_TENANT"), unknown + 1)
+
+    def test_building_an_error_body_records_nothing(self):
+        before = failures("NEVER_SENT")
+
+        error_response("NEVER_SENT", "Built but not returned")
+
+        self.assertEqual(failures("NEVER_SENT"), before)
+
+    def test_error_code(self):
+        self.assertEqual(
+            error_code(JsonResponse(error_response("CODE", "m"), status=400)), "CODE"
+        )
+        self.assertIsNone(error_code(JsonResponse(error_response("CODE", "m"))))
+        self.assertIsNone(error_code(HttpResponse("<h1>Not Found</h1>", status=404)))
+        self.assertIsNone(error_code(JsonResponse({"detail": "x"}, status=403)))
+
+
+# ---------------------------------------------------
+# Search Frequency
+# ---------------------------------------------------
+
+class SearchFrequencyTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        patcher = override_settings(CACHES={
+            **settings.CACHES,
+            "search_frequency": {
+                "BACKEND": "documents.cache_backends.CounterFileBasedCache",
+                "LOCATION": directory.name,
+            },
+        })
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        tenant = Tenant.objects.create(slug="frequency", name="Frequency")
+        self.auditor = Auditor.objects.create(tenant=tenant, name="Auditor", public_key="unused")
+        self.tracker = SearchFrequencyTracker()
+
+    def at_minute(self, minute):
+        patcher = mock.patch.object(
+            SearchFrequencyTracker, "_current_minute", return_value=minute
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def counts_at(self, minute) -> tuple:
+        """
+        The count at `minute` from this tracker, then from another
+        worker's.
+        """
+
+        mock.patch.stopall()
+        self.at_minute(minute)
+
+        return self.tracker.count(self.auditor.id), SearchFrequencyTracker().count(self.auditor.id)
+
+    def test_minutes_leave_the_window_once(self):
+        self.at_minute(1000)
+        self.assertEqual([self.tracker.record(self.auditor.id) for _ in range(3)], [1, 2, 3])
+
+        mock.patch.stopall()
+        self.at_minute(1030)
+        self.assertEqual(self.tracker.record(self.auditor.id), 4)
+        self.assertEqual(self.tracker.record(self.auditor.id), 5)
+
+        self.assertEqual(self.counts_at(1059), (5, 5))
+        self.assertEqual(self.counts_at(1060), (2, 2))
+        self.assertEqual(self.counts_at(1089), (2, 2))
+        self.assertEqual(self.counts_at(1090), (0, 0))
+
+    def test_skipped_minutes_are_all_drained(self):
+        for minute in (1000, 1001, 1010):
+            mock.patch.stopall()
+            self.at_minute(minute)
+            self.tracker.record(self.auditor.id)
+
+        self.assertEqual(self.counts_at(1065), (1, 1))
+
+    def test_a_warm_count_reads_two_keys(self):
+        self.at_minute(1000)
+        self.tracker.record(self.auditor.id)
+
+        cache = self.tracker.cache
+
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, "get", wraps=cache.get) as get:
+            self.assertEqual(self.tracker.count(self.auditor.id), 1)
+
+        # File-based get_many() is one get() per key
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(get_many.call_args.args[0]), 2)
+        self.assertEqual(get.call_count, 2)
+
+    def test_cold_cache_seeds_from_audit_rows(self):
+        for number in range(4):
+            ExternalSearchAudit.objects.create(
+                auditor=self.auditor,
+                tenant=self.auditor.tenant,
+                keyword_hash=token(number),
+                execution_time_ms=1.0,
+            )
+
+        self.assertEqual(self.tracker.count(self.auditor.id), 4)
+        self.assertEqual(self.tracker.record(self.auditor.id), 5)
+
+        self.tracker.reset(self.auditor.id)
+        ExternalSearchAudit.objects.all().delete()
+
+        self.assertEqual(self.tracker.count(self.auditor.id), 0)
+
+    def test_cull_does_not_list_the_directory_on_every_write(self):
+        cache = self.tracker.cache
+
+        with mock.patch.object(
+            cache, "_list_cache_files", wraps=cache._list_cache_files
+        ) as listing:
+            for number in range(20):
+                cache.set(f"key-{number}", number)
+
+        self.assertEqual(listing.call_count, 1)
+
+
+# ---------------------------------------------------
+# Request Timings
+# ---------------------------------------------------
+
+class RequestTimingsTests(SimpleTestCase):
+    def setUp(self):
+        # Switch threads as often as possible to expose lost updates
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        self.addCleanup(end_request_timings)
+
+    def test_scatter_threads_do_not_lose_updates(self):
+        timings = begin_request_timings()
+
+        def work():
+            for _ in range(10000):
+                timings.add_query(0.5)
+                timings.add_span("index_lookup", 0.25)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(work) for _ in range(8)]:
+                future.result()
+
+        self.assertEqual(timings.queries, 80000)
+        self.assertEqual(timings.db_ms, 40000.0)
+        self.assertEqual(timings.spans, {"index_lookup": 20000.0})
+
+    def test_stage_records_into_the_request_from_worker_threads(self):
+        timings = begin_request_timings()
+
+        def work():
+            with stage("index_lookup"):
+                pass
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for future in [
+                executor.submit(contextvars.copy_context().run, work) for _ in range(4)
+            ]:
+                future.result()
+
+        self.assertEqual(list(timings.spans), ["index_lookup"])
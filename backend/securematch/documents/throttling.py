@@ -0,0 +1,175 @@
+# documents/throttling.py
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import ScopedRateThrottle
+
+
+# ---------------------------------------------------
+# Shared-Memory Token Buckets
+# ---------------------------------------------------
+
+# key fingerprint, tokens, last refill timestamp
+_SLOT = struct.Struct("<Qdd")
+_PROBES = 4
+
+
+class SharedBucketStore:
+    """
+    Fixed-size open-addressed table of token buckets in an mmap'd file.
+
+    Every worker on the host maps the same file (in /dev/shm by default),
+    so limits hold across processes. A check touches at most _PROBES
+    adjacent slots under a byte-range lock that is never held across I/O.
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.path = path
+        self.slots = slots
+        self.size = (slots + _PROBES) * _SLOT.size
+
+        self._map = None
+        self._fd = None
+        self._open_lock = threading.Lock()
+        # fcntl locks are per-process; serialise this process's threads too
+        self._thread_lock = threading.Lock()
+
+    def _mapping(self):
+        if self._map is None:
+            with self._open_lock:
+                if self._map is None:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+                    if os.fstat(fd).st_size < self.size:
+                        os.ftruncate(fd, self.size)
+
+                    self._fd = fd
+                    self._map = mmap.mmap(fd, self.size)
+
+        return self._map
+
+    def _fingerprint(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def consume(self, key: str, capacity: int, refill_per_second: float):
+        """
+        Takes one token from the key's bucket.
+        Returns (allowed, seconds_until_next_token).
+        """
+
+        buf = self._mapping()
+        fingerprint = self._fingerprint(key)
+        first = fingerprint % self.slots
+        start = first * _SLOT.size
+        length = _PROBES * _SLOT.size
+        now = time.time()
+
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                slot, tokens, last = self._find_slot(buf, first, fingerprint, now)
+
+                if last is None:
+                    tokens = float(capacity)
+                else:
+                    tokens = min(
+                        float(capacity),
+                        tokens + (now - last) * refill_per_second
+                    )
+
+                allowed = tokens >= 1.0
+                if allowed:
+                    tokens -= 1.0
+
+                _SLOT.pack_into(buf, slot * _SLOT.size, fingerprint, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+        wait = 0.0 if allowed else (1.0 - tokens) / refill_per_second
+        return allowed, wait
+
+    def _find_slot(self, buf, first, fingerprint, now):
+        """
+        Returns (slot, tokens, last); last is None for a fresh bucket.
+        Reuses an empty slot, else evicts the least recently used probe.
+        """
+
+        victim, victim_last = first, now
+
+        for slot in range(first, first + _PROBES):
+            owner, tokens, last = _SLOT.unpack_from(buf, slot * _SLOT.size)
+
+            if owner == fingerprint:
+                return slot, tokens, last
+
+            if owner == 0:
+                return slot, 0.0, None
+
+            if last < victim_last:
+                victim, victim_last = slot, last
+
+        return victim, 0.0, None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store() -> SharedBucketStore:
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SharedBucketStore(
+                    path=settings.THROTTLE_SHARED_PATH,
+                    slots=settings.THROTTLE_SHARED_SLOTS
+                )
+
+    return _store
+
+
+# ---------------------------------------------------
+# DRF Throttle
+# ---------------------------------------------------
+
+class SharedScopedRateThrottle(ScopedRateThrottle):
+    """
+    Drop-in for ScopedRateThrottle: same throttle_scope attribute and
+    DEFAULT_THROTTLE_RATES, but enforced as a token bucket shared by all
+    workers on the host instead of a per-process timestamp list.
+    """
+
+    def allow_request(self, request, view):
+        if settings.LOAD_TEST_MODE:
+            return True
+
+        self.scope = getattr(view, self.scope_attr, None)
+
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        if self.rate is None:
+            return True
+
+        allowed, self._wait = get_bucket_store().consume(
+            self.get_cache_key(request, view),
+            capacity=self.num_requests,
+            refill_per_second=self.num_requests / self.duration
+        )
+
+        return allowed
+
+    def wait(self):
+        return getattr(self, "_wait", None)
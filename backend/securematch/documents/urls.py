@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     UploadDocumentView,
+    DocumentUpdateView,
+    DocumentDeleteView,
+    BulkDeleteDocumentsView,
     InternalSearchView,
     ExternalSearchView,
     RotateAuditorKeyView,
@@ -9,17 +13,40 @@ from .views import (
     ExternalMetricsView,
     CreateAuditorView,
     DeleteAuditorView,
+    AuditorSessionChallengeView,
+    AuditorSessionView,
+    PrometheusMetricsView,
+    ProfilerConfigView,
+    ProfileListView,
+    ProfileDownloadView,
 )
 
+if settings.ASYNC_VIEWS:
+    # Native async handlers for the hot paths when served over ASGI
+    from .async_views import (
+        AsyncUploadDocumentView as UploadDocumentView,
+        AsyncInternalSearchView as InternalSearchView,
+        AsyncExternalSearchView as ExternalSearchView,
+    )
+
 urlpatterns = [
     path("upload/", UploadDocumentView.as_view()),
+    path("documents/<int:document_id>/", DocumentUpdateView.as_view()),
+    path("documents/<int:document_id>/delete/", DocumentDeleteView.as_view()),
+    path("documents/delete/", BulkDeleteDocumentsView.as_view()),
     path("search/internal/", InternalSearchView.as_view()),
     path("search/external/", ExternalSearchView.as_view()),
     path("auditor/rotate-key/", RotateAuditorKeyView.as_view()),
     path("auditor/<int:auditor_id>/logs/", AuditorLogsView.as_view()),
     path("metrics/internal/", InternalMetricsView.as_view()),
     path("metrics/external/", ExternalMetricsView.as_view()),
+    path("metrics/prometheus/", PrometheusMetricsView.as_view()),
+    path("admin/profiles/", ProfileListView.as_view()),
+    path("admin/profiles/config/", ProfilerConfigView.as_view()),
+    path("admin/profiles/<str:name>/", ProfileDownloadView.as_view()),
     path("auditor/rotate-key/", RotateAuditorKeyView.as_view()),
     path("auditor/create/", CreateAuditorView.as_view()),
     path("auditor/<int:auditor_id>/delete/", DeleteAuditorView.as_view()),
+    path("auditor/session/challenge/", AuditorSessionChallengeView.as_view()),
+    path("auditor/session/", AuditorSessionView.as_view()),
 ]
\ No newline at end of file
@@ -1,20 +1,22 @@
 import time
-from datetime import timedelta
+from functools import partial
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Avg, Count
+from django.db import transaction
+from django.db.models import Count, Sum
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.throttling import ScopedRateThrottle
-from crypto_engine.peks import generate_rsa_keypair
-from rest_framework.permissions import AllowAny
+from crypto_engine.keypool import acquire_keypair, get_keypair_pool
+from rest_framework.permissions import AllowAny, IsAdminUser
 
 
-from crypto_engine.peks import hash_keyword, verify_signature
+from crypto_engine.peks import verify_signature
 from crypto_engine.sse import (
     encrypt_document,
-    generate_token,
-    generate_trapdoor,
     decrypt_document
 )
 
@@ -22,23 +24,67 @@ from documents.models import (
     Auditor,
     EncryptedDocument,
     SearchTokenIndex,
-    ExternalSearchAudit
+    ExternalSearchAudit,
+    ExternalSearchAuditRollup
 )
 
-from .constants import SEARCHABLE_FIELDS
+from .audit_logs import (
+    EXPORT_FORMATS,
+    AuditLogQueryError,
+    aiter_chunks,
+    audit_log_page,
+    audit_log_queryset,
+    export_chunks,
+    parse_limit
+)
+from .db import pool_stats
+from .memory_index import get_memory_index, memory_index
+from .postings import is_bitmap_field, posting_bitmap, remove_documents
+from .profiling import config_error, list_profiles, profile_path, profiler_config
+from .routing import replica_status
+from .sharding import (
+    document_db,
+    document_stats,
+    merge_document_stats,
+    place_documents,
+    scatter,
+    scatter_meta,
+    shard_for,
+    shards_by_document,
+    use_shard
+)
+from .bitmaps import RoaringBitmap
+from .indexing import index_document, query_trapdoors, sync_document_tokens
+from .instrumentation import (
+    RenderTimingMixin,
+    record_search,
+    record_upload,
+    render_latest,
+    stage
+)
+from .frequency import search_frequency
+from .auditor_session import (
+    challenge_matches,
+    issue_challenge,
+    issue_session,
+    redeem_challenge,
+    session_is_valid
+)
+from .throttling import SharedScopedRateThrottle
 from .utils import success_response, error_response
 
 
 MAX_EXTERNAL_RESULTS = 50
 MAX_INTERNAL_RESULTS = 50
+MAX_BULK_DELETE = 10000
 
 
 # ---------------------------------------------------
 #  Upload & Index
 # ---------------------------------------------------
 
-class UploadDocumentView(APIView):
-    throttle_classes = [ScopedRateThrottle]
+class UploadDocumentView(RenderTimingMixin, APIView):
+    throttle_classes = [SharedScopedRateThrottle]
     throttle_scope = "upload"
 
     def post(self, request):
@@ -51,31 +97,35 @@ class UploadDocumentView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            encrypted_blob = encrypt_document(data)
+            tenant = request.tenant
 
-            doc = EncryptedDocument.objects.create(
-                encrypted_blob=encrypted_blob
-            )
+            with stage("encrypt"):
+                encrypted_blob = encrypt_document(
+                    data,
+                    tenant=tenant.key_context
+                )
 
-            for field in SEARCHABLE_FIELDS:
-                if field in data and data[field] is not None:
+            # Sharded: the document and its tokens go to the owning shard
+            [(document_id, alias)] = place_documents(1)
 
-                    value = str(data[field]).strip()
-                    if not value:
-                        continue
+            with stage("index_write"), use_shard(alias), transaction.atomic(using=alias):
+                doc = EncryptedDocument.objects.create(
+                    id=document_id,
+                    tenant=tenant,
+                    encrypted_blob=encrypted_blob,
+                    key_version=encrypted_blob["key_version"]
+                )
 
-                    token = generate_token(field, value)
-                    external_token = hash_keyword(value)
+                index_document(doc, data, encrypted_blob["key_version"])
 
-                    SearchTokenIndex.objects.create(
-                        token=token,
-                        external_token=external_token,
-                        document=doc
-                    )
+            record_upload()
 
             return Response(
                 success_response(
-                    data={"message": "Document encrypted and indexed"}
+                    data={
+                        "message": "Document encrypted and indexed",
+                        "document_id": doc.id
+                    }
                 ),
                 status=status.HTTP_201_CREATED
             )
@@ -87,13 +137,270 @@ class UploadDocumentView(APIView):
             )
 
 
+# ---------------------------------------------------
+#  Update & Delete
+# ---------------------------------------------------
+
+class DocumentUpdateView(RenderTimingMixin, APIView):
+    """
+    PUT replaces a document; PATCH merges fields into it (null removes
+    a field). Only the token rows of changed fields are rewritten.
+    """
+
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = "upload"
+
+    def put(self, request, document_id):
+        return self._update(request, document_id, merge=False)
+
+    def patch(self, request, document_id):
+        return self._update(request, document_id, merge=True)
+
+    def _update(self, request, document_id, merge):
+        data = request.data
+
+        if not isinstance(data, dict):
+            return Response(
+                error_response("INVALID_JSON", "Invalid JSON object"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            with use_shard(shard_for(document_id)), transaction.atomic(using=document_db()):
+                doc = (
+                    EncryptedDocument.objects.live()
+                    .select_for_update()
+                    .filter(id=document_id, tenant=request.tenant)
+                    .first()
+                )
+
+                if doc is None:
+                    return Response(
+                        error_response("DOCUMENT_NOT_FOUND", "Document not found"),
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                if merge:
+                    with stage("decrypt"):
+                        merged = decrypt_document(doc.encrypted_blob)
+                    merged.update(data)
+                    data = {k: v for k, v in merged.items() if v is not None}
+
+                with stage("encrypt"):
+                    doc.encrypted_blob = encrypt_document(
+                        data,
+                        tenant=request.tenant.key_context
+                    )
+
+                doc.key_version = doc.encrypted_blob["key_version"]
+                doc.updated_at = timezone.now()
+
+                with stage("index_write"):
+                    doc.save(update_fields=["encrypted_blob", "key_version", "updated_at"])
+                    added, removed = sync_document_tokens(doc, data, doc.key_version)
+
+        except Exception:
+            return Response(
+                error_response("UPDATE_FAILED", "Update failed"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            success_response(
+                data={
+                    "message": "Document updated",
+                    "document_id": doc.id
+                },
+                meta={
+                    "tokens_added": added,
+                    "tokens_removed": removed
+                }
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
+class DocumentDeleteView(APIView):
+    """
+    Tombstones a document: it disappears from search immediately and
+    purge_deleted_documents removes its rows later, in batches.
+    """
+
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = "upload"
+
+    def delete(self, request, document_id):
+        with use_shard(shard_for(document_id)), transaction.atomic(using=document_db()):
+            deleted = EncryptedDocument.objects.live().filter(
+                id=document_id,
+                tenant=request.tenant
+            ).update(deleted_at=timezone.now())
+
+            # Posting lists have no deleted_at join to hide the document
+            if deleted:
+                remove_documents([document_id])
+
+        if not deleted:
+            return Response(
+                error_response("DOCUMENT_NOT_FOUND", "Document not found"),
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            success_response(
+                data={
+                    "message": "Document deleted",
+                    "document_id": document_id
+                }
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
+class BulkDeleteDocumentsView(APIView):
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = "upload"
+
+    def post(self, request):
+        document_ids = request.data.get("document_ids")
+
+        if (
+            not isinstance(document_ids, list)
+            or not document_ids
+            or len(document_ids) > MAX_BULK_DELETE
+            or not all(isinstance(i, int) for i in document_ids)
+        ):
+            return Response(
+                error_response(
+                    "INVALID_DOCUMENT_IDS",
+                    f"document_ids must be a list of 1-{MAX_BULK_DELETE} integers"
+                ),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One UPDATE per shard; token rows stay until the purge
+        deleted = 0
+        deleted_at = timezone.now()
+
+        for alias, ids in shards_by_document(document_ids).items():
+            with use_shard(alias), transaction.atomic(using=alias):
+                live = EncryptedDocument.objects.live().filter(
+                    id__in=ids,
+                    tenant=request.tenant
+                )
+
+                remove_documents(live.select_for_update().values_list("id", flat=True))
+                deleted += live.update(deleted_at=deleted_at)
+
+        return Response(
+            success_response(
+                data={"deleted": deleted},
+                meta={"not_found": len(set(document_ids)) - deleted}
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
 # ---------------------------------------------------
 #  Internal Secure Search (SSE)
 # ---------------------------------------------------
 
-class InternalSearchView(APIView):
-    throttle_classes = [ScopedRateThrottle]
+def internal_shard_search(tenant, trapdoors):
+    """
+    Runs on one shard: (total_matches, up to MAX_INTERNAL_RESULTS
+    documents) for a list of (field, trapdoors) pairs (AND).
+    """
+
+    matching = None
+    index = memory_index()
+
+    if index is not None:
+        # Token-row fields resolved in memory: searchsorted + merges
+        row_trapdoors = [
+            field_trapdoors for field, field_trapdoors in trapdoors
+            if not is_bitmap_field(field)
+        ]
+
+        if row_trapdoors:
+            with stage("index_lookup"):
+                doc_ids = index.match(tenant.id, row_trapdoors)
+
+            if not len(doc_ids):
+                return 0, []
+
+            if len(row_trapdoors) == len(trapdoors):
+                with stage("document_fetch"):
+                    docs = list(
+                        EncryptedDocument.objects.live().filter(
+                            id__in=doc_ids[:MAX_INTERNAL_RESULTS].tolist(),
+                            tenant=tenant
+                        )
+                    )
+
+                return len(doc_ids), docs
+
+            matching = RoaringBitmap.from_ids(doc_ids.tolist())
+            trapdoors = [
+                (field, field_trapdoors) for field, field_trapdoors in trapdoors
+                if is_bitmap_field(field)
+            ]
+
+    # Token-row fields first: they are selective, and bound the
+    # containers the bitmap fields have to load
+    for field, field_trapdoors in sorted(
+        trapdoors, key=lambda item: is_bitmap_field(item[0])
+    ):
+        with stage("index_lookup"):
+            if is_bitmap_field(field):
+                doc_ids = posting_bitmap(
+                    tenant.id,
+                    field_trapdoors,
+                    containers=None if matching is None else matching.containers
+                )
+            else:
+                # tenant_id first: PostgreSQL prunes to one partition
+                doc_ids = RoaringBitmap.from_ids(
+                    SearchTokenIndex.objects.filter(
+                        tenant=tenant,
+                        token__in=field_trapdoors,
+                        document__deleted_at__isnull=True
+                    ).values_list("document_id", flat=True)
+                )
+
+        matching = doc_ids if matching is None else matching & doc_ids
+
+        if not matching:
+            return 0, []
+
+    with stage("document_fetch"):
+        docs = list(
+            EncryptedDocument.objects.live().filter(
+                id__in=matching.first(MAX_INTERNAL_RESULTS),
+                tenant=tenant
+            )
+        )
+
+    return len(matching), docs
+
+
+def merge_internal_results(shard_results) -> tuple:
+    """
+    (total_matches, first MAX_INTERNAL_RESULTS documents by id).
+    """
+
+    total_matches = sum(total for total, _ in shard_results.values())
+    docs = sorted(
+        (doc for _, docs in shard_results.values() for doc in docs),
+        key=lambda doc: doc.id
+    )[:MAX_INTERNAL_RESULTS]
+
+    return total_matches, docs
+
+
+class InternalSearchView(RenderTimingMixin, APIView):
+    throttle_classes = [SharedScopedRateThrottle]
     throttle_scope = "search"
+    replica_reads = True
 
     def post(self, request):
         try:
@@ -106,62 +413,68 @@ class InternalSearchView(APIView):
                 )
 
             start_time = time.perf_counter()
-            matching_doc_ids = None
+            tenant = request.tenant
 
-            for field, value in query_data.items():
-                trapdoor = generate_trapdoor(field, str(value))
+            # One trapdoor per live key version (rotation in progress);
+            # COMPOUND_FIELDS combinations collapse into one lookup
+            with stage("trapdoor"):
+                trapdoors = query_trapdoors(query_data, tenant.key_context)
 
-                token_matches = SearchTokenIndex.objects.filter(
-                    token=trapdoor
-                ).values_list("document_id", flat=True)
+            # Sharded: every shard in parallel; otherwise inline
+            shard_results, failed_shards = scatter(
+                partial(internal_shard_search, tenant, trapdoors)
+            )
 
-                token_doc_ids = set(token_matches)
+            if failed_shards and not shard_results:
+                return Response(
+                    error_response("SHARDS_UNAVAILABLE", "No shard answered"),
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
 
-                if matching_doc_ids is None:
-                    matching_doc_ids = token_doc_ids
-                else:
-                    matching_doc_ids = matching_doc_ids.intersection(token_doc_ids)
+            total_matches, encrypted_docs = merge_internal_results(shard_results)
+            shard_meta = scatter_meta(failed_shards)
 
-            if not matching_doc_ids:
+            if not total_matches:
                 execution_time = round((time.perf_counter() - start_time) * 1000, 2)
+                record_search("internal", 0)
 
                 return Response(
                     success_response(
-                        data={"results": []},
+                        data={"results": [], "document_ids": []},
                         meta={
                             "total_matches": 0,
                             "returned_count": 0,
                             "truncated": False,
-                            "execution_time_ms": execution_time
+                            "execution_time_ms": execution_time,
+                            **shard_meta
                         }
                     ),
                     status=status.HTTP_200_OK
                 )
 
-            total_matches = len(matching_doc_ids)
             truncated = total_matches > MAX_INTERNAL_RESULTS
 
-            limited_ids = list(matching_doc_ids)[:MAX_INTERNAL_RESULTS]
-
-            encrypted_docs = EncryptedDocument.objects.filter(
-                id__in=limited_ids
-            )
-
-            results = [
-                decrypt_document(doc.encrypted_blob)
-                for doc in encrypted_docs
-            ]
+            with stage("decrypt"):
+                results = [
+                    decrypt_document(doc.encrypted_blob)
+                    for doc in encrypted_docs
+                ]
 
             execution_time = round((time.perf_counter() - start_time) * 1000, 2)
+            record_search("internal", total_matches)
 
             return Response(
                 success_response(
-                    data={"results": results},
+                    data={
+                        "results": results,
+                        "document_ids": [doc.id for doc in encrypted_docs]
+                    },
                     meta={
                         "total_matches": total_matches,
                         "returned_count": len(results),
                         "truncated": truncated,
-                        "execution_time_ms": execution_time
+                        "execution_time_ms": execution_time,
+                        **shard_meta
                     }
                 ),
                 status=status.HTTP_200_OK
@@ -178,7 +491,84 @@ class InternalSearchView(APIView):
 #  External Public-Key Search (Hardened)
 # ---------------------------------------------------
 
-class ExternalSearchView(APIView):
+def external_shard_search(tenant_id, keyword_hash):
+    """
+    Runs on one shard: (total_matches, [(document_id, blob), ...]).
+    """
+
+    matches = SearchTokenIndex.objects.filter(
+        tenant_id=tenant_id,
+        external_token=keyword_hash,
+        document__deleted_at__isnull=True
+    ).select_related("document")
+
+    with stage("index_lookup"):
+        posted = posting_bitmap(tenant_id, [keyword_hash], external=True)
+
+    index = memory_index()
+
+    if index is not None:
+        with stage("index_lookup"):
+            doc_ids = index.match(tenant_id, [[keyword_hash]], external=True)
+
+            if posted:
+                doc_ids = posted | RoaringBitmap.from_ids(doc_ids.tolist())
+                limited_ids = doc_ids.first(MAX_EXTERNAL_RESULTS)
+            else:
+                limited_ids = doc_ids[:MAX_EXTERNAL_RESULTS].tolist()
+
+        with stage("document_fetch"):
+            limited = list(
+                EncryptedDocument.objects.live().filter(
+                    id__in=limited_ids,
+                    tenant_id=tenant_id
+                ).order_by("id").values_list("id", "encrypted_blob")
+            )
+
+        return len(doc_ids), limited
+
+    if posted:
+        # The keyword is a bitmap field value (possibly other fields too)
+        with stage("index_lookup"):
+            matching = posted | RoaringBitmap.from_ids(
+                matches.values_list("document_id", flat=True)
+            )
+
+        with stage("document_fetch"):
+            limited = list(
+                EncryptedDocument.objects.live().filter(
+                    id__in=matching.first(MAX_EXTERNAL_RESULTS),
+                    tenant_id=tenant_id
+                ).order_by("id").values_list("id", "encrypted_blob")
+            )
+
+        return len(matching), limited
+
+    with stage("index_lookup"):
+        total = matches.count()
+
+    with stage("document_fetch"):
+        limited = [
+            (m.document_id, m.document.encrypted_blob)
+            for m in matches[:MAX_EXTERNAL_RESULTS]
+        ]
+
+    return total, limited
+
+
+def merge_external_results(shard_results) -> tuple:
+    total_matches = sum(total for total, _ in shard_results.values())
+    matches = sorted(
+        (match for _, matches in shard_results.values() for match in matches),
+        key=lambda match: match[0]
+    )[:MAX_EXTERNAL_RESULTS]
+
+    return total_matches, matches
+
+
+class ExternalSearchView(RenderTimingMixin, APIView):
+    # Lookups only; the audit write goes to the primary
+    replica_reads = True
 
     def post(self, request):
         total_start = time.perf_counter()
@@ -186,63 +576,95 @@ class ExternalSearchView(APIView):
         auditor_id = request.data.get("auditor_id")
         keyword_hash = request.data.get("keyword_hash")
         signature = request.data.get("signature")
+        session_token = request.data.get("session_token")
+        session_mac = request.data.get("mac")
 
-        if not auditor_id or not keyword_hash or not signature:
+        use_session = bool(session_token and session_mac)
+
+        if not auditor_id or not keyword_hash or not (signature or use_session):
             return Response(
                 error_response("MISSING_FIELDS", "Required fields missing"),
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            auditor = Auditor.objects.get(id=auditor_id)
-        except Auditor.DoesNotExist:
+            # Primary: a replica may still hold the pre-rotation key_version
+            auditor = Auditor.objects.using("default").get(id=auditor_id)
+        except (Auditor.DoesNotExist, ValueError):
             return Response(
                 error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Signature Verification
+        # Signature / Session Verification
         verify_start = time.perf_counter()
-        is_valid = verify_signature(
-            keyword_hash,
-            signature,
-            auditor.public_key
-        )
+
+        with stage("signature_verification"):
+            if use_session:
+                is_valid = session_is_valid(
+                    auditor,
+                    session_token,
+                    keyword_hash,
+                    session_mac
+                )
+                failure_code = "INVALID_SESSION"
+                failure_message = "Session expired, revoked or MAC invalid"
+            else:
+                is_valid = verify_signature(
+                    keyword_hash,
+                    signature,
+                    auditor.public_key
+                )
+                failure_code = "INVALID_SIGNATURE"
+                failure_message = "Signature verification failed"
+
         verify_time = (time.perf_counter() - verify_start) * 1000
 
         if not is_valid:
-            ExternalSearchAudit.objects.create(
-                auditor=auditor,
-                keyword_hash=keyword_hash,
-                total_matches=0,
-                returned_count=0,
-                truncated=False,
-                execution_time_ms=round(
-                    (time.perf_counter() - total_start) * 1000, 2
-                ),
-                success=False,
-                key_version=getattr(auditor, "key_version", 1)
-            )
+            # Before the audit row: a cold-cache seed would count it too
+            search_frequency.record(auditor.id)
+
+            with stage("audit_write"):
+                ExternalSearchAudit.objects.create(
+                    auditor=auditor,
+                    tenant_id=auditor.tenant_id,
+                    keyword_hash=keyword_hash,
+                    total_matches=0,
+                    returned_count=0,
+                    truncated=False,
+                    execution_time_ms=round(
+                        (time.perf_counter() - total_start) * 1000, 2
+                    ),
+                    success=False,
+                    failure_reason=failure_code,
+                    key_version=getattr(auditor, "key_version", 1)
+                )
 
             return Response(
-                error_response("INVALID_SIGNATURE", "Signature verification failed"),
+                error_response(failure_code, failure_message),
                 status=status.HTTP_403_FORBIDDEN
             )
 
         # Fetch Matches
-        matches = SearchTokenIndex.objects.filter(
-            external_token=keyword_hash
-        ).select_related("document")
+        # Auditors only ever see their own tenant's partition
+        shard_results, failed_shards = scatter(
+            partial(external_shard_search, auditor.tenant_id, keyword_hash)
+        )
+
+        if failed_shards and not shard_results:
+            return Response(
+                error_response("SHARDS_UNAVAILABLE", "No shard answered"),
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
 
-        total_matches = matches.count()
-        limited_matches = matches[:MAX_EXTERNAL_RESULTS]
+        total_matches, limited_matches = merge_external_results(shard_results)
 
         encrypted_results = [
             {
-                "nonce": m.document.encrypted_blob["nonce"],
-                "ciphertext": m.document.encrypted_blob["ciphertext"]
+                "nonce": blob["nonce"],
+                "ciphertext": blob["ciphertext"]
             }
-            for m in limited_matches
+            for _, blob in limited_matches
         ]
 
         # RESULT PADDING (Fixed Size)
@@ -258,25 +680,27 @@ class ExternalSearchView(APIView):
 
         total_time = (time.perf_counter() - total_start) * 1000
 
-        # Frequency Monitoring
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-
-        recent_search_count = ExternalSearchAudit.objects.filter(
-            auditor=auditor,
-            created_at__gte=one_hour_ago
-        ).count()
+        # Frequency Monitoring (sliding window, no DB scan)
+        recent_search_count = search_frequency.record(auditor.id) - 1
+        rate_anomaly = (
+            recent_search_count >= settings.EXTERNAL_SEARCH_HOURLY_ALERT
+        )
 
         # Audit Log
-        audit_entry = ExternalSearchAudit.objects.create(
-            auditor=auditor,
-            keyword_hash=keyword_hash,
-            total_matches=total_matches,
-            returned_count=min(total_matches, MAX_EXTERNAL_RESULTS),
-            truncated=total_matches > MAX_EXTERNAL_RESULTS,
-            execution_time_ms=round(total_time, 2),
-            success=True,
-            key_version=getattr(auditor, "key_version", 1)
-        )
+        with stage("audit_write"):
+            audit_entry = ExternalSearchAudit.objects.create(
+                auditor=auditor,
+                tenant_id=auditor.tenant_id,
+                keyword_hash=keyword_hash,
+                total_matches=total_matches,
+                returned_count=min(total_matches, MAX_EXTERNAL_RESULTS),
+                truncated=total_matches > MAX_EXTERNAL_RESULTS,
+                execution_time_ms=round(total_time, 2),
+                success=True,
+                key_version=getattr(auditor, "key_version", 1)
+            )
+
+        record_search("external", total_matches)
 
         return Response(
             success_response(
@@ -289,15 +713,106 @@ class ExternalSearchView(APIView):
                     "truncated": total_matches > MAX_EXTERNAL_RESULTS,
                     "execution_time_ms": round(total_time, 2),
                     "signature_verification_ms": round(verify_time, 2),
+                    "auth_method": "session" if use_session else "signature",
                     "audit_log_id": audit_entry.id,
                     "searches_last_hour": recent_search_count,
+                    "rate_anomaly": rate_anomaly,
                     "key_version_used": getattr(auditor, "key_version", 1),
-                    "response_padded": total_matches < MAX_EXTERNAL_RESULTS
+                    "response_padded": total_matches < MAX_EXTERNAL_RESULTS,
+                    **scatter_meta(failed_shards)
+                }
+            ),
+            status=status.HTTP_200_OK
+        )
+
+# ---------------------------------------------------
+#  Auditor Session Handshake
+# ---------------------------------------------------
+
+class AuditorSessionChallengeView(APIView):
+
+    def post(self, request):
+        auditor_id = request.data.get("auditor_id")
+
+        if not auditor_id:
+            return Response(
+                error_response("MISSING_AUDITOR_ID", "Auditor ID required"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not Auditor.objects.filter(id=auditor_id, tenant=request.tenant).exists():
+            return Response(
+                error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            success_response(
+                data={
+                    "challenge": issue_challenge(auditor_id),
+                    "expires_in": settings.AUDITOR_CHALLENGE_TTL_SECONDS
                 }
             ),
             status=status.HTTP_200_OK
         )
 
+
+class AuditorSessionView(APIView):
+    """
+    Exchanges one RSA-PSS signature over a server challenge for a
+    short-lived session; later searches send an HMAC instead.
+    """
+
+    def post(self, request):
+        auditor_id = request.data.get("auditor_id")
+        challenge = request.data.get("challenge")
+        signature = request.data.get("signature")
+
+        if not auditor_id or not challenge or not signature:
+            return Response(
+                error_response("MISSING_FIELDS", "Required fields missing"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            auditor = Auditor.objects.get(id=auditor_id, tenant=request.tenant)
+        except (Auditor.DoesNotExist, ValueError):
+            return Response(
+                error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not challenge_matches(challenge, auditor.id):
+            return Response(
+                error_response("INVALID_CHALLENGE", "Challenge expired or invalid"),
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if not verify_signature(challenge, signature, auditor.public_key):
+            return Response(
+                error_response("INVALID_SIGNATURE", "Signature verification failed"),
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # After the signature check, so a forged attempt can't burn it
+        if not redeem_challenge(challenge):
+            return Response(
+                error_response("CHALLENGE_USED", "Challenge already used"),
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        session = issue_session(auditor)
+
+        return Response(
+            success_response(
+                data={
+                    **session,
+                    "key_version": auditor.key_version
+                }
+            ),
+            status=status.HTTP_201_CREATED
+        )
+
 class RotateAuditorKeyView(APIView):
 
     def post(self, request):
@@ -311,8 +826,8 @@ class RotateAuditorKeyView(APIView):
             )
 
         try:
-            auditor = Auditor.objects.get(id=auditor_id)
-        except Auditor.DoesNotExist:
+            auditor = Auditor.objects.get(id=auditor_id, tenant=request.tenant)
+        except (Auditor.DoesNotExist, ValueError):
             return Response(
                 error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
                 status=status.HTTP_404_NOT_FOUND
@@ -335,59 +850,90 @@ class RotateAuditorKeyView(APIView):
         )
     
 class AuditorLogsView(APIView):
+    replica_reads = True
 
     def get(self, request, auditor_id):
 
         try:
-            auditor = Auditor.objects.get(id=auditor_id)
+            auditor = Auditor.objects.get(id=auditor_id, tenant=request.tenant)
         except Auditor.DoesNotExist:
             return Response(
                 error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        logs = ExternalSearchAudit.objects.filter(
-            auditor=auditor
-        )[:100]
+        params = request.query_params
+        export_format = params.get("export")
 
-        data = [
-            {
-                "id": log.id,
-                "keyword_hash": log.keyword_hash,
-                "success": log.success,
-                "total_matches": log.total_matches,
-                "returned_count": log.returned_count,
-                "execution_time_ms": log.execution_time_ms,
-                "created_at": log.created_at,
-                "key_version": getattr(log, "key_version", 1)
-            }
-            for log in logs
-        ]
+        if export_format and export_format not in EXPORT_FORMATS:
+            return Response(
+                error_response(
+                    "INVALID_EXPORT_FORMAT",
+                    f"export must be one of: {', '.join(EXPORT_FORMATS)}"
+                ),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            queryset = audit_log_queryset(auditor, params)
+            limit = None if export_format else parse_limit(params)
+        except AuditLogQueryError as exc:
+            return Response(
+                error_response("INVALID_QUERY", str(exc)),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if export_format:
+            # Pin the database now; routing state ends with the view
+            chunks = export_chunks(queryset.using(queryset.db), export_format)
+
+            response = StreamingHttpResponse(
+                aiter_chunks(chunks) if isinstance(request._request, ASGIRequest)
+                else chunks,
+                content_type=EXPORT_FORMATS[export_format]
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="auditor-{auditor.id}-logs.{export_format}"'
+            )
+            return response
+
+        logs, next_cursor = audit_log_page(queryset, limit)
 
         return Response(
             success_response(
-                data={"logs": data}
+                data={"logs": logs, "next_cursor": next_cursor},
+                meta={"limit": limit, "has_more": next_cursor is not None}
             ),
             status=status.HTTP_200_OK
         )
-    
+
+
 class InternalMetricsView(APIView):
+    replica_reads = True
 
     def get(self, request):
         try:
             now = timezone.now()
             last_24h = now - timedelta(hours=24)
 
-            total_documents = EncryptedDocument.objects.count()
-            total_tokens = SearchTokenIndex.objects.count()
-
-            external_tokens = SearchTokenIndex.objects.exclude(
-                external_token__isnull=True
-            ).count()
+            # Document/token counters are summed over shards
+            shard_stats, failed_shards = scatter(document_stats)
+            stats = merge_document_stats(shard_stats.values())
 
-            avg_external = ExternalSearchAudit.objects.filter(
+            # Archived searches count through their daily rollups
+            hot = ExternalSearchAudit.objects.filter(success=True).aggregate(
+                searches=Count("id"), total_ms=Sum("execution_time_ms")
+            )
+            archived = ExternalSearchAuditRollup.objects.filter(
                 success=True
-            ).aggregate(avg=Avg("execution_time_ms"))["avg"] or 0
+            ).aggregate(
+                searches=Sum("searches"), total_ms=Sum("execution_ms_total")
+            )
+            searches = hot["searches"] + (archived["searches"] or 0)
+            avg_external = (
+                ((hot["total_ms"] or 0) + (archived["total_ms"] or 0)) / searches
+                if searches else 0
+            )
 
             external_24h = ExternalSearchAudit.objects.filter(
                 created_at__gte=last_24h
@@ -398,18 +944,18 @@ class InternalMetricsView(APIView):
                 success=False
             ).count()
 
-            last_doc = EncryptedDocument.objects.order_by("-created_at").first()
             last_index_update = (
-                last_doc.created_at.isoformat()
-                if last_doc else None
+                stats["last_created_at"].isoformat()
+                if stats["last_created_at"] else None
             )
 
             # 🔑 Multi-Auditor Key Info
-            auditors = Auditor.objects.all().order_by("id")
+            auditors = Auditor.objects.select_related("tenant").order_by("id")
 
             auditor_data = [
                 {
                     "auditor_id": a.id,
+                    "tenant": a.tenant.slug,
                     "name": a.name,
                     "active_key_version": a.key_version,
                     "created_at": a.created_at.isoformat()
@@ -420,15 +966,30 @@ class InternalMetricsView(APIView):
             return Response({
                 "data": {
                     "system_metrics": {
-                        "total_documents": total_documents,
-                        "total_tokens": total_tokens,
-                        "external_tokens": external_tokens,
+                        "total_documents": stats["total_documents"],
+                        "documents_pending_purge": stats["pending_purge"],
+                        "total_tokens": stats["total_tokens"],
+                        "external_tokens": stats["external_tokens"],
+                        "posting_list_entries": stats["posting_entries"],
                         "avg_external_search_ms": round(avg_external, 2),
                         "external_searches_last_24h": external_24h,
                         "failed_external_searches_last_24h": failed_24h,
-                        "last_index_update": last_index_update
+                        "last_index_update": last_index_update,
+                        "keypair_pool": get_keypair_pool().stats(),
+                        "memory_index": (
+                            get_memory_index().stats()
+                            if settings.MEMORY_INDEX_ENABLED else None
+                        ),
+                        "db_pool": pool_stats(),
+                        "db_replicas": replica_status(),
+                        **scatter_meta(failed_shards)
                     },
-                    "auditors": auditor_data
+                    "auditors": auditor_data,
+                    # 🏦 Per-tenant index sizes
+                    "tenants": [
+                        {"tenant": slug, "documents": documents}
+                        for slug, documents in sorted(stats["tenants"].items())
+                    ]
                 }
             })
 
@@ -446,10 +1007,14 @@ class InternalMetricsView(APIView):
         return Response(status=status.HTTP_200_OK)
 
 class ExternalMetricsView(APIView):
+    replica_reads = True
 
     def get(self, request):
         try:
-            total_documents = EncryptedDocument.objects.count()
+            shard_counts, _ = scatter(
+                lambda: EncryptedDocument.objects.live().count()
+            )
+            total_documents = sum(shard_counts.values())
 
             return Response({
                 "data": {
@@ -463,6 +1028,19 @@ class ExternalMetricsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class PrometheusMetricsView(APIView):
+    """
+    Prometheus text exposition of per-stage latency histograms and
+    upload/search/failure counters, summed across workers.
+    """
+
+    throttle_classes = []
+
+    def get(self, request):
+        body, content_type = render_latest()
+        return HttpResponse(body, content_type=content_type)
+
 class RotateAuditorKeyView(APIView):
     permission_classes = [AllowAny]  # tighten later if needed
 
@@ -476,17 +1054,17 @@ class RotateAuditorKeyView(APIView):
             )
 
         try:
-            auditor = Auditor.objects.get(id=auditor_id)
-        except Auditor.DoesNotExist:
+            auditor = Auditor.objects.get(id=auditor_id, tenant=request.tenant)
+        except (Auditor.DoesNotExist, ValueError):
             return Response(
                 error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Generate new keypair
-        private_key, public_key = generate_rsa_keypair()
+        # New keypair (pre-generated pool, inline fallback)
+        private_key, public_key = acquire_keypair()
 
-        # Rotate
+        # Rotate (the key_version bump also revokes auditor sessions)
         auditor.public_key = public_key
         auditor.key_version += 1
         auditor.save()
@@ -513,10 +1091,11 @@ class CreateAuditorView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generate keypair
-        private_key, public_key = generate_rsa_keypair()
+        # Keypair (pre-generated pool, inline fallback)
+        private_key, public_key = acquire_keypair()
 
         auditor = Auditor.objects.create(
+            tenant=request.tenant,
             name=name,
             public_key=public_key,
             key_version=1
@@ -539,7 +1118,7 @@ class DeleteAuditorView(APIView):
 
     def delete(self, request, auditor_id):
         try:
-            auditor = Auditor.objects.get(id=auditor_id)
+            auditor = Auditor.objects.get(id=auditor_id, tenant=request.tenant)
         except Auditor.DoesNotExist:
             return Response(
                 error_response("AUDITOR_NOT_FOUND", "Auditor not found"),
@@ -547,10 +1126,88 @@ class DeleteAuditorView(APIView):
             )
 
         auditor.delete()
+        search_frequency.reset(auditor_id)
 
         return Response(
             success_response(
                 data={"message": "Auditor deleted successfully"}
             ),
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+
+# ---------------------------------------------------
+#  Profiler Admin (staff only)
+# ---------------------------------------------------
+
+class ProfilerConfigView(APIView):
+    """
+    GET the effective profiler config; POST to change it for all
+    workers without a restart, e.g.
+    {"enabled": false, "endpoints": {"/api/search/internal/": {"enabled": true}}}
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            success_response(data=profiler_config.current()),
+            status=status.HTTP_200_OK
+        )
+
+    def post(self, request):
+        config = request.data
+        problem = config_error(config)
+
+        if problem:
+            return Response(
+                error_response(
+                    "INVALID_CONFIG",
+                    "Invalid profiler config",
+                    {"reason": problem}
+                ),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        profiler_config.save(config)
+
+        return Response(
+            success_response(data=profiler_config.current()),
+            status=status.HTTP_200_OK
+        )
+
+
+class ProfileListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        data = [
+            {
+                "name": entry.name,
+                "size_bytes": entry.stat().st_size,
+                "created_at": datetime.fromtimestamp(
+                    entry.stat().st_mtime, tz=dt_timezone.utc
+                ).isoformat()
+            }
+            for entry in list_profiles()
+        ]
+
+        return Response(
+            success_response(data={"profiles": data}),
+            status=status.HTTP_200_OK
+        )
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name):
+        path = profile_path(name)
+
+        if path is None:
+            return Response(
+                error_response("PROFILE_NOT_FOUND", "Profile not found"),
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
@@ -0,0 +1,38 @@
+# gunicorn.conf.py (picked up automatically from the working directory)
+
+import os
+import shutil
+
+
+def on_starting(server):
+    """
+    Start each deploy with an empty Prometheus multiprocess directory
+    so counters from previous containers are not summed in.
+    """
+
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """
+    Load the in-memory token index (MEMORY_INDEX_ENABLED) and start
+    filling the RSA keypair pool as each worker starts, rather than on
+    its first search or key generation.
+    """
+
+    from crypto_engine.keypool import start_keypair_pool
+    from documents.memory_index import start_memory_index
+
+    start_keypair_pool()
+    start_memory_index()
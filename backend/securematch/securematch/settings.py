@@ -3,7 +3,10 @@ Django settings for securematch project.
 """
 
 from pathlib import Path
+import copy
 import os
+import tempfile
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # --------------------------------------------------
@@ -26,6 +29,9 @@ load_dotenv(dotenv_path=ENV_PATH)
 SECRET_KEY = os.getenv("SECRET_KEY")
 DEBUG = os.getenv("DEBUG") == "True"
 
+# Serve upload/search through native async views (run under ASGI)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS") == "True"
+
 ALLOWED_HOSTS = ["127.0.0.1", "localhost", ".onrender.com"]
 
 CSRF_TRUSTED_ORIGINS = ["https://*.onrender.com"]
@@ -52,14 +58,19 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "documents.middleware.QueryAccountingMiddleware",
+    "documents.middleware.ErrorMetricsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "documents.tenancy.TenantMiddleware",
+    "documents.routing.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "documents.profiling.SamplingProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "securematch.urls"
@@ -85,6 +96,11 @@ WSGI_APPLICATION = "securematch.wsgi.application"
 # Database (PostgreSQL - Neon)
 # --------------------------------------------------
 
+# Optional psycopg3 connection pool (one pool per worker process). On by
+# default with ASYNC_VIEWS, which turns persistent connections off:
+# without it every request would open a new TLS connection.
+DB_POOL = os.getenv("DB_POOL", str(ASYNC_VIEWS)) == "True"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -97,10 +113,90 @@ DATABASES = {
             "sslmode": "require",
         },
         # Optional performance improvement
-        "CONN_MAX_AGE": 60,
+        # (persistent connections are per-thread, so disable them under
+        # ASGI; the pool replaces them when DB_POOL is on)
+        "CONN_MAX_AGE": 0 if (ASYNC_VIEWS or DB_POOL) else 60,
+        # Also enables the pool's check on checkout
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        # Seconds to wait for a free connection before erroring
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    }
+
+# Read replicas: comma-separated host[:port] list sharing the primary's
+# name and credentials. The first is aliased "replica", then "replica_2"...
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+
+DATABASE_REPLICAS = []
+
+for position, replica_host in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica_alias = "replica" if position == 1 else f"replica_{position}"
+    replica_host, _, replica_port = replica_host.partition(":")
+
+    DATABASES[replica_alias] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        "OPTIONS": copy.deepcopy(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(replica_alias)
+
+# Sharded document store: comma-separated host[:port] list, aliased
+# "shard_0", "shard_1"... Documents and their tokens are placed by a
+# consistent hash of the document id, so only append new hosts; the
+# primary keeps tenants, auditors, audit logs and the id sequence.
+DB_SHARD_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_SHARD_HOSTS", "").split(",")
+    if host.strip()
+]
+
+DATABASE_SHARDS = []
+
+for position, shard_host in enumerate(DB_SHARD_HOSTS):
+    shard_alias = f"shard_{position}"
+    shard_host, _, shard_port = shard_host.partition(":")
+
+    DATABASES[shard_alias] = {
+        **DATABASES["default"],
+        "HOST": shard_host,
+        "PORT": shard_port or DATABASES["default"]["PORT"],
+        "OPTIONS": copy.deepcopy(DATABASES["default"]["OPTIONS"]),
+    }
+    DATABASE_SHARDS.append(shard_alias)
+
+# Seconds a scatter-gather search waits for each shard; slower or failed
+# shards are listed under meta.failed_shards and the rest is returned.
+# It is also the statement_timeout of the scatter threads' connections.
+SHARD_QUERY_TIMEOUT = float(os.getenv("SHARD_QUERY_TIMEOUT", "5"))
+# Scatter threads per worker, split evenly between the shards
+SHARD_POOL_WORKERS = int(os.getenv("SHARD_POOL_WORKERS", "32"))
+
+# Only views with replica_reads = True (searches, audit logs, metrics)
+# read from replicas; writes and everything else use the primary.
+DATABASE_ROUTERS = [
+    "documents.sharding.ShardRouter",
+    "documents.routing.ReplicaRouter",
+]
+
+# A client that wrote reads from the primary for this long (replica lag)
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# A replica that failed is skipped for this long before being retried
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
 # --------------------------------------------------
 # Password Validation
 # --------------------------------------------------
@@ -150,16 +246,198 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+CORS_ALLOW_HEADERS = (*default_headers, "x-tenant")
+
+# --------------------------------------------------
+# Tenancy (one tenant per bank)
+# --------------------------------------------------
+
+# Requests without the header use DEFAULT_TENANT (pre-tenancy data)
+TENANT_HEADER = "X-Tenant"
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+
 # --------------------------------------------------
 # Django REST Framework (Rate Limiting)
 # --------------------------------------------------
 
 REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.ScopedRateThrottle",
+        "documents.throttling.SharedScopedRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "search": "10/minute",   # Max 10 search requests per minute per IP
         "upload": "200/minute",    # Max 5 uploads per minute per IP
     },
-}
\ No newline at end of file
+}
+
+# Token buckets shared by every worker on the host (mmap'd file)
+THROTTLE_SHARED_PATH = os.getenv(
+    "THROTTLE_SHARED_PATH",
+    "/dev/shm/securematch-throttle"
+    if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "securematch-throttle"),
+)
+THROTTLE_SHARED_SLOTS = int(os.getenv("THROTTLE_SHARED_SLOTS", "65536"))
+
+# Capacity testing only (manage.py loadtest): every throttle allows
+LOAD_TEST_MODE = os.getenv("LOAD_TEST_MODE") == "True"
+
+# --------------------------------------------------
+# Caches
+# --------------------------------------------------
+
+# "search_frequency" must be reachable by every worker on the host so the
+# sliding-window counters agree, and needs atomic add()/incr(); point it
+# at memcached/redis in production.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "search_frequency": {
+        "BACKEND": os.getenv(
+            "SEARCH_FREQUENCY_CACHE_BACKEND",
+            "documents.cache_backends.CounterFileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "SEARCH_FREQUENCY_CACHE_LOCATION",
+            "/tmp/securematch_search_frequency",
+        ),
+        # One counter per auditor per minute of the window: culling
+        # them early would undercount
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+    # Read-your-writes pins, shared by every worker like search_frequency
+    "replica_pins": {
+        "BACKEND": os.getenv(
+            "REPLICA_PIN_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "REPLICA_PIN_CACHE_LOCATION",
+            "/tmp/securematch_replica_pins",
+        ),
+    },
+    # Redeemed auditor challenges: single use needs an add() that is
+    # atomic across workers, like search_frequency
+    "auditor_challenges": {
+        "BACKEND": os.getenv(
+            "AUDITOR_CHALLENGE_CACHE_BACKEND",
+            "documents.cache_backends.CounterFileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "AUDITOR_CHALLENGE_CACHE_LOCATION",
+            "/tmp/securematch_auditor_challenges",
+        ),
+        # Culling a marker before its challenge expires would allow a replay
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+# --------------------------------------------------
+# External Search Monitoring
+# --------------------------------------------------
+
+# Searches per auditor per hour at which responses are flagged as anomalous
+EXTERNAL_SEARCH_HOURLY_ALERT = int(os.getenv("EXTERNAL_SEARCH_HOURLY_ALERT", "100"))
+
+# --------------------------------------------------
+# Auditor Sessions (amortize RSA verification)
+# --------------------------------------------------
+
+AUDITOR_CHALLENGE_TTL_SECONDS = int(os.getenv("AUDITOR_CHALLENGE_TTL_SECONDS", "60"))
+AUDITOR_SESSION_TTL_SECONDS = int(os.getenv("AUDITOR_SESSION_TTL_SECONDS", "900"))
+
+# --------------------------------------------------
+# Auditor Keypair Pool
+# --------------------------------------------------
+
+# Pre-generated RSA-2048 keypairs held in memory per worker (0 disables),
+# filled from the moment gunicorn starts the worker (post_worker_init)
+KEYPAIR_POOL_SIZE = int(os.getenv("KEYPAIR_POOL_SIZE", "8"))
+KEYPAIR_POOL_REFILL_PER_SECOND = float(os.getenv("KEYPAIR_POOL_REFILL_PER_SECOND", "2"))
+
+# --------------------------------------------------
+# Bitmap Posting Lists
+# --------------------------------------------------
+
+# Low-cardinality searchable fields indexed as compressed bitmaps of
+# document ids instead of one token row per document. Run
+# `manage.py reindex` after changing the list.
+BITMAP_INDEX_FIELDS = [
+    field.strip()
+    for field in os.getenv("BITMAP_INDEX_FIELDS", "").split(",")
+    if field.strip()
+]
+
+# --------------------------------------------------
+# In-Memory Token Index
+# --------------------------------------------------
+
+# Each worker keeps every token in sorted NumPy arrays (about 16 bytes
+# per token row) and resolves trapdoors without SQL. New tokens show up
+# in search after at most MEMORY_INDEX_REFRESH_SECONDS.
+MEMORY_INDEX_ENABLED = os.getenv("MEMORY_INDEX_ENABLED") == "True"
+MEMORY_INDEX_REFRESH_SECONDS = float(os.getenv("MEMORY_INDEX_REFRESH_SECONDS", "1"))
+# Full reload, dropping rows deleted outside of document updates (0 = never)
+MEMORY_INDEX_REBUILD_SECONDS = float(os.getenv("MEMORY_INDEX_REBUILD_SECONDS", "3600"))
+
+# Local directory for memory-mapped index segments, shared by every
+# worker on the host (one of them tails the database and writes them).
+# Empty: each worker keeps a private copy.
+MEMORY_INDEX_SEGMENT_DIR = os.getenv("MEMORY_INDEX_SEGMENT_DIR", "")
+
+# --------------------------------------------------
+# Compound Tokens (documents.constants.COMPOUND_FIELDS)
+# --------------------------------------------------
+
+# Uploads always write compound tokens; searches only use them once
+# this is set, i.e. after `manage.py reindex` has backfilled documents
+# uploaded before a combination was declared.
+COMPOUND_TOKEN_SEARCH = os.getenv("COMPOUND_TOKEN_SEARCH") == "True"
+
+# --------------------------------------------------
+# Reindexing (manage.py reindex)
+# --------------------------------------------------
+
+REINDEX_CHECKPOINT_PATH = os.getenv(
+    "REINDEX_CHECKPOINT_PATH",
+    os.path.join(tempfile.gettempdir(), "securematch-reindex.json"),
+)
+
+# --------------------------------------------------
+# Audit Log Retention (manage.py archive_audit_logs)
+# --------------------------------------------------
+
+# Days ExternalSearchAudit rows stay in the table, per outcome
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_FAILURE_RETENTION_DAYS = int(os.getenv("AUDIT_FAILURE_RETENTION_DAYS", "365"))
+
+# Older rows move to gzip JSONL chunks here (keep it on durable storage)
+AUDIT_ARCHIVE_DIR = os.getenv(
+    "AUDIT_ARCHIVE_DIR",
+    os.path.join(BASE_DIR, "audit_archive"),
+)
+
+# --------------------------------------------------
+# Sampling Profiler (runtime overrides: PROFILER_DIR/config.json)
+# --------------------------------------------------
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED") == "True"
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.01"))
+PROFILER_SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "1000"))
+PROFILER_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILER_SAMPLE_INTERVAL_MS", "5"))
+PROFILER_DIR = os.getenv(
+    "PROFILER_DIR",
+    os.path.join(tempfile.gettempdir(), "securematch_profiles"),
+)
+PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "200"))
+PROFILER_MAX_BYTES = int(os.getenv("PROFILER_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# --------------------------------------------------
+# Server-Timing & Query Budget
+# --------------------------------------------------
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True") == "True"
+
+# Requests running more SQL queries than this log a warning naming the view
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
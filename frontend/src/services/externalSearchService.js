@@ -3,25 +3,76 @@ import { handleApiError } from "../utils/errorHandler";
 import {
   normalizeKeyword,
   sha256Hex,
-  signHashHex
+  signHashHex,
+  hmacSha256Hex
 } from "../utils/crypto";
 
+// One RSA signature per session; searches inside it use an HMAC.
+let cachedSession = null;
+
+async function openSession(auditorId, privateKey) {
+  const challengeRes = await api.post("/api/auditor/session/challenge/", {
+    auditor_id: auditorId
+  });
+  const challenge = challengeRes.data.data.challenge;
+  const signature = await signHashHex(challenge, privateKey);
+
+  const res = await api.post("/api/auditor/session/", {
+    auditor_id: auditorId,
+    challenge: challenge,
+    signature: signature
+  });
+
+  return { ...res.data.data, auditorId, privateKey };
+}
+
+async function getSession(auditorId, privateKey) {
+  const now = Date.now() / 1000;
+
+  if (
+    !cachedSession ||
+    cachedSession.auditorId !== auditorId ||
+    cachedSession.privateKey !== privateKey ||
+    cachedSession.expires_at - 30 < now
+  ) {
+    cachedSession = await openSession(auditorId, privateKey);
+  }
+
+  return cachedSession;
+}
+
+async function sessionSearch(auditorId, keywordHash, privateKey) {
+  const session = await getSession(auditorId, privateKey);
+  const mac = await hmacSha256Hex(session.session_key, keywordHash);
+
+  const res = await api.post("/api/search/external/", {
+    auditor_id: auditorId,
+    keyword_hash: keywordHash,
+    session_token: session.session_token,
+    mac: mac
+  });
+  return res.data;
+}
+
 export async function externalSearch(keyword, privateKey) {
+  const auditorId = 1;
+
   try {
     const normalized = normalizeKeyword(keyword);
     const keywordHash = await sha256Hex(normalized);
-    const signature = await signHashHex(keywordHash, privateKey);
-
-    const payload = {
-      auditor_id: 1,
-      keyword_hash: keywordHash,
-      signature: signature
-    };
 
-    const res = await api.post("/api/search/external/", payload);
-    return res.data;
+    try {
+      return await sessionSearch(auditorId, keywordHash, privateKey);
+    } catch (err) {
+      // Session revoked (e.g. key rotated) or expired: retry once with a fresh one
+      if (err.response?.data?.error?.code !== "INVALID_SESSION") {
+        throw err;
+      }
+      cachedSession = null;
+      return await sessionSearch(auditorId, keywordHash, privateKey);
+    }
 
   } catch (err) {
     throw handleApiError(err);
   }
-}
\ No newline at end of file
+}
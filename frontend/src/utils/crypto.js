@@ -74,4 +74,24 @@ export async function signHashHex(hashHex, pemPrivateKey) {
   );
 
   return bufferToHex(signatureBuffer);
-}
\ No newline at end of file
+}
+
+// ---------- 5️⃣ HMAC-SHA256 (Auditor Session MAC) ----------
+export async function hmacSha256Hex(keyHex, message) {
+  const keyBytes = new Uint8Array(
+    keyHex.match(/.{2}/g).map(byte => parseInt(byte, 16))
+  );
+
+  const key = await crypto.subtle.importKey(
+    "raw",
+    keyBytes,
+    { name: "HMAC", hash: "SHA-256" },
+    false,
+    ["sign"]
+  );
+
+  const encoder = new TextEncoder();
+  const mac = await crypto.subtle.sign("HMAC", key, encoder.encode(message));
+
+  return bufferToHex(mac);
+}